@@ -1,29 +1,30 @@
+import time
+
 from PySide6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QLabel, QSlider, QHBoxLayout, 
-    QPushButton, QFrame, QSizePolicy, QTableWidget, QTableWidgetItem, QHeaderView,QMessageBox
+    QPushButton, QFrame, QSizePolicy
 )
 from PySide6.QtCore import Qt, QPropertyAnimation, Signal
 from PySide6.QtGui import QFont, QPalette, QColor, QLinearGradient, QBrush
+from alarm_engine import DEFAULT_RULES, load_rules, zones_from_sensors
 from database import MonitoringDB  # Import the database class
-from PySide6.QtCore import QTimer
- 
-import socket
-import struct
-from enum import IntEnum
-
-# Define Modbus constants
-MODBUS_PORT = 502
-MODBUS_UNIT_ID = 1
-class SensorState(IntEnum):
-    OPEN = 0
-    CLOSED = 1
-    UNKNOWN = 2
-    LOW_BATTERY = 3
-
-class ModbusFunction(IntEnum):
-    READ_COILS = 1
-    READ_DISCRETE_INPUTS = 2
-    WRITE_SINGLE_COIL = 5
+from daemon_client import DaemonClient
+from event_channel import DEFAULT_SOCKET, daemon_available
+
+from event_logger import EventLogger
+from retention import RetentionJob, RetentionPolicy
+from DiagnosticsWindow import DiagnosticsWindow
+from HistoryWindow import HistoryWindow
+from history_model import ALARM_LEVELS
+from modbus_client import MODBUS_PORT, SensorState
+from polling_worker import PollingWorker
+from profiling import span
+from read_planner import SensorConfig
+from sensor_grid import SensorGridModel, SensorGridView
+from theme import (
+    ALARM_STATUS_STYLE, BATTERY_STYLE, CONNECTION_STYLE, LEVEL_LABEL_STYLE, SENSOR_STATE_STYLE, SLIDER_STYLE,
+    battery_state, set_style_state
+)
 
 
 class ClickableLabel(QLabel):
@@ -33,125 +34,6 @@ class ClickableLabel(QLabel):
         self.clicked.emit()
         super().mousePressEvent(event)
 
-class HistoryWindow(QMainWindow):
-    def __init__(self, parent=None, user=None):
-        super().__init__(parent)
-        self.user = user
-        self.setWindowTitle("Alert History")
-        self.setMinimumSize(600, 400)
-        
-        # Database connection
-        self.db = MonitoringDB()
-        
-        # Gradient background (matching dashboard)
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        
-        gradient = QLinearGradient(0, 0, 0, 1)
-        gradient.setCoordinateMode(QLinearGradient.CoordinateMode.ObjectMode)
-        gradient.setColorAt(0, QColor("#1e3c72"))
-        gradient.setColorAt(1, QColor("#2a5298"))
-        
-        palette = self.palette()
-        palette.setBrush(QPalette.ColorRole.Window, QBrush(gradient))
-        central_widget.setAutoFillBackground(True)
-        central_widget.setPalette(palette)
-        
-        layout = QVBoxLayout(central_widget)
-        layout.setContentsMargins(20, 20, 20, 20)
-        layout.setSpacing(15)
-
-        # Content frame
-        frame = QFrame()
-        frame.setStyleSheet("""
-            QFrame {
-                background-color: rgba(255, 255, 255, 0.95);
-                border-radius: 12px;
-                padding: 20px;
-            }
-        """)
-        frame_layout = QVBoxLayout(frame)
-        
-        # Title
-        title = QLabel("Alert History Summary")
-        title.setFont(QFont("Arial", 16, QFont.Weight.Bold))
-        title.setStyleSheet("color: #1e3c72; margin-bottom: 10px;")
-        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        frame_layout.addWidget(title)
-        
-        # Get alert summary data from database
-        summary_data = self.db.get_alert_summary()
-        
-        # Statistics summary
-        total_alerts = sum(item['alert_count'] for item in summary_data)
-        sensor_count = len(summary_data)
-        summary = QLabel(f"Total Alerts: {total_alerts} | Active Sensors: {sensor_count}")
-        summary.setFont(QFont("Arial", 11))
-        summary.setStyleSheet("color: #2c3e50; margin-bottom: 15px;")
-        summary.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        frame_layout.addWidget(summary)
-        
-        # Table setup
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Sensor Type", "ID", "Location", "Alert Count"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.verticalHeader().setVisible(False)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
-        
-        # Populate table with real data
-        self.table.setRowCount(len(summary_data))
-        for row, data in enumerate(summary_data):
-            self.table.setItem(row, 0, QTableWidgetItem(data["sensor_type"]))
-            self.table.setItem(row, 1, QTableWidgetItem(str(data["sensor_id"])))  # Convert ID to string
-            self.table.setItem(row, 2, QTableWidgetItem(data["location"]))
-            
-            # Color code alert counts
-            alert_item = QTableWidgetItem(str(data["alert_count"]))
-            if data["alert_count"] > 10:
-                alert_item.setForeground(QColor("#c0392b"))  # Red for high alerts
-            elif data["alert_count"] > 5:
-                alert_item.setForeground(QColor("#e67e22"))  # Orange for medium
-            else:
-                alert_item.setForeground(QColor("#27ae60"))  # Green for low
-                
-            self.table.setItem(row, 3, alert_item)
-        
-        frame_layout.addWidget(self.table)
-        
-        # Close button
-        btn_close = QPushButton("Close")
-        btn_close.setStyleSheet("""
-            QPushButton {
-                background-color: #95a5a6;
-                color: white;
-                padding: 8px 25px;
-                border-radius: 5px;
-                font-weight: bold;
-                min-width: 80px;
-            }
-            QPushButton:hover {
-                background-color: #7f8c8d;
-            }
-        """)
-        btn_close.clicked.connect(self.close)
-        frame_layout.addWidget(btn_close, 0, Qt.AlignmentFlag.AlignRight)
-        
-        layout.addWidget(frame)
-        
-        # Fade-in animation
-        self.animation = QPropertyAnimation(self, b"windowOpacity")
-        self.animation.setDuration(800)
-        self.animation.setStartValue(0)
-        self.animation.setEndValue(1)
-        self.animation.start()
-    
-    def closeEvent(self, event):
-        # Close database connection
-        self.db.close()
-        event.accept()
-MODBUS_PORT = 502
-MODBUS_UNIT_ID = 1
 class DashboardWindow(QMainWindow):
     def __init__(self, user):
         super().__init__()
@@ -162,6 +44,34 @@ class DashboardWindow(QMainWindow):
         # Initialize connection parameters
         self.modbus_ip = "192.168.1.100"  # Default IP for receiver
         self.modbus_connected = False
+        self.poll_worker = None  # PollingWorker, or DaemonClient when another poller runs
+        self.event_socket = DEFAULT_SOCKET
+        self.history_window = None  # Created on first use, then reused
+        self.diagnostics_window = None
+        self.receivers_online = {}
+
+        # Database connection; sensor events are written behind in batches
+        self.db = MonitoringDB()
+        self.event_logger = EventLogger(self.db.log_events)
+        # Rollups and pruning of old events, while this dashboard is the poller
+        self.retention = None
+
+        # Sensors attached to the receiver; the dashboard shows the first one
+        self.sensors = [
+            # Contact sensor at input 0, battery level in input register 0x200
+            SensorConfig(1, state_address=0, battery_register=0x200),
+        ]
+        self.selected_sensor = self.sensors[0].sensor_id
+
+        # Alarm rules, evaluated by whichever poller this dashboard follows
+        try:
+            self.alarm_rules = load_rules()
+        except (OSError, ValueError, TypeError) as e:
+            print(f"Alarm rules error: {str(e)}")
+            self.alarm_rules = DEFAULT_RULES
+
+        # Maximum number of sensor grid repaints per second
+        self.grid_refresh_rate = 10
         
         # Gradient background
         central_widget = QWidget()
@@ -217,7 +127,8 @@ class DashboardWindow(QMainWindow):
         self.btn_connect.clicked.connect(self.toggle_connection)
         
         self.connection_status = QLabel("Disconnected")
-        self.connection_status.setStyleSheet("color: #e74c3c; font-weight: bold;")
+        self.connection_status.setStyleSheet(CONNECTION_STYLE)
+        set_style_state(self.connection_status, 'status', "disconnected")
         
         connection_layout.addWidget(self.btn_connect)
         connection_layout.addWidget(self.connection_status)
@@ -286,27 +197,11 @@ class DashboardWindow(QMainWindow):
         self.slider.setTickPosition(QSlider.TickPosition.TicksBelow)
         self.slider.setTickInterval(1)
         
-        # Base slider style
-        self.slider.setStyleSheet("""
-            QSlider {
-                min-height: 30px;
-            }
-            QSlider::groove:horizontal {
-                height: 8px;
-                background: #d3d3d3;
-                border-radius: 4px;
-                margin: 0 10px;
-            }
-            QSlider::handle:horizontal {
-                width: 20px;
-                height: 20px;
-                margin: -6px -10px;
-                background: #1e3c72;
-                border-radius: 10px;
-            }
-        """)
+        # All level colours are in SLIDER_STYLE; update_slider_style picks one
+        self.slider.setStyleSheet(SLIDER_STYLE)
         
         self.slider.valueChanged.connect(self.update_slider_style)
+        self.slider.valueChanged.connect(self.on_alarm_level_changed)
         slider_layout.addWidget(self.slider)
 
         # Level labels
@@ -318,22 +213,20 @@ class DashboardWindow(QMainWindow):
         for i, text in enumerate(["Low", "Medium", "High"]):
             label = ClickableLabel(text)
             label.setProperty('level', i)
-            label.setStyleSheet("""
-                ClickableLabel {
-                    color: #555555;
-                    padding: 0 15px;
-                }
-                ClickableLabel:hover {
-                    color: #333333;
-                    font-weight: bold;
-                }
-            """)
+            label.setStyleSheet(LEVEL_LABEL_STYLE)
             label.setAlignment(Qt.AlignmentFlag.AlignCenter)
             label.clicked.connect(self.on_label_clicked)
             labels_layout.addWidget(label)
             self.level_labels.append(label)
         
         slider_layout.addWidget(self.labels_container)
+
+        # Latest alarm raised by the rules armed at this level
+        self.alarm_status = QLabel("No alarms")
+        self.alarm_status.setStyleSheet(ALARM_STATUS_STYLE)
+        self.alarm_status.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        set_style_state(self.alarm_status, 'status', "none")
+        slider_layout.addWidget(self.alarm_status)
         frame_layout.addWidget(slider_container)
 
         # Initialize
@@ -355,12 +248,61 @@ class DashboardWindow(QMainWindow):
             }
         """)
         self.button_history.clicked.connect(self.show_history)
-        frame_layout.addWidget(self.button_history, 0, Qt.AlignmentFlag.AlignCenter)
+
+        self.button_diagnostics = QPushButton("Diagnostics")
+        self.button_diagnostics.setStyleSheet("""
+            QPushButton {
+                background-color: #95a5a6;
+                color: white;
+                padding: 10px 20px;
+                border-radius: 8px;
+                font-weight: bold;
+                min-width: 100px;
+            }
+            QPushButton:hover {
+                background-color: #7f8c8d;
+            }
+        """)
+        self.button_diagnostics.clicked.connect(self.show_diagnostics)
+
+        buttons_container = QWidget()
+        buttons_layout = QHBoxLayout(buttons_container)
+        buttons_layout.setContentsMargins(0, 0, 0, 0)
+        buttons_layout.addStretch()
+        buttons_layout.addWidget(self.button_history)
+        buttons_layout.addWidget(self.button_diagnostics)
+        buttons_layout.addStretch()
+        frame_layout.addWidget(buttons_container)
 
         # Sensor state display
+        sensor_container = QWidget()
+        sensor_layout = QHBoxLayout(sensor_container)
+        sensor_layout.setContentsMargins(0, 0, 0, 0)
+
         self.sensor_state = QLabel("State: UNKNOWN")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #7f8c8d;")
-        frame_layout.addWidget(self.sensor_state)
+        self.sensor_state.setStyleSheet(SENSOR_STATE_STYLE)
+        set_style_state(self.sensor_state, 'status', "unknown")
+        sensor_layout.addWidget(self.sensor_state)
+        sensor_layout.addStretch()
+
+        self.battery_indicator = QLabel()
+        self.battery_indicator.setFixedSize(24, 12)
+        self.battery_indicator.setStyleSheet(BATTERY_STYLE)
+        self.battery_indicator.setToolTip("Battery: unknown")
+        sensor_layout.addWidget(self.battery_indicator)
+        frame_layout.addWidget(sensor_container)
+
+        # Every known sensor as a tile, more as they report; clicking one shows it above
+        known = {sensor.sensor_id for sensor in self.sensors}
+        known.update(sensor['id'] for sensor in self.db.get_sensors())
+        self.sensor_model = SensorGridModel(sorted(known), self.grid_refresh_rate, self)
+        self.sensor_model.set_alarm_level(self.slider.value())
+        self.sensor_grid = SensorGridView()
+        self.sensor_grid.setStyleSheet("QListView { background: transparent; border: none; padding: 0; }")
+        self.sensor_grid.setMinimumHeight(2 * self.sensor_grid.gridSize().height() + 4)
+        self.sensor_grid.setModel(self.sensor_model)
+        self.sensor_grid.clicked.connect(self.on_sensor_selected)
+        frame_layout.addWidget(self.sensor_grid)
 
         # ADD LOGOUT BUTTON
         self.button_logout = QPushButton("Logout")
@@ -382,10 +324,9 @@ class DashboardWindow(QMainWindow):
 
         layout.addWidget(frame)
 
-        # Initialize polling timer
-        self.poll_timer = QTimer()
-        self.poll_timer.timeout.connect(self.poll_sensor_state)
-        self.poll_timer.setInterval(5000)  # 5 seconds
+        # Default state poll interval for the background worker; battery
+        # levels use each sensor's battery_interval (5 minutes by default)
+        self.poll_interval = 1.0  # seconds
 
         # Fade-in animation
         self.animation = QPropertyAnimation(self, b"windowOpacity")
@@ -404,66 +345,56 @@ class DashboardWindow(QMainWindow):
         level = sender.property('level')
         self.slider.setValue(level)
 
+    def on_alarm_level_changed(self, level):
+        self.apply_alarm_level(level)
+        # The poller arms its rules for the new level
+        if self.poll_worker is not None:
+            self.poll_worker.set_alarm_level(level)
+
+    def on_poller_alarm_level(self, level):
+        """The shared poller's level, changed by another dashboard"""
+        self.slider.blockSignals(True)
+        self.slider.setValue(level)
+        self.slider.blockSignals(False)
+        self.update_slider_style(level)
+        self.apply_alarm_level(level)
+
+    def apply_alarm_level(self, level):
+        self.sensor_model.set_alarm_level(level)
+
+    def on_alarms(self, alarms):
+        """Show the latest alarm under the slider"""
+        alarm = alarms[-1]
+        where = f" in {alarm.zone}" if alarm.zone else ""
+        self.alarm_status.setText(
+            f"{time.strftime('%H:%M:%S', time.localtime(alarm.timestamp))} "
+            f"{ALARM_LEVELS[alarm.level]} alarm: {alarm.rule}, sensor {alarm.sensor_id}{where}"
+        )
+        set_style_state(self.alarm_status, 'status', "alarm")
+
     def update_slider_style(self, value):
         """Update slider and label styles based on current value"""
-        # Color mapping
-        colors = {
-            0: ("#4CAF50", "#388E3C"),  # Green (Low)
-            1: ("#2196F3", "#1976D2"),  # Blue (Medium)
-            2: ("#FF9800", "#F57C00")   # Orange (High)
-        }
-        
-        # Update slider style
-        color, dark_color = colors[value]
-        self.slider.setStyleSheet(f"""
-            QSlider {{
-                min-height: 30px;
-            }}
-            QSlider::groove:horizontal {{
-                height: 8px;
-                background: #d3d3d3;
-                border-radius: 4px;
-                margin: 0 10px;
-            }}
-            QSlider::sub-page:horizontal {{
-                background: {color};
-                border-radius: 4px;
-            }}
-            QSlider::handle:horizontal {{
-                width: 20px;
-                height: 20px;
-                margin: -6px -10px;
-                background: {dark_color};
-                border-radius: 10px;
-            }}
-        """)
-        
-        # Update label styles
+        set_style_state(self.slider, 'alarmLevel', value)
         for i, label in enumerate(self.level_labels):
-            if i == value:
-                label.setStyleSheet(f"""
-                    ClickableLabel {{
-                        color: {dark_color};
-                        font-weight: bold;
-                        padding: 0 15px;
-                    }}
-                """)
-            else:
-                label.setStyleSheet("""
-                    ClickableLabel {
-                        color: #555555;
-                        padding: 0 15px;
-                    }
-                    ClickableLabel:hover {
-                        color: #333333;
-                        font-weight: bold;
-                    }
-                """)
+            set_style_state(label, 'selected', i == value)
     
     def show_history(self):
         """Show the alert history window"""
-        self.history_window = HistoryWindow(self, self.user)
+        if self.history_window is None:
+            self.history_window = HistoryWindow(self, self.user)
+        else:
+            self.history_window.refresh()
         self.history_window.show()
+        self.history_window.raise_()
+        self.history_window.activateWindow()
+    
+    def show_diagnostics(self):
+        """Show live polling, queue and database metrics"""
+        if self.diagnostics_window is None:
+            self.diagnostics_window = DiagnosticsWindow(self)
+        self.diagnostics_window.show()
+        self.diagnostics_window.raise_()
+        self.diagnostics_window.activateWindow()
     
     def logout(self):
         """Handle logout"""
@@ -477,232 +408,167 @@ class DashboardWindow(QMainWindow):
         else:
             self.disconnect_from_modbus()
 
-    def connect_to_modbus(self):
-        """Establish connection to MODBUS receiver"""
-        try:
-            self.modbus_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.modbus_socket.settimeout(2.0)
-            self.modbus_socket.connect((self.modbus_ip, MODBUS_PORT))
-            self.modbus_connected = True
+    def connect_to_modbus(self, publish=True):
+        """Follow the shared poller if there is one, otherwise become it"""
+        if self.poll_worker is not None:
+            return
+
+        if publish and daemon_available(self.event_socket):
+            # The daemon or another dashboard polls and logs; only follow its events
+            self.poll_worker = DaemonClient(self.event_socket)
+            self.poll_worker.daemon_status.connect(self.on_daemon_status)
+        else:
+            # Logs and prunes only once it publishes, so two dashboards never both do
+            self.retention = RetentionJob(self.db, RetentionPolicy.load(self.db))
+            self.poll_worker = PollingWorker(
+                self.modbus_ip, self.sensors, MODBUS_PORT, self.poll_interval,
+                publish_path=self.event_socket if publish else None,
+                alarm_rules=self.alarm_rules, zones=zones_from_sensors(self.db.get_sensors()),
+                alarm_level=self.slider.value(), event_logger=self.event_logger,
+                retention=self.retention
+            )
+            self.poll_worker.publish_failed.connect(self.on_publish_failed)
+        self.poll_worker.receiver_status.connect(self.on_receiver_status)
+        self.poll_worker.sensor_events.connect(self.on_sensor_events)
+        self.poll_worker.poll_failed.connect(self.on_poll_failed)
+        self.poll_worker.alarms.connect(self.on_alarms)
+        self.poll_worker.alarm_level.connect(self.on_poller_alarm_level)
+
+        self.receivers_online = {}
+        self.modbus_connected = True
+        self.connection_status.setText("Connecting...")
+        set_style_state(self.connection_status, 'status', "connecting")
+        self.btn_connect.setText("Disconnect")
+        self.poll_worker.start()
+
+    def on_receiver_status(self, host, connected, message):
+        """Reflect receiver connects/drops; the worker reconnects by itself"""
+        self.receivers_online[host] = connected
+        online = sum(1 for up in self.receivers_online.values() if up)
+        total = len(self.receivers_online)
+        if online == total:
             self.connection_status.setText("Connected")
-            self.connection_status.setStyleSheet("color: #27ae60; font-weight: bold;")
-            self.btn_connect.setText("Disconnect")
-            self.poll_timer.start()
-            
-            # Initialize sensor configuration
-            self.configure_sensor()
-            
-        except Exception as e:
-            QMessageBox.critical(self, "Connection Failed", 
-                               f"Could not connect to receiver:\n{str(e)}")
+            set_style_state(self.connection_status, 'status', "connected")
+        elif online:
+            self.connection_status.setText(f"Connected ({online}/{total} receivers)")
+            set_style_state(self.connection_status, 'status', "partial")
+        else:
+            self.connection_status.setText("Reconnecting...")
+            set_style_state(self.connection_status, 'status', "reconnecting")
+        if not connected:
+            print(f"Receiver {host} unavailable: {message}")
+        self.connection_status.setToolTip("\n".join(
+            f"{h}: {'online' if up else 'offline'}" for h, up in self.receivers_online.items()
+        ))
+
+    def on_daemon_status(self, attached, message):
+        """Take over polling when the shared poller goes away"""
+        if self.poll_worker is None or self.sender() is not self.poll_worker:
+            return  # Queued from a client already stopped (or the window is closing)
+        if attached:
+            return  # The poller replays its receiver states
+        print(f"Shared poller unavailable: {message}")
+        self.stop_poll_worker()
+        self.receivers_online = {}
+        self.sensor_model.mark_unknown()
+        self.connect_to_modbus()
+
+    def on_publish_failed(self, message):
+        """Another dashboard became the poller first; follow it instead"""
+        if self.poll_worker is None or self.sender() is not self.poll_worker:
+            return
+        self.stop_poll_worker()
+        if daemon_available(self.event_socket):
+            self.connect_to_modbus()
+        else:
+            # Nobody can share the channel; poll alone rather than not at all
+            print(f"Event channel error: {message}; polling without sharing")
+            self.connect_to_modbus(publish=False)
+
+    def stop_poll_worker(self):
+        """Stop the polling thread (closing its sockets) or detach from the poller"""
+        if self.poll_worker is not None:
+            self.poll_worker.stop()
+            self.poll_worker.deleteLater()
+            self.poll_worker = None
+        if self.retention is not None:
+            self.retention.close()
+            self.retention = None
 
     def disconnect_from_modbus(self):
         """Close connection to MODBUS receiver"""
-        self.poll_timer.stop()
-        if hasattr(self, 'modbus_socket') and self.modbus_connected:
-            self.modbus_socket.close()
+        self.stop_poll_worker()
         self.modbus_connected = False
         self.connection_status.setText("Disconnected")
-        self.connection_status.setStyleSheet("color: #e74c3c; font-weight: bold;")
+        set_style_state(self.connection_status, 'status', "disconnected")
+        self.connection_status.setToolTip("")
         self.btn_connect.setText("Connect to Receiver")
         self.sensor_state.setText("State: DISCONNECTED")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #e74c3c;")
+        set_style_state(self.sensor_state, 'status', "error")
+        self.sensor_model.mark_unknown()
 
-    def poll_sensor_state(self):
-        """Poll the sensor for current state"""
-        if not self.modbus_connected:
-            return
-        
-        try:
-            # Read discrete inputs (function code 2)
-            request = self.create_modbus_request(
-                function=ModbusFunction.READ_DISCRETE_INPUTS,
-                address=0,
-                count=1
-            )
-            self.modbus_socket.send(request)
-            response = self.modbus_socket.recv(256)
-            
-            if len(response) < 5:
-                raise ValueError("Invalid response length")
-            
-            state_byte = response[8]
-            state = SensorState.OPEN if (state_byte & 0x01) == 0 else SensorState.CLOSED
-            self.update_sensor_state_ui(state)
-            
-        except Exception as e:
-            print(f"Polling error: {str(e)}")
-            self.sensor_state.setText("State: ERROR")
-            self.sensor_state.setStyleSheet("font-weight: bold; color: #e74c3c;")
-
-    def create_modbus_request(self, function, address, count=0, value=0):
-        """Create MODBUS TCP request"""
-        transaction_id = 0x0001
-        protocol_id = 0x0000
-        unit_id = MODBUS_UNIT_ID
-        
-        if function in [ModbusFunction.READ_COILS, ModbusFunction.READ_DISCRETE_INPUTS]:
-            length = 6
-            data = struct.pack(">HHH", function, address, count)
-        elif function == ModbusFunction.WRITE_SINGLE_COIL:
-            length = 6
-            data = struct.pack(">HHH", function, address, value)
-        else:
-            raise ValueError("Unsupported function code")
-        
-        header = struct.pack(">HHH", transaction_id, protocol_id, length)
-        return header + struct.pack("B", unit_id) + data
-
-    def configure_sensor(self):
-        """Configure sensor transmission parameters"""
-        try:
-            config_request = self.create_modbus_request(
-                function=ModbusFunction.WRITE_SINGLE_COIL,
-                address=0x100,  # Example configuration address
-                value=0x01       # State change + periodic mode
-            )
-            self.modbus_socket.send(config_request)
-            response = self.modbus_socket.recv(256)
-            
-        except Exception as e:
-            print(f"Configuration error: {str(e)}")
+    def on_poll_failed(self, message):
+        print(f"Polling error: {message}")
+        self.sensor_state.setText("State: ERROR")
+        set_style_state(self.sensor_state, 'status', "error")
+
+    def on_sensor_events(self, events):
+        """Apply state/battery transitions to the grid and the selected sensor"""
+        with span("ui.update"):
+            self.sensor_model.apply_events(events)
+            if any(event.sensor_id == self.selected_sensor for event in events):
+                self.show_selected_sensor()
+
+    def on_sensor_selected(self, index):
+        """Show the clicked tile's sensor in the state/battery display"""
+        self.selected_sensor = self.sensor_model.sensor_id(index.row())
+        self.show_selected_sensor()
+
+    def show_selected_sensor(self):
+        """Show the selected sensor's latest values from the poller's store"""
+        store = self.poll_worker.store if self.poll_worker is not None else None
+        battery = None
+        if store is not None and self.selected_sensor in store:
+            values = store.sensor(self.selected_sensor)
+            self.update_sensor_state_ui(values["state"])
+            battery = values["battery"]
+        self.update_battery_ui(battery)
 
     def update_sensor_state_ui(self, state):
         """Update UI based on sensor state"""
         if state == SensorState.OPEN:
             self.sensor_state.setText("State: OPEN")
-            self.sensor_state.setStyleSheet("font-weight: bold; color: #e74c3c;")
+            set_style_state(self.sensor_state, 'status', "open")
         elif state == SensorState.CLOSED:
             self.sensor_state.setText("State: CLOSED")
-            self.sensor_state.setStyleSheet("font-weight: bold; color: #27ae60;")
+            set_style_state(self.sensor_state, 'status', "closed")
         else:
             self.sensor_state.setText("State: UNKNOWN")
-            self.sensor_state.setStyleSheet("font-weight: bold; color: #7f8c8d;")
+            set_style_state(self.sensor_state, 'status', "unknown")
+    
+    def update_battery_ui(self, level):
+        """Colour the battery indicator from the latest reading (None if unknown)"""
+        if level is None:
+            set_style_state(self.battery_indicator, 'battery', "unknown")
+            self.battery_indicator.setToolTip("Battery: unknown")
+            return
+        set_style_state(self.battery_indicator, 'battery', battery_state(level))
+        self.battery_indicator.setToolTip(f"Battery: {level}%")
     
     def closeEvent(self, event):
         """Handle window close event"""
         # Disconnect from MODBUS receiver
-        if hasattr(self, 'modbus_connected') and self.modbus_connected:
-            self.disconnect_from_modbus()
+        self.stop_poll_worker()
+        
+        # Let history queries finish before the database goes away
+        if self.history_window is not None:
+            self.history_window.shutdown()
+        
+        # Write out any queued events before the connection goes away
+        self.event_logger.close()
         
         # Close database connection
         if hasattr(self, 'db'):
             self.db.close()
         
         event.accept()
-def poll_sensor_state(self):
-    if not self.modbus_connected:
-        return
-    
-    try:
-        # Read discrete inputs (function code 2)
-        # Assuming contact sensor is at address 0
-        request = self.create_modbus_request(
-            function=ModbusFunction.READ_DISCRETE_INPUTS,
-            address=0,
-            count=1
-        )
-        self.modbus_socket.send(request)
-        response = self.modbus_socket.recv(256)
-        
-        # Parse response
-        if len(response) < 5:
-            raise ValueError("Invalid response length")
-        
-        # Byte 8 contains the state (bit 0)
-        state_byte = response[8]
-        state = SensorState.OPEN if (state_byte & 0x01) == 0 else SensorState.CLOSED
-        
-        # Update UI
-        self.update_sensor_state_ui(state)
-        
-        # Check battery every 10 polls (every 50 seconds)
-        if self.poll_timer.interval() * 10 > 50000:
-            self.check_battery_status()
-        
-    except Exception as e:
-        print(f"Polling error: {str(e)}")
-        self.sensor_state.setText("State: ERROR")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #e74c3c;")
-
-def configure_sensor(self):
-    """Configure sensor transmission parameters"""
-    try:
-        # Set to send on state change + periodic every 5 minutes (as per specs)
-        # (This would require knowing the specific configuration registers)
-        config_request = self.create_modbus_request(
-            function=ModbusFunction.WRITE_SINGLE_COIL,
-            address=0x100,  # Example configuration address
-            value=0x01       # State change + periodic mode
-        )
-        self.modbus_socket.send(config_request)
-        response = self.modbus_socket.recv(256)
-        
-    except Exception as e:
-        print(f"Configuration error: {str(e)}")
-
-def create_modbus_request(self, function, address, count=0, value=0):
-    """Create MODBUS TCP request"""
-    transaction_id = 0x0001  # Can increment for each request
-    protocol_id = 0x0000
-    unit_id = MODBUS_UNIT_ID
-    
-    if function in [ModbusFunction.READ_COILS, ModbusFunction.READ_DISCRETE_INPUTS]:
-        # Read request
-        length = 6
-        data = struct.pack(">HHH", function, address, count)
-    elif function == ModbusFunction.WRITE_SINGLE_COIL:
-        # Write request
-        length = 6
-        data = struct.pack(">HHH", function, address, value)
-    else:
-        raise ValueError("Unsupported function code")
-    
-    header = struct.pack(">HHH", transaction_id, protocol_id, length)
-    return header + struct.pack("B", unit_id) + data
-
-def update_sensor_state_ui(self, state):
-    if state == SensorState.OPEN:
-        self.sensor_state.setText("State: OPEN")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #e74c3c;")  # Red for alarm
-    elif state == SensorState.CLOSED:
-        self.sensor_state.setText("State: CLOSED")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #27ae60;")  # Green for normal
-    else:
-        self.sensor_state.setText("State: UNKNOWN")
-        self.sensor_state.setStyleSheet("font-weight: bold; color: #7f8c8d;")
-
-def update_battery_ui(self, level):
-    color = "#27ae60"  # Green
-    if level < 20:
-        color = "#e74c3c"  # Red
-    elif level < 40:
-        color = "#f39c12"  # Orange
-    
-    self.battery_indicator.setStyleSheet(f"""
-        background-color: {color};
-        border: 1px solid #7f8c8d;
-        border-radius: 3px;
-    """)
-    self.battery_indicator.setToolTip(f"Battery: {level}%")
-
-def check_battery_status(self):
-    try:
-        # Read battery status register (example address)
-        request = self.create_modbus_request(
-            function=ModbusFunction.READ_DISCRETE_INPUTS,
-            address=0x200,  # Battery status register
-            count=1
-        )
-        self.modbus_socket.send(request)
-        response = self.modbus_socket.recv(256)
-        
-        # Parse battery level (0-100%)
-        if len(response) >= 9:
-            battery_level = response[8]  # Example position
-            self.update_battery_ui(battery_level)
-            # Store in database
-            self.db.update_battery_level(self.current_sensor['id'], battery_level)
-    
-    except Exception as e:
-        print(f"Battery check error: {str(e)}")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import math
+
+from PySide6.QtWidgets import (
+    QMainWindow, QWidget, QVBoxLayout, QLabel, QFrame, QHeaderView, QTableWidget,
+    QTableWidgetItem
+)
+from PySide6.QtCore import Qt, QTimer
+from PySide6.QtGui import QFont
+
+from metrics import REGISTRY, metrics_endpoint
+
+
+def format_seconds(value):
+    if math.isnan(value):
+        return "-"
+    if value < 1:
+        return f"{value * 1000:.2f} ms"
+    return f"{value:.2f} s"
+
+
+class DiagnosticsWindow(QMainWindow):
+    """Live view of the metrics registry (latency, timeouts, queue depth...)"""
+    HEADERS = ("Metric", "Labels", "Value", "Count", "Mean", "p50", "p99")
+
+    def __init__(self, parent=None, registry=REGISTRY, refresh_interval=1000):
+        super().__init__(parent)
+        self.registry = registry
+        self.setWindowTitle("Diagnostics")
+        self.setMinimumSize(700, 400)
+
+        central_widget = QWidget()
+        self.setCentralWidget(central_widget)
+        layout = QVBoxLayout(central_widget)
+        layout.setContentsMargins(20, 20, 20, 20)
+
+        frame = QFrame()
+        frame_layout = QVBoxLayout(frame)
+
+        title = QLabel("Diagnostics")
+        title.setFont(QFont("Arial", 16, QFont.Weight.Bold))
+        title.setStyleSheet("color: #1e3c72;")
+        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        frame_layout.addWidget(title)
+
+        endpoint = metrics_endpoint()
+        self.endpoint_label = QLabel(
+            f"Prometheus endpoint: {endpoint}" if endpoint else "Prometheus endpoint: disabled"
+        )
+        self.endpoint_label.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+        self.endpoint_label.setStyleSheet("color: #2c3e50;")
+        frame_layout.addWidget(self.endpoint_label)
+
+        self.table = QTableWidget(0, len(self.HEADERS))
+        self.table.setHorizontalHeaderLabels(self.HEADERS)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.verticalHeader().setVisible(False)
+        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        frame_layout.addWidget(self.table)
+        layout.addWidget(frame)
+
+        # Only refreshed while the window is visible
+        self.timer = QTimer(self)
+        self.timer.setInterval(refresh_interval)
+        self.timer.timeout.connect(self.refresh)
+
+    def refresh(self):
+        rows = self.registry.snapshot()
+        self.table.setRowCount(len(rows))
+        for row, (name, labels, kind, summary) in enumerate(rows):
+            if kind == "histogram":
+                cells = (name, labels, "", str(summary["count"]), format_seconds(summary["mean"]),
+                         format_seconds(summary["p50"]), format_seconds(summary["p99"]))
+            else:
+                value = summary["value"]
+                text = f"{value:g}" if isinstance(value, float) else str(value)
+                cells = (name, labels, text, "", "", "", "")
+            for column, text in enumerate(cells):
+                item = self.table.item(row, column)
+                if item is None:
+                    self.table.setItem(row, column, QTableWidgetItem(text))
+                elif item.text() != text:
+                    item.setText(text)
+
+    def showEvent(self, event):
+        self.refresh()
+        self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop()
+        super().hideEvent(event)
@@ -1,23 +1,48 @@
+import time
+
 from PySide6.QtWidgets import (
-    QMainWindow, QWidget, QVBoxLayout, QLabel, QSlider, QHBoxLayout, 
-    QPushButton, QFrame, QSizePolicy, QTableWidget, QTableWidgetItem, QHeaderView
+    QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QFrame,
+    QHeaderView, QTableView, QTabWidget, QComboBox, QLineEdit
 )
-from PySide6.QtCore import Qt, QPropertyAnimation, Signal
+from PySide6.QtCore import Qt, QPropertyAnimation
 from PySide6.QtGui import QFont, QPalette, QColor, QLinearGradient, QBrush
+from database import DAY, HOUR, MonitoringDB  # Import the database class
 
-class ClickableLabel(QLabel):
-    clicked = Signal()
-    
-    def mousePressEvent(self, event):
-        self.clicked.emit()
-        super().mousePressEvent(event)
+from history_model import ALARM_LEVELS, ActivityModel, AlertSummaryModel, EventTableModel, QueryRunner
+from retention import RetentionPolicy, choose_resolution
+
+# Time range choices for the event filter: (label, seconds back or None)
+TIME_RANGES = [
+    ("Last hour", 3600),
+    ("Last 24 hours", 86400),
+    ("Last 7 days", 7 * 86400),
+    ("Last 30 days", 30 * 86400),
+    ("All time", None),
+]
+EVENT_TYPES = [("All events", None), ("State changes", "state"),
+               ("Battery", "battery"), ("Alarms", "alarm")]
+RESOLUTION_NAMES = {DAY: "day", HOUR: "hour"}
+RECENT_DAYS = 7  # Days of alerts counted under the summary
 
 class HistoryWindow(QMainWindow):
-    def __init__(self, parent=None):
+    """Alert summary and event log.
+
+    Nothing is read from the database while the window is built: the
+    summary, the location list and the event pages are loaded by a
+    QueryRunner in the background and filled in as they arrive. Closing the
+    window cancels whatever is still running and only hides it, so the
+    dashboard can reuse it through refresh().
+    """
+    def __init__(self, parent=None, user=None):
         super().__init__(parent)
+        self.user = user
         self.setWindowTitle("Alert History")
         self.setMinimumSize(600, 400)
         
+        # Database access, off the GUI thread
+        self.db = MonitoringDB()
+        self.runner = QueryRunner(parent=self)
+        
         # Gradient background (matching dashboard)
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -54,51 +79,58 @@ class HistoryWindow(QMainWindow):
         title.setAlignment(Qt.AlignmentFlag.AlignCenter)
         frame_layout.addWidget(title)
         
-        # Statistics summary
-        total_alerts = 38  # This would come from your data
-        sensor_count = 5   # This would come from your data
-        summary = QLabel(f"Total Alerts: {total_alerts} | Active Sensors: {sensor_count}")
-        summary.setFont(QFont("Arial", 11))
-        summary.setStyleSheet("color: #2c3e50; margin-bottom: 15px;")
-        summary.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        frame_layout.addWidget(summary)
+        # Statistics summary, filled in once the summary query returns
+        self.summary = QLabel("Loading…")
+        self.summary.setFont(QFont("Arial", 11))
+        self.summary.setStyleSheet("color: #2c3e50; margin-bottom: 15px;")
+        self.summary.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        frame_layout.addWidget(self.summary)
+        
+        # Alerts per day from the daily counters, which survive pruning
+        self.recent_alerts = QLabel()
+        self.recent_alerts.setFont(QFont("Arial", 10))
+        self.recent_alerts.setStyleSheet("color: #2c3e50; margin-bottom: 15px;")
+        self.recent_alerts.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        frame_layout.addWidget(self.recent_alerts)
         
-        # Table setup
-        self.table = QTableWidget()
-        self.table.setColumnCount(4)
-        self.table.setHorizontalHeaderLabels(["Sensor Type", "ID", "Location", "Alert Count"])
-        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.table.verticalHeader().setVisible(False)
-        self.table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        tabs = QTabWidget()
         
-        # Sample data - replace with your actual data
-        self.alert_data = [
-            {"type": "Motion Sensor", "id": "MS-001", "location": "Main Entrance", "alerts": 12},
-            {"type": "Door Sensor", "id": "DS-005", "location": "Back Door", "alerts": 8},
-            {"type": "Glass Break", "id": "GB-003", "location": "Living Room", "alerts": 3},
-            {"type": "Motion Sensor", "id": "MS-007", "location": "Garage", "alerts": 15},
-            {"type": "Temperature", "id": "TEMP-009", "location": "Server Room", "alerts": 0}
-        ]
+        # Per-sensor summary table
+        self.summary_model = AlertSummaryModel(self)
+        self.table = self.create_table_view(self.summary_model)
+        tabs.addTab(self.table, "Summary")
         
-        # Populate table
-        self.table.setRowCount(len(self.alert_data))
-        for row, data in enumerate(self.alert_data):
-            self.table.setItem(row, 0, QTableWidgetItem(data["type"]))
-            self.table.setItem(row, 1, QTableWidgetItem(data["id"]))
-            self.table.setItem(row, 2, QTableWidgetItem(data["location"]))
-            
-            # Color code alert counts
-            alert_item = QTableWidgetItem(str(data["alerts"]))
-            if data["alerts"] > 10:
-                alert_item.setForeground(QColor("#c0392b"))  # Red for high alerts
-            elif data["alerts"] > 5:
-                alert_item.setForeground(QColor("#e67e22"))  # Orange for medium
-            else:
-                alert_item.setForeground(QColor("#27ae60"))  # Green for low
-                
-            self.table.setItem(row, 3, alert_item)
+        # Raw event log, paged in from the database while scrolling
+        events_tab = QWidget()
+        events_layout = QVBoxLayout(events_tab)
+        events_layout.setContentsMargins(0, 0, 0, 0)
+        events_layout.addWidget(self.create_filter_bar())
         
-        frame_layout.addWidget(self.table)
+        # Shown when the range reaches back past the raw events still kept
+        self.pruned_note = QLabel()
+        self.pruned_note.setStyleSheet("color: #7f8c8d;")
+        self.pruned_note.hide()
+        events_layout.addWidget(self.pruned_note)
+        
+        self.events_model = EventTableModel(self.db, runner=self.runner, parent=self)
+        self.events_table = self.create_table_view(self.events_model)
+        events_layout.addWidget(self.events_table)
+        tabs.addTab(events_tab, "Events")
+        
+        # Counts per minute, hour or day from the rollups, for the same filters
+        activity_tab = QWidget()
+        activity_layout = QVBoxLayout(activity_tab)
+        activity_layout.setContentsMargins(0, 0, 0, 0)
+        self.activity_label = QLabel()
+        self.activity_label.setStyleSheet("color: #2c3e50;")
+        activity_layout.addWidget(self.activity_label)
+        self.activity_model = ActivityModel(self)
+        activity_layout.addWidget(self.create_table_view(self.activity_model))
+        tabs.addTab(activity_tab, "Activity")
+        self._activity_query = None
+        self.retention_policy = None  # Loaded with the rest in refresh()
+        
+        frame_layout.addWidget(tabs)
         
         # Close button
         btn_close = QPushButton("Close")
@@ -125,274 +157,175 @@ class HistoryWindow(QMainWindow):
         self.animation.setDuration(800)
         self.animation.setStartValue(0)
         self.animation.setEndValue(1)
-        self.animation.start()
-
-class DashboardWindow(QMainWindow):
-    def __init__(self):
-        super().__init__()
-        self.setWindowTitle("Security Dashboard")
-        self.setMinimumSize(500, 350)
-
-        # Gradient background
-        central_widget = QWidget()
-        self.setCentralWidget(central_widget)
-        
-        gradient = QLinearGradient(0, 0, 0, 1)
-        gradient.setCoordinateMode(QLinearGradient.CoordinateMode.ObjectMode)
-        gradient.setColorAt(0, QColor("#1e3c72"))
-        gradient.setColorAt(1, QColor("#2a5298"))
         
-        palette = self.palette()
-        palette.setBrush(QPalette.ColorRole.Window, QBrush(gradient))
-        central_widget.setAutoFillBackground(True)
-        central_widget.setPalette(palette)
-
-        # Main layout
-        layout = QVBoxLayout(central_widget)
-        layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        layout.setSpacing(20)
-        layout.setContentsMargins(30, 30, 30, 30)
-
-        # Styled frame
-        frame = QFrame()
-        frame.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-        frame.setStyleSheet("""
-            QFrame {
-                background-color: rgba(255, 255, 255, 0.9);
-                border-radius: 15px;
-                padding: 20px;
-            }
-        """)
-        frame_layout = QVBoxLayout(frame)
-        frame_layout.setSpacing(20)
-
-        # Title
-        title = QLabel("Security Controls")
-        title.setFont(QFont("Arial", 18, QFont.Weight.Bold))
-        title.setStyleSheet("color: #1e3c72;")
-        title.setAlignment(Qt.AlignmentFlag.AlignCenter)
-        frame_layout.addWidget(title)
-
-        # Status Switch
-        status_container = QWidget()
-        status_layout = QHBoxLayout(status_container)
-        status_layout.setContentsMargins(0, 0, 0, 0)
-        status_layout.setSpacing(10)
+        self.refresh()
+    
+    def refresh(self):
+        """Reload everything in the background and replay the fade-in"""
+        self.runner.cancel_all()
+        self.summary.setText("Loading…")
+        self.runner.submit(self.db.get_alert_summary, self.on_summary_loaded)
+        self.runner.submit(self.db.get_daily_alerts, self.on_daily_alerts_loaded, RECENT_DAYS - 1)
+        self.runner.submit(self.db.get_locations, self.on_locations_loaded)
+        self.runner.submit(self.load_retention_policy, self.on_retention_policy_loaded)
+        self.apply_filters()
+        self.animation.start()
+    
+    def on_summary_loaded(self, summary_data):
+        total_alerts = sum(item['alert_count'] for item in summary_data)
+        sensor_count = len(summary_data)
+        self.summary.setText(f"Total Alerts: {total_alerts} | Active Sensors: {sensor_count}")
+        self.summary_model.set_rows(summary_data)
+    
+    def on_daily_alerts_loaded(self, days):
+        today = time.strftime("%Y-%m-%d")
+        today_count = sum(day['alert_count'] for day in days if day['day'] == today)
+        recent_count = sum(day['alert_count'] for day in days)
+        self.recent_alerts.setText(
+            f"Today: {today_count} | Last {RECENT_DAYS} days: {recent_count}")
+    
+    def load_retention_policy(self, cancel=None):
+        return RetentionPolicy.load(self.db)
+    
+    def on_retention_policy_loaded(self, policy):
+        self.retention_policy = policy
+        filters = self.current_filters()
+        self.update_pruned_note(filters)
+        self.load_activity(filters)
+    
+    def on_locations_loaded(self, locations):
+        selected = self.location_filter.currentData()
+        self.location_filter.blockSignals(True)
+        self.location_filter.clear()
+        self.location_filter.addItem("All locations", None)
+        for location in locations:
+            self.location_filter.addItem(location, location)
+        index = self.location_filter.findData(selected)
+        self.location_filter.setCurrentIndex(max(index, 0))
+        self.location_filter.blockSignals(False)
+    
+    def create_filter_bar(self):
+        """Controls that narrow the event log down"""
+        bar = QWidget()
+        bar_layout = QHBoxLayout(bar)
+        bar_layout.setContentsMargins(0, 0, 0, 0)
         
-        status_label = QLabel("Status of the sensor:")
-        status_label.setStyleSheet("""
-            color: #555555;
-            font-size: 14px;
-            font-weight: bold;
-        """)
-        status_layout.addWidget(status_label)
-
-        self.toggle_status = QPushButton("OFF")
-        self.toggle_status.setCheckable(True)
-        self.toggle_status.setStyleSheet("""
-            QPushButton {
-                background-color: #cccccc;
-                color: white;
-                padding: 8px 20px;
-                border: none;
-                border-radius: 15px;
-                font-size: 14px;
-                font-weight: bold;
-                min-width: 80px;
-                max-width: 80px;
-            }
-            QPushButton:checked {
-                background-color: #4CAF50;
-            }
-        """)
-        self.toggle_status.toggled.connect(self.update_toggle_text)
-        status_layout.addWidget(self.toggle_status)
-        status_layout.addStretch()
-        frame_layout.addWidget(status_container)
-
-        # Alert Level Slider
-        slider_container = QWidget()
-        slider_layout = QVBoxLayout(slider_container)
-        slider_layout.setSpacing(5)
+        self.range_filter = QComboBox()
+        for label, seconds in TIME_RANGES:
+            self.range_filter.addItem(label, seconds)
+        bar_layout.addWidget(self.range_filter)
         
-        slider_title = QLabel("Set the level of the alarm")
-        slider_title.setStyleSheet("""
-            color: #555555;
-            font-size: 14px;
-            font-weight: bold;
-        """)
-        slider_layout.addWidget(slider_title)
-
-        self.slider = QSlider(Qt.Orientation.Horizontal)
-        self.slider.setRange(0, 2)
-        self.slider.setPageStep(1)
-        self.slider.setTickPosition(QSlider.TickPosition.TicksBelow)
-        self.slider.setTickInterval(1)
+        self.sensor_filter = QLineEdit()
+        self.sensor_filter.setPlaceholderText("Sensor IDs, e.g. 1, 4, 12")
+        self.sensor_filter.returnPressed.connect(self.apply_filters)
+        bar_layout.addWidget(self.sensor_filter)
         
-        # Base slider style
-        self.slider.setStyleSheet("""
-            QSlider {
-                min-height: 30px;
-            }
-            QSlider::groove:horizontal {
-                height: 8px;
-                background: #d3d3d3;
-                border-radius: 4px;
-                margin: 0 10px;
-            }
-            QSlider::handle:horizontal {
-                width: 20px;
-                height: 20px;
-                margin: -6px -10px;
-                background: #1e3c72;
-                border-radius: 10px;
-            }
-        """)
+        self.type_filter = QComboBox()
+        for label, event_type in EVENT_TYPES:
+            self.type_filter.addItem(label, event_type)
+        bar_layout.addWidget(self.type_filter)
         
-        self.slider.valueChanged.connect(self.update_slider_style)
-        slider_layout.addWidget(self.slider)
-
-        # Level labels
-        self.labels_container = QWidget()
-        labels_layout = QHBoxLayout(self.labels_container)
-        labels_layout.setContentsMargins(10, 0, 10, 0)
+        self.location_filter = QComboBox()
+        self.location_filter.addItem("All locations", None)
+        bar_layout.addWidget(self.location_filter)
         
-        self.level_labels = []
-        for i, text in enumerate(["Low", "Medium", "High"]):
-            label = ClickableLabel(text)
-            label.setProperty('level', i)
-            label.setStyleSheet("""
-                ClickableLabel {
-                    color: #555555;
-                    padding: 0 15px;
-                }
-                ClickableLabel:hover {
-                    color: #333333;
-                    font-weight: bold;
-                }
-            """)
-            label.setAlignment(Qt.AlignmentFlag.AlignCenter)
-            label.clicked.connect(self.on_label_clicked)
-            labels_layout.addWidget(label)
-            self.level_labels.append(label)
+        self.level_filter = QComboBox()
+        self.level_filter.addItem("Any level", None)
+        for level, label in enumerate(ALARM_LEVELS):
+            self.level_filter.addItem(f"{label}+", level)
+        bar_layout.addWidget(self.level_filter)
         
-        slider_layout.addWidget(self.labels_container)
-        frame_layout.addWidget(slider_container)
-
-        # Initialize
-        self.update_slider_style(0)
-
-        # History button
-        self.button_history = QPushButton("Show Alert History")
-        self.button_history.setStyleSheet("""
+        btn_apply = QPushButton("Apply")
+        btn_apply.setStyleSheet("""
             QPushButton {
                 background-color: #3498db;
                 color: white;
-                padding: 10px 20px;
-                border-radius: 8px;
+                padding: 5px 15px;
+                border-radius: 5px;
                 font-weight: bold;
-                min-width: 150px;
             }
             QPushButton:hover {
                 background-color: #2980b9;
             }
         """)
-        self.button_history.clicked.connect(self.show_history)
-        frame_layout.addWidget(self.button_history, 0, Qt.AlignmentFlag.AlignCenter)
-
-        # Logout button
-        self.button_logout = QPushButton("Logout")
-        self.button_logout.setStyleSheet("""
-            QPushButton {
-                background-color: #e74c3c;
-                color: white;
-                padding: 10px 20px;
-                border-radius: 8px;
-                font-weight: bold;
-                min-width: 100px;
-            }
-            QPushButton:hover {
-                background-color: #c0392b;
-            }
-        """)
-        frame_layout.addWidget(self.button_logout, 0, Qt.AlignmentFlag.AlignCenter)
-
-        layout.addWidget(frame)
-
-        # Fade-in animation
-        self.animation = QPropertyAnimation(self, b"windowOpacity")
-        self.animation.setDuration(800)
-        self.animation.setStartValue(0)
-        self.animation.setEndValue(1)
-        self.animation.start()
-
-    def update_toggle_text(self, checked):
-        self.toggle_status.setText("ON" if checked else "OFF")
-
-    def on_label_clicked(self):
-        """Handle label clicks without lambda issues"""
-        sender = self.sender()
-        level = sender.property('level')
-        self.slider.setValue(level)
-
-    def update_slider_style(self, value):
-        """Update slider and label styles based on current value"""
-        # Color mapping
-        colors = {
-            0: ("#4CAF50", "#388E3C"),  # Green (Low)
-            1: ("#2196F3", "#1976D2"),  # Blue (Medium)
-            2: ("#FF9800", "#F57C00")   # Orange (High)
-        }
-        
-        # Update slider style
-        color, dark_color = colors[value]
-        self.slider.setStyleSheet(f"""
-            QSlider {{
-                min-height: 30px;
-            }}
-            QSlider::groove:horizontal {{
-                height: 8px;
-                background: #d3d3d3;
-                border-radius: 4px;
-                margin: 0 10px;
-            }}
-            QSlider::sub-page:horizontal {{
-                background: {color};
-                border-radius: 4px;
-            }}
-            QSlider::handle:horizontal {{
-                width: 20px;
-                height: 20px;
-                margin: -6px -10px;
-                background: {dark_color};
-                border-radius: 10px;
-            }}
-        """)
-        
-        # Update label styles
-        for i, label in enumerate(self.level_labels):
-            if i == value:
-                label.setStyleSheet(f"""
-                    ClickableLabel {{
-                        color: {dark_color};
-                        font-weight: bold;
-                        padding: 0 15px;
-                    }}
-                """)
-            else:
-                label.setStyleSheet("""
-                    ClickableLabel {
-                        color: #555555;
-                        padding: 0 15px;
-                    }
-                    ClickableLabel:hover {
-                        color: #333333;
-                        font-weight: bold;
-                    }
-                """)
+        btn_apply.clicked.connect(self.apply_filters)
+        bar_layout.addWidget(btn_apply)
+        return bar
+    
+    def current_filters(self):
+        """Translate the filter controls into query_events arguments"""
+        filters = {}
+        seconds = self.range_filter.currentData()
+        if seconds is not None:
+            filters["since"] = time.time() - seconds
+        sensor_ids = [int(part) for part in self.sensor_filter.text().replace(",", " ").split()
+                      if part.isdigit()]
+        if sensor_ids:
+            filters["sensor_ids"] = sensor_ids
+        if self.type_filter.currentData() is not None:
+            filters["event_types"] = [self.type_filter.currentData()]
+        if self.location_filter.currentData() is not None:
+            filters["locations"] = [self.location_filter.currentData()]
+        if self.level_filter.currentData() is not None:
+            filters["alarm_level"] = self.level_filter.currentData()
+        return filters
+    
+    def apply_filters(self):
+        filters = self.current_filters()
+        self.events_model.set_filters(**filters)
+        # An empty model has no rows to scroll, so ask for the first page here
+        self.events_model.fetchMore()
+        self.update_pruned_note(filters)
+        self.load_activity(filters)
+    
+    def update_pruned_note(self, filters):
+        """Say so when the range starts before the oldest raw events kept"""
+        policy = self.retention_policy
+        cutoff = None if policy is None else policy.raw_cutoff(time.time())
+        if cutoff is None or filters.get("since", 0) >= cutoff:
+            self.pruned_note.hide()
+            return
+        self.pruned_note.setText(
+            f"Raw events are kept for {policy.raw_days} day{'s' if policy.raw_days != 1 else ''}; "
+            "the Activity tab counts older ones")
+        self.pruned_note.show()
+    
+    def load_activity(self, filters):
+        # Long ranges read coarser buckets, so the query stays small, and
+        # detail the retention policy has already pruned is skipped
+        resolution = choose_resolution(filters.get("since"), policy=self.retention_policy)
+        if self._activity_query is not None:
+            self.runner.cancel(self._activity_query)
+        self.activity_label.setText("Loading…")
+        self._activity_query = self.runner.submit(
+            self.db.query_rollups, lambda rows: self.on_activity_loaded(rows, resolution),
+            resolution, **filters
+        )
+    
+    def on_activity_loaded(self, rows, resolution):
+        self._activity_query = None
+        self.activity_model.set_rows(rows, resolution)
+        self.activity_label.setText(
+            f"Per {RESOLUTION_NAMES.get(resolution, 'minute')} (updated every minute)")
+    
+    def create_table_view(self, model):
+        table = QTableView()
+        table.setModel(model)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
+        table.verticalHeader().setVisible(False)
+        # Fixed row heights let the view skip measuring every row
+        table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
+        table.setEditTriggers(QTableView.EditTrigger.NoEditTriggers)
+        table.setSelectionBehavior(QTableView.SelectionBehavior.SelectRows)
+        return table
+    
+    def shutdown(self):
+        """Cancel queries and wait for the workers, before the pool closes"""
+        self.runner.cancel_all(wait=True)
+        self.db.close()
     
-    def show_history(self):
-        """Show the alert history window"""
-        self.history_window = HistoryWindow(self)
-        self.history_window.show()
-        
\ No newline at end of file
+    def closeEvent(self, event):
+        # Stop loading; the window is kept for the next show_history()
+        self.runner.cancel_all()
+        self.events_model.cancel()
+        event.accept()
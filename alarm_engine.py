@@ -0,0 +1,306 @@
+"""Alarm rules evaluated incrementally against sensor state changes.
+
+The Low/Medium/High alarm level (the dashboard slider) arms rules: a rule
+of level L is armed while the system level is L or higher, and raises
+alarms of level L. A rule applies to some sensors, to the sensors of some
+zones (locations), or to every sensor, and fires on one of:
+
+    count, window   count openings within window seconds (count 1: every
+                    opening), per sensor, or across the zone for zone rules
+    open_for        a sensor stays open for open_for seconds
+
+armed=("22:00", "06:00") restricts a rule to a time of day (local time;
+the range may wrap midnight), and after firing a rule stays quiet for
+cooldown seconds per sensor or zone, so a chattering contact raises one
+alarm instead of thousands.
+
+Rules are compiled once into a per-sensor lookup table, so each state
+change costs a dictionary lookup plus a few comparisons per matching rule
+and an alarm storm is evaluated as fast as it arrives. Open-duration
+rules are kept in a deadline heap that check() pops as time passes.
+
+Rules can be read from a JSON file, a list of AlarmRule arguments:
+
+    [{"name": "Night entry", "level": 0, "zones": ["Entrance"], "armed": ["22:00", "06:00"]},
+     {"name": "Door held open", "level": 1, "open_for": 120}]
+"""
+import heapq
+import itertools
+import json
+import os
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from modbus_client import SensorState
+from profiling import span
+
+RULES_PATH = os.environ.get("MONITORING_RULES")
+LEVELS = (0, 1, 2)  # Low, Medium, High
+
+ALARMS_RAISED = REGISTRY.counter("alarms_raised_total", "Alarms raised by the alarm engine", ("rule",))
+
+
+class AlarmRule:
+    """One configured rule; see the module docstring for the fields"""
+
+    def __init__(self, name, level=0, sensors=(), zones=(), count=1, window=0.0,
+                 open_for=0.0, armed=None, cooldown=60.0):
+        if level not in LEVELS:
+            raise ValueError(f"Rule {name!r}: unknown alarm level {level}")
+        if count < 1 or (count > 1 and window <= 0):
+            raise ValueError(f"Rule {name!r}: count needs a positive window")
+        if open_for and count > 1:
+            raise ValueError(f"Rule {name!r}: open_for and count cannot be combined")
+        self.name = name
+        self.level = level
+        self.sensors = tuple(sensors)
+        self.zones = tuple(zones)
+        self.count = count
+        self.window = window
+        self.open_for = open_for
+        self.armed = None if armed is None else (_seconds_of_day(armed[0]), _seconds_of_day(armed[1]))
+        self.cooldown = cooldown
+
+    def __repr__(self):
+        return f"AlarmRule({self.name!r}, level={self.level})"
+
+
+class Alarm:
+    """An alarm raised by a rule"""
+    __slots__ = ("rule", "level", "sensor_id", "zone", "timestamp")
+
+    def __init__(self, rule, level, sensor_id, zone, timestamp):
+        self.rule = rule  # rule name
+        self.level = level
+        self.sensor_id = sensor_id  # the sensor whose change raised it
+        self.zone = zone  # None for sensors without a zone
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"Alarm({self.rule!r}, level={self.level}, sensor={self.sensor_id}, {self.timestamp:.3f})"
+
+
+# Default rules when no rules file is configured
+DEFAULT_RULES = (
+    AlarmRule("Repeated openings", level=0, count=5, window=600),
+    AlarmRule("Held open", level=1, open_for=60),
+    AlarmRule("Intrusion", level=2),
+)
+
+
+def _seconds_of_day(text):
+    hours, minutes = text.split(":")
+    return int(hours) * 3600 + int(minutes) * 60
+
+
+def load_rules(path=RULES_PATH):
+    """AlarmRules from a JSON file, or DEFAULT_RULES without one"""
+    if not path:
+        return list(DEFAULT_RULES)
+    with open(path) as f:
+        return [AlarmRule(**rule) for rule in json.load(f)]
+
+
+def zones_from_sensors(sensors):
+    """{zone: [sensor_id]} from MonitoringDB.get_sensors() rows"""
+    zones = {}
+    for sensor in sensors:
+        zones.setdefault(sensor["location"], []).append(sensor["id"])
+    return zones
+
+
+class _CompiledRule:
+    def __init__(self, rule, engine):
+        self.rule = rule
+        self.engine = engine
+        self.level = rule.level
+        self.armed = rule.armed
+        self.cooldown = rule.cooldown
+        self._fired = {}  # key -> time of the last alarm
+
+    def is_armed(self, timestamp):
+        if self.engine.level < self.level:
+            return False
+        if self.armed is None:
+            return True
+        start, end = self.armed
+        now = self.engine.second_of_day(timestamp)
+        return start <= now < end if start <= end else now >= start or now < end
+
+    def fire(self, key, sensor_id, timestamp):
+        """Alarm for key, or None while it is cooling down from the last one"""
+        last = self._fired.get(key)
+        if last is not None and timestamp - last < self.cooldown:
+            return None
+        self._fired[key] = timestamp
+        return Alarm(self.rule.name, self.level, sensor_id,
+                     self.engine.zone_of.get(sensor_id), timestamp)
+
+
+class _CountRule(_CompiledRule):
+    def __init__(self, rule, engine):
+        super().__init__(rule, engine)
+        self.count = rule.count
+        self.window = rule.window
+        self._openings = {}  # key -> deque of opening times in the window
+
+    def opened(self, key, sensor_id, timestamp):
+        if not self.is_armed(timestamp):
+            return None
+        if self.count == 1:
+            return self.fire(key, sensor_id, timestamp)
+        openings = self._openings.get(key)
+        if openings is None:
+            openings = self._openings[key] = deque()
+        openings.append(timestamp)
+        horizon = timestamp - self.window
+        while openings[0] <= horizon:
+            openings.popleft()
+        if len(openings) < self.count:
+            return None
+        openings.clear()
+        return self.fire(key, sensor_id, timestamp)
+
+    def closed(self, sensor_id):
+        pass
+
+
+class _DurationRule(_CompiledRule):
+    def __init__(self, rule, engine):
+        super().__init__(rule, engine)
+        self.open_for = rule.open_for
+        self._deadlines = {}  # sensor_id -> when it will have been open long enough
+
+    def opened(self, key, sensor_id, timestamp):
+        deadline = timestamp + self.open_for
+        self._deadlines[sensor_id] = deadline
+        self.engine.schedule(deadline, self, sensor_id)
+        return None
+
+    def closed(self, sensor_id):
+        self._deadlines.pop(sensor_id, None)
+
+    def expired(self, sensor_id, deadline):
+        if self._deadlines.get(sensor_id) != deadline:
+            return None  # Closed (or reopened) since
+        del self._deadlines[sensor_id]
+        if not self.is_armed(deadline):
+            return None
+        return self.fire(sensor_id, sensor_id, deadline)
+
+
+class AlarmEngine:
+    """Evaluates compiled AlarmRules on every state change.
+
+    Subscribe evaluate() to the EventPipeline and call check() regularly
+    (about once a second) for open-duration rules. New alarms are passed to
+    the subscribers as a list. set_level() may be called from any thread.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, zones=None, level=0):
+        self.level = level
+        self.zones = {zone: list(ids) for zone, ids in (zones or {}).items()}
+        self.zone_of = {sensor_id: zone for zone, ids in self.zones.items() for sensor_id in ids}
+        self.rules = list(rules)
+        self._subscribers = []
+        self._heap = []  # (deadline, seq, rule, sensor_id)
+        self._seq = itertools.count()
+        self._states = {}  # sensor_id -> last state other than UNKNOWN
+        self._midnight = 0.0
+        self._compile()
+
+    def _compile(self):
+        """Build the sensor -> [(compiled rule, key)] lookup table"""
+        self._global = []  # rules for every sensor, keyed per sensor
+        self._targets = {}  # sensor_id -> tuple of (compiled rule, key or None for per sensor)
+        scoped = {}
+        for rule in self.rules:
+            compiled = _DurationRule(rule, self) if rule.open_for else _CountRule(rule, self)
+            if not rule.sensors and not rule.zones:
+                self._global.append((compiled, None))
+                continue
+            for sensor_id in rule.sensors:
+                scoped.setdefault(sensor_id, []).append((compiled, None))
+            for zone in rule.zones:
+                # Openings anywhere in the zone count together, except for open_for
+                key = None if rule.open_for else ("zone", zone)
+                for sensor_id in self.zones.get(zone, ()):
+                    scoped.setdefault(sensor_id, []).append((compiled, key))
+        self._scoped = scoped
+        self._global = tuple(self._global)
+
+    def _rules_for(self, sensor_id):
+        targets = tuple(self._scoped.get(sensor_id, ())) + self._global
+        self._targets[sensor_id] = targets
+        return targets
+
+    def subscribe(self, callback):
+        """Call callback(alarms) with every non-empty list of new alarms"""
+        self._subscribers.append(callback)
+
+    def set_level(self, level):
+        if level not in LEVELS:
+            raise ValueError(f"Unknown alarm level {level}")
+        self.level = level
+
+    def second_of_day(self, timestamp):
+        """Local time of day in seconds; midnight is only recomputed once a day"""
+        offset = timestamp - self._midnight
+        if not 0 <= offset < 86400:
+            day = time.localtime(timestamp)
+            self._midnight = time.mktime((day.tm_year, day.tm_mon, day.tm_mday, 0, 0, 0, 0, 0, -1))
+            offset = timestamp - self._midnight
+        return offset
+
+    def schedule(self, deadline, rule, sensor_id):
+        heapq.heappush(self._heap, (deadline, next(self._seq), rule, sensor_id))
+
+    def evaluate(self, events):
+        """Run the rules over SensorEvents from the EventPipeline"""
+        alarms = []
+        targets_of = self._targets
+        states = self._states
+        with span("alarms"):
+            for event in events:
+                if event.kind != "state" or event.value == SensorState.UNKNOWN:
+                    continue  # A lost reading neither opens nor closes the door
+                previous = states.get(event.sensor_id)
+                states[event.sensor_id] = event.value
+                if previous == event.value:
+                    continue  # Read again after a lost reading; not a new opening
+                targets = targets_of.get(event.sensor_id)
+                if targets is None:
+                    targets = self._rules_for(event.sensor_id)
+                if event.value == SensorState.OPEN:
+                    for rule, key in targets:
+                        alarm = rule.opened(event.sensor_id if key is None else key,
+                                            event.sensor_id, event.timestamp)
+                        if alarm is not None:
+                            alarms.append(alarm)
+                else:
+                    for rule, key in targets:
+                        rule.closed(event.sensor_id)
+        self._dispatch(alarms)
+        return alarms
+
+    def check(self, now=None):
+        """Raise alarms for sensors that have now been open long enough"""
+        now = time.time() if now is None else now
+        heap = self._heap
+        alarms = []
+        while heap and heap[0][0] <= now:
+            deadline, _, rule, sensor_id = heapq.heappop(heap)
+            alarm = rule.expired(sensor_id, deadline)
+            if alarm is not None:
+                alarms.append(alarm)
+        self._dispatch(alarms)
+        return alarms
+
+    def _dispatch(self, alarms):
+        if not alarms:
+            return
+        for alarm in alarms:
+            ALARMS_RAISED.labels(alarm.rule).inc()
+        for callback in self._subscribers:
+            callback(alarms)
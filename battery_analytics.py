@@ -0,0 +1,211 @@
+"""Battery depletion trends and replacement forecasts for every sensor.
+
+Enless sensors are rated for a 20-year battery life. A straight line is
+fitted to the battery level of every sensor at once with NumPy, using
+only readings since the sensor's last battery change (a jump up in
+level). By default the fit comes from the least-squares sums the database
+keeps per sensor (battery_trend), one row each however many years of
+readings there are. For a window of history the daily rollup
+(battery_daily) is read in buckets of a few days and fitted instead.
+
+    python battery_analytics.py --threshold 20
+    python battery_analytics.py --years 2
+"""
+import argparse
+import time
+
+import numpy as np
+
+from database import (
+    BATTERY_REPLACEMENT_JUMP as REPLACEMENT_JUMP, TREND_EPOCH, MonitoringDB, close_pool,
+    initialize_database
+)
+
+RATED_LIFE_YEARS = 20
+REPLACEMENT_LEVEL = 20  # Percent; matches the "low" battery band
+DAY = 86400.0
+YEAR = 365.25 * DAY
+MIN_DRAIN = 0.1 * DAY / YEAR  # Percent per day; slower is no measurable drain
+
+
+class BatteryForecast:
+    """Per-sensor depletion fit; each attribute is an array over sensor_ids.
+
+    slope is in percent per day (negative while draining). level is the
+    fitted level at last_seen, within 0-100. replacement_time is when the fit reaches the
+    replacement level, and life_years the life of a full battery at that
+    drain rate; both are NaN for sensors with no measurable drain.
+    """
+
+    def __init__(self, sensor_ids, samples, slope, level, first_seen, last_seen,
+                 threshold=REPLACEMENT_LEVEL):
+        self.sensor_ids = sensor_ids
+        self.samples = samples
+        self.slope = slope
+        self.level = np.clip(level, 0.0, 100.0)
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.threshold = threshold
+        with np.errstate(divide="ignore", invalid="ignore"):
+            draining = slope < -MIN_DRAIN
+            days_left = np.where(draining, (self.level - threshold) / -slope, np.nan)
+            self.replacement_time = last_seen + np.maximum(days_left, 0.0) * DAY
+            self.life_years = np.where(draining, (100.0 - threshold) / -slope * DAY / YEAR, np.nan)
+
+    def __len__(self):
+        return len(self.sensor_ids)
+
+    def due_within(self, seconds, now=None):
+        """IDs of sensors projected to need a new battery within seconds"""
+        now = time.time() if now is None else now
+        return self.sensor_ids[self.replacement_time <= now + seconds]
+
+    def short_lived(self, years=RATED_LIFE_YEARS):
+        """IDs of sensors draining faster than the rated battery life allows"""
+        return self.sensor_ids[self.life_years < years]
+
+    def rows(self):
+        """One dict per sensor, soonest replacement first, for reports"""
+        order = np.argsort(self.replacement_time, kind="stable")  # NaN (no drain) sorts last
+        rows = []
+        for i in order:
+            replacement = self.replacement_time[i]
+            rows.append({
+                "sensor_id": int(self.sensor_ids[i]),
+                "samples": int(self.samples[i]),
+                "level": float(self.level[i]),
+                "slope_per_year": float(self.slope[i] * YEAR / DAY),
+                "last_seen": float(self.last_seen[i]),
+                "replacement_time": None if np.isnan(replacement) else float(replacement),
+                "life_years": None if np.isnan(self.life_years[i]) else float(self.life_years[i]),
+            })
+        return rows
+
+
+def fit_depletion(sensor_ids, times, levels, threshold=REPLACEMENT_LEVEL,
+                  replacement_jump=REPLACEMENT_JUMP):
+    """Fit level = a + slope * t per sensor in one vectorized pass.
+
+    The inputs are parallel arrays of readings, grouped by sensor and in
+    time order within a sensor (as bucket_history returns them).
+    """
+    sensor_ids = np.asarray(sensor_ids, np.int64)
+    times = np.asarray(times, np.float64)
+    levels = np.asarray(levels, np.float64)
+    if not len(sensor_ids):
+        empty = np.empty(0)
+        return BatteryForecast(sensor_ids, empty, empty, empty, empty, empty, threshold)
+
+    # Keep only the readings since each sensor's last battery change
+    same_sensor = sensor_ids[1:] == sensor_ids[:-1]
+    new_segment = np.ones(len(sensor_ids), bool)
+    new_segment[1:] = ~same_sensor | (levels[1:] - levels[:-1] > replacement_jump)
+    segment = np.cumsum(new_segment)
+    sensor_start = np.flatnonzero(np.concatenate(([True], ~same_sensor)))
+    group = np.cumsum(np.concatenate(([False], ~same_sensor)))
+    last_segment = np.maximum.reduceat(segment, sensor_start)
+    keep = segment == last_segment[group]
+    group, times, levels = group[keep], times[keep], levels[keep]
+
+    # Least squares on centred values; time in days
+    days = (times - times.min()) / DAY
+    count = np.bincount(group)
+    mean_day = np.bincount(group, days) / count
+    mean_level = np.bincount(group, levels) / count
+    day_offset = days - mean_day[group]
+    sxx = np.bincount(group, day_offset * day_offset)
+    sxy = np.bincount(group, day_offset * (levels - mean_level[group]))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(sxx > 0, sxy / sxx, np.nan)
+
+    group_start = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    first_seen = times[group_start]
+    last_seen = np.maximum.reduceat(times, group_start)
+    last_day = (last_seen - times.min()) / DAY
+    level = np.where(np.isnan(slope), mean_level, mean_level + np.nan_to_num(slope) * (last_day - mean_day))
+    return BatteryForecast(sensor_ids[sensor_start], count, slope, level, first_seen, last_seen,
+                           threshold)
+
+
+def fit_trends(rows, threshold=REPLACEMENT_LEVEL):
+    """BatteryForecast from get_battery_trends() rows of least-squares sums"""
+    if not rows:
+        return fit_depletion((), (), (), threshold)
+    sums = np.array(rows, np.float64)
+    sensor_ids = sums[:, 0].astype(np.int64)
+    count, day_sum, level_sum, day_day_sum, day_level_sum, first_seen, last_seen = sums[:, 1:].T
+    mean_day = day_sum / count
+    mean_level = level_sum / count
+    sxx = day_day_sum - day_sum * mean_day
+    sxy = day_level_sum - day_sum * mean_level
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # Less than an hour of spread is rounding error, not a trend
+        slope = np.where(sxx > count * 1e-3, sxy / sxx, np.nan)
+    last_day = (last_seen - TREND_EPOCH) / DAY
+    level = np.where(np.isnan(slope), mean_level, mean_level + np.nan_to_num(slope) * (last_day - mean_day))
+    return BatteryForecast(sensor_ids, count, slope, level, first_seen, last_seen, threshold)
+
+
+def bucket_history(rows, bucket_days=7):
+    """Average get_battery_history() rows over bucket_days.
+
+    Returns parallel (sensor_ids, mean times, mean levels) arrays, in the
+    order fit_depletion expects.
+    """
+    days = np.array(rows, np.float64)
+    sensor_ids = days[:, 0].astype(np.int64)
+    bucket = days[:, 1] // max(1, int(bucket_days))
+    start = np.flatnonzero(np.r_[True, (sensor_ids[1:] != sensor_ids[:-1]) | (bucket[1:] != bucket[:-1])])
+    samples = np.add.reduceat(days[:, 2], start)
+    return (sensor_ids[start], np.add.reduceat(days[:, 4], start) / samples,
+            np.add.reduceat(days[:, 3], start) / samples)
+
+
+def forecast(db, since=None, bucket_days=7, threshold=REPLACEMENT_LEVEL, cancel=None):
+    """BatteryForecast for every sensor with battery readings in db.
+
+    Without since, fitted from the maintained per-sensor sums; with it,
+    from the daily history since then, averaged over bucket_days.
+    """
+    if since is None:
+        return fit_trends(db.get_battery_trends(cancel=cancel), threshold)
+    rows = db.get_battery_history(since, cancel=cancel)
+    if not rows:
+        return fit_depletion((), (), (), threshold)
+    return fit_depletion(*bucket_history(rows, bucket_days), threshold)
+
+
+def format_report(result, now=None):
+    now = time.time() if now is None else now
+    lines = [f"{'sensor':>7s} {'level %':>8s} {'%/year':>8s} {'life y':>7s} {'replace by':>11s}"]
+    for row in result.rows():
+        replacement = row["replacement_time"]
+        when = "-" if replacement is None else time.strftime("%Y-%m-%d", time.localtime(replacement))
+        life = "-" if row["life_years"] is None else f"{row['life_years']:.1f}"
+        flag = "  due" if replacement is not None and replacement <= now else ""
+        if row["life_years"] is not None and row["life_years"] < RATED_LIFE_YEARS:
+            flag += "  short life"
+        lines.append(f"{row['sensor_id']:7d} {row['level']:8.1f} {row['slope_per_year']:8.2f} "
+                     f"{life:>7s} {when:>11s}{flag}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Battery replacement forecast")
+    parser.add_argument("--threshold", type=float, default=REPLACEMENT_LEVEL,
+                        help="battery percent at which a sensor needs a new battery")
+    parser.add_argument("--bucket-days", type=int, default=7, help="days averaged per point")
+    parser.add_argument("--years", type=float, default=None,
+                        help="refit from the last N years of history only")
+    args = parser.parse_args(argv)
+
+    initialize_database()
+    since = None if args.years is None else time.time() - args.years * YEAR
+    try:
+        print(format_report(forecast(MonitoringDB(), since, args.bucket_days, args.threshold)))
+    finally:
+        close_pool()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""Benchmarks for the polling, decoding, UI and persistence hot paths.
+
+Runs headless (offscreen Qt platform) against the local simulator and a
+throwaway database, and saves the results as JSON:
+
+    python benchmark.py --sensors 300 --output before.json
+    python benchmark.py --sensors 300 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+# Before anything imports Qt or the database module
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+_db_dir = tempfile.TemporaryDirectory(prefix="monitoring-bench-")
+os.environ["MONITORING_DB"] = os.path.join(_db_dir.name, "benchmark.db")
+
+from modbus_client import (  # noqa: E402
+    MBAPFrameReader, ModbusClient, ModbusFunction, SensorState, create_modbus_request,
+    decode_bits, decode_registers
+)
+from modbus_simulator import ModbusSimulator, SensorBank  # noqa: E402
+from read_planner import ReadPlanner  # noqa: E402
+
+
+def percentiles(samples, points=(50, 90, 99)):
+    """Percentiles of samples (in seconds) as milliseconds"""
+    ordered = sorted(samples)
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, int(round(point / 100.0 * (len(ordered) - 1))))
+        result[f"p{point}_ms"] = ordered[index] * 1000
+    result["mean_ms"] = statistics.fmean(ordered) * 1000
+    result["max_ms"] = ordered[-1] * 1000
+    return result
+
+
+def bench_encode(count):
+    """create_modbus_request calls per second"""
+    functions = (ModbusFunction.READ_DISCRETE_INPUTS, ModbusFunction.READ_INPUT_REGISTERS)
+    start = time.perf_counter()
+    for i in range(count):
+        create_modbus_request(functions[i & 1], i & 0xFF, 16, transaction_id=i & 0xFFFF or 1)
+    elapsed = time.perf_counter() - start
+    return {"requests": count, "requests_per_sec": count / elapsed}
+
+
+def bench_decode(count, chunk_size=1460):
+    """Frames split out of a TCP-sized byte stream and decoded per second"""
+    bits = struct.pack(">HHHBBB", 1, 0, 5, 1, ModbusFunction.READ_DISCRETE_INPUTS, 2) + b"\x55\xaa"
+    registers = struct.pack(">HHHBBB", 2, 0, 35, 1, ModbusFunction.READ_INPUT_REGISTERS, 32)
+    registers += bytes(range(32))
+    stream = b"".join(bits if i & 1 else registers for i in range(count))
+    reader = MBAPFrameReader()
+    decoded = 0
+    start = time.perf_counter()
+    for offset in range(0, len(stream), chunk_size):
+        reader.feed(stream[offset:offset + chunk_size])
+        for frame in reader.frames():
+            if frame[7] == ModbusFunction.READ_DISCRETE_INPUTS:
+                decode_bits(frame, 16)
+            else:
+                decode_registers(frame, 16)
+            decoded += 1
+    elapsed = time.perf_counter() - start
+    return {"frames": decoded, "frames_per_sec": decoded / elapsed,
+            "megabytes_per_sec": len(stream) / elapsed / 1e6}
+
+
+def start_simulator(sensors, latency):
+    """Run a simulator on its own thread and loop, as a real receiver would be"""
+    bank = SensorBank(sensors, state_change_rate=0.1, seed=1)
+    simulator = ModbusSimulator(bank, port=0, latency=latency, seed=1)
+    ready = threading.Event()
+
+    def run():
+        async def serve():
+            await simulator.start()
+            ready.set()
+            await simulator.serve_forever()
+        try:
+            asyncio.run(serve())
+        except asyncio.CancelledError:
+            pass
+
+    threading.Thread(target=run, name="ModbusSimulator", daemon=True).start()
+    ready.wait()
+    return bank, simulator
+
+
+async def _poll_cycles(port, bank, cycles, attributes):
+    client = await ModbusClient.connect("127.0.0.1", port, timeout=5.0)
+    planner = ReadPlanner(bank.sensor_configs())
+    samples = []
+    try:
+        await planner.read(client, attributes)  # Warm up
+        for _ in range(cycles):
+            start = time.perf_counter()
+            await planner.read(client, attributes)
+            samples.append(time.perf_counter() - start)
+    finally:
+        client.close()
+    return samples, len(planner.plan(attributes))
+
+
+def bench_poll(sensors, cycles, latency):
+    """Latency of one read of every sensor through ReadPlanner"""
+    bank, simulator = start_simulator(sensors, latency)
+    results = {"sensors": sensors, "simulated_latency_ms": latency * 1000}
+    for name, attributes in (("state", ("state",)), ("state_and_battery", ("state", "battery"))):
+        samples, requests = asyncio.run(_poll_cycles(simulator.port, bank, cycles, attributes))
+        results[name] = dict(percentiles(samples), requests_per_cycle=requests, cycles=cycles)
+    return results
+
+
+def bench_ui(sensors, rounds):
+    """Cost of applying sensor updates to the dashboard widgets"""
+    from PySide6.QtWidgets import QApplication
+    from database import initialize_database
+    from event_pipeline import SensorEvent
+
+    initialize_database()
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    from DashboardWindow import DashboardWindow
+    window = DashboardWindow({"username": "benchmark"})
+    window.resize(1000, 800)
+    window.show()
+    window.sensor_model.set_sensors(range(1, sensors + 1))
+    app.processEvents()
+
+    states = (SensorState.OPEN, SensorState.CLOSED)
+    start = time.perf_counter()
+    for i in range(rounds):
+        window.update_sensor_state_ui(states[i & 1])
+        window.update_battery_ui(10 if i & 1 else 90)
+    detail = (time.perf_counter() - start) / rounds
+
+    # Every sensor flips at once, then the grid repaints
+    grid_rounds = max(1, rounds // 10)
+    start = time.perf_counter()
+    for i in range(grid_rounds):
+        now = time.time()
+        window.on_sensor_events([SensorEvent(sensor_id, "state", states[i & 1], None, now)
+                                 for sensor_id in range(1, sensors + 1)])
+        window.sensor_model.flush()
+        window.sensor_grid.viewport().repaint()
+    grid = (time.perf_counter() - start) / grid_rounds
+
+    window.close()
+    app.processEvents()
+    return {
+        "sensors": sensors,
+        "detail_update_us": detail * 1e6,
+        "grid_update_ms": grid * 1000,
+        "grid_update_per_sensor_us": grid / sensors * 1e6,
+    }
+
+
+def bench_db(events, sensors):
+    """Events written through the EventLogger into SQLite per second"""
+    from database import MonitoringDB, close_pool, initialize_database
+    from event_logger import BLOCK, EventLogger
+
+    initialize_database()
+    db = MonitoringDB()
+    logger = EventLogger(db.log_events, overflow=BLOCK)
+    now = time.time()
+    start = time.perf_counter()
+    for i in range(events):
+        kind = "battery" if i % 10 == 0 else "state"
+        logger.log(kind, i % sensors + 1, i % 100 if kind == "battery" else i & 1, now + i * 0.001)
+    queued = time.perf_counter() - start
+    logger.close()
+    elapsed = time.perf_counter() - start
+    db.close()
+    close_pool()
+    return {"events": logger.written, "events_per_sec": logger.written / elapsed,
+            "enqueue_per_sec": events / queued, "dropped": logger.dropped}
+
+
+def bench_store(sensors, events):
+    """SensorStateStore updates per second and fleet-wide query latency"""
+    from event_pipeline import SensorEvent
+    from sensor_store import SensorStateStore
+
+    store = SensorStateStore(range(1, sensors + 1))
+    now = time.time()
+    batch = [SensorEvent(i % sensors + 1, "battery" if i % 10 == 0 else "state",
+                         i % 100 if i % 10 == 0 else i & 1, None, now + i * 0.001)
+             for i in range(events)]
+    start = time.perf_counter()
+    for offset in range(0, events, 100):
+        store.apply_events(batch[offset:offset + 100])
+    updates = time.perf_counter() - start
+
+    samples = []
+    for _ in range(200):
+        start = time.perf_counter()
+        store.low_battery(20)
+        store.stale(600, now)
+        samples.append(time.perf_counter() - start)
+    return {"sensors": sensors, "updates_per_sec": events / updates,
+            "query": percentiles(samples)}
+
+
+def bench_battery(sensors, years):
+    """Battery depletion fit over every sensor and years of weekly readings"""
+    import numpy as np
+    from battery_analytics import DAY, YEAR, fit_depletion, fit_trends
+    from database import TREND_EPOCH
+
+    weeks = int(years * 52)
+    rng = np.random.default_rng(1)
+    drain = rng.uniform(1, 8, sensors) / YEAR * DAY  # percent per day
+    sensor_ids = np.repeat(np.arange(1, sensors + 1), weeks)
+    times = TREND_EPOCH + np.tile(np.arange(weeks) * 7 * DAY, sensors)
+    levels = np.clip(100 - drain[sensor_ids - 1] * (times - TREND_EPOCH) / DAY
+                     + rng.normal(0, 0.5, len(times)), 0, 100)
+
+    start = time.perf_counter()
+    fit_depletion(sensor_ids, times, levels)
+    history = time.perf_counter() - start
+
+    # The same readings as the per-sensor sums the database maintains
+    days = (times - TREND_EPOCH) / DAY
+    sums = [(i + 1, weeks, *(np.add.reduceat(values, np.arange(0, len(days), weeks))[i]
+                              for values in (days, levels, days * days, days * levels)),
+             times[i * weeks], times[(i + 1) * weeks - 1]) for i in range(sensors)]
+    start = time.perf_counter()
+    fit_trends(sums)
+    trends = time.perf_counter() - start
+    return {"sensors": sensors, "readings": len(times), "history_fit_ms": history * 1000,
+            "trend_fit_ms": trends * 1000}
+
+
+def bench_alarms(sensors, events):
+    """Alarm rule evaluations per second during a storm of state changes"""
+    from alarm_engine import DEFAULT_RULES, AlarmEngine, AlarmRule
+    from event_pipeline import SensorEvent
+
+    zones = {f"Zone {z}": list(range(z * 100 + 1, min(z * 100 + 101, sensors + 1)))
+             for z in range((sensors + 99) // 100)}
+    rules = list(DEFAULT_RULES) + [AlarmRule(f"Zone {z} activity", zones=[zone], count=10, window=60)
+                                   for z, zone in enumerate(zones)]
+    engine = AlarmEngine(rules, zones, level=2)
+    raised = []
+    engine.subscribe(raised.extend)
+    now = time.time()
+    batch = [SensorEvent(i * 7919 % sensors + 1, "state", (i // sensors) & 1, None, now + i * 0.001)
+             for i in range(events)]
+    start = time.perf_counter()
+    for offset in range(0, events, 100):
+        engine.evaluate(batch[offset:offset + 100])
+        engine.check(batch[offset].timestamp)
+    elapsed = time.perf_counter() - start
+    return {"sensors": sensors, "rules": len(rules), "events_per_sec": events / elapsed,
+            "alarms": len(raised)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except OSError:
+        return None
+
+
+def flatten(results, prefix=""):
+    """{"a": {"b": 1}} -> {"a.b": 1}, for comparing two runs"""
+    flat = {}
+    for key, value in results.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{prefix}{key}."))
+        elif isinstance(value, (int, float)):
+            flat[prefix + key] = value
+    return flat
+
+
+def compare(results, baseline_path):
+    with open(baseline_path) as f:
+        baseline = flatten(json.load(f)["results"])
+    current = flatten(results)
+    print(f"\nCompared with {baseline_path}:")
+    for key, value in current.items():
+        old = baseline.get(key)
+        if old and key.endswith(("_sec", "_ms", "_us")):
+            print(f"  {key:45s} {old:14.2f} -> {value:14.2f} ({(value - old) / old:+.1%})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the monitoring hot paths")
+    parser.add_argument("--sensors", type=int, default=300)
+    parser.add_argument("--encode", type=int, default=200000, help="requests to encode")
+    parser.add_argument("--decode", type=int, default=200000, help="frames to decode")
+    parser.add_argument("--cycles", type=int, default=200, help="poll cycles to time")
+    parser.add_argument("--latency", type=float, default=0.0, help="simulated receiver latency (s)")
+    parser.add_argument("--ui-rounds", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=100000, help="events to persist")
+    parser.add_argument("--store-sensors", type=int, default=10000,
+                        help="sensors in the state store benchmark")
+    parser.add_argument("--battery-years", type=float, default=20,
+                        help="years of weekly battery readings to fit")
+    parser.add_argument("--output", default=f"benchmark-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, run in (
+        ("encode", lambda: bench_encode(args.encode)),
+        ("decode", lambda: bench_decode(args.decode)),
+        ("poll", lambda: bench_poll(args.sensors, args.cycles, args.latency)),
+        ("ui", lambda: bench_ui(args.sensors, args.ui_rounds)),
+        ("db", lambda: bench_db(args.events, args.sensors)),
+        ("store", lambda: bench_store(args.store_sensors, args.events)),
+        ("battery", lambda: bench_battery(args.sensors, args.battery_years)),
+        ("alarms", lambda: bench_alarms(args.store_sensors, args.events)),
+    ):
+        print(f"Running {name}...", flush=True)
+        results[name] = run()
+        print(json.dumps(results[name], indent=2))
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arguments": vars(args),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results saved to {args.output}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+import asyncio
+import random
+import socket
+import time
+
+from metrics import REGISTRY
+from modbus_client import MODBUS_PORT, ModbusClient
+
+RECONNECTS = REGISTRY.counter(
+    "modbus_reconnects_total", "Connections re-established to a receiver", ("receiver",))
+
+
+class ReceiverConnection:
+    """Connection state for one receiver, reconnected with exponential backoff"""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.client = None
+        self.failures = 0  # consecutive failed connects
+        self.healthy = False  # answered a request since the last connect
+        self.timeouts = 0  # consecutive request timeouts on the open connection
+        self.retry_at = 0.0
+        self.connected_before = False
+        self.last_error = None
+        self.connect_task = None
+
+    @property
+    def connected(self):
+        return self.client is not None and self.client.connected
+
+
+class ConnectionPool:
+    """Pool of ModbusClient connections keyed by receiver (host, port).
+
+    A receiver that cannot be reached is put into exponential backoff, and
+    while it is backing off get() fails immediately instead of waiting for
+    another connect timeout, so one dead receiver never holds up polling of
+    the healthy ones. At most max_connections receivers are connected (or
+    connecting) at once; idle sockets are kept alive with TCP keep-alive.
+    """
+
+    def __init__(self, max_connections=16, timeout=2.0, backoff_initial=1.0,
+                 backoff_max=60.0, max_timeouts=3, keepalive=30):
+        self.timeout = timeout
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self.max_timeouts = max_timeouts
+        self.keepalive = keepalive
+        self.max_connections = max_connections
+        self.reconnects = 0
+        self._slots = asyncio.Semaphore(max_connections)
+        self._receivers = {}
+
+    def receiver(self, host, port=MODBUS_PORT):
+        key = (host, port)
+        if key not in self._receivers:
+            self._receivers[key] = ReceiverConnection(host, port)
+        return self._receivers[key]
+
+    async def get(self, host, port=MODBUS_PORT):
+        """Return a connected client for the receiver, connecting if needed.
+
+        Raises ConnectionError right away while the receiver is backing off
+        or when every connection slot is taken.
+        """
+        receiver = self.receiver(host, port)
+        if receiver.connected:
+            return receiver.client
+
+        if receiver.client is not None:
+            if not receiver.healthy:
+                # Dropped before it ever answered: back off like a failed connect
+                self._schedule_retry(receiver, receiver.last_error or "Connection dropped")
+            receiver.client = None
+
+        if receiver.connect_task is None:
+            remaining = receiver.retry_at - time.monotonic()
+            if remaining > 0:
+                raise ConnectionError(
+                    f"{host} unreachable ({receiver.last_error}), retrying in {remaining:.0f}s"
+                )
+            if self._slots.locked():
+                raise ConnectionError(f"Connection limit of {self.max_connections} reached")
+            receiver.connect_task = asyncio.ensure_future(self._connect(receiver))
+        # Several pollers may wait on the same connect attempt
+        return await asyncio.shield(receiver.connect_task)
+
+    async def _connect(self, receiver):
+        await self._slots.acquire()
+        try:
+            client = await ModbusClient.connect(receiver.host, receiver.port, timeout=self.timeout)
+        except asyncio.CancelledError:
+            self._slots.release()
+            raise
+        except Exception as e:
+            self._slots.release()
+            self._schedule_retry(receiver, str(e) or type(e).__name__)
+            raise ConnectionError(f"Could not connect to {receiver.host}: {receiver.last_error}") from e
+        finally:
+            receiver.connect_task = None
+
+        self._enable_keepalive(client)
+        if receiver.failures or receiver.connected_before:
+            self.reconnects += 1
+            RECONNECTS.labels(receiver.host).inc()
+        receiver.client = client
+        receiver.connected_before = True
+        receiver.healthy = False
+        receiver.timeouts = 0
+        asyncio.ensure_future(self._release_on_close(client))
+        return client
+
+    def _schedule_retry(self, receiver, error):
+        receiver.failures += 1
+        receiver.last_error = error
+        delay = min(self.backoff_max, self.backoff_initial * 2 ** (receiver.failures - 1))
+        # Jitter so receivers that dropped together do not reconnect together
+        receiver.retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+    async def _release_on_close(self, client):
+        await client.wait_closed()
+        self._slots.release()
+
+    def _enable_keepalive(self, client):
+        sock = client.transport.get_extra_info("socket")
+        if sock is None:
+            return
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Idle/interval tuning is platform specific, apply where available
+        for name, value in (("TCP_KEEPIDLE", self.keepalive),
+                            ("TCP_KEEPINTVL", max(1, self.keepalive // 3)),
+                            ("TCP_KEEPCNT", 3)):
+            if hasattr(socket, name):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, name), value)
+
+    def report_success(self, host, port=MODBUS_PORT):
+        receiver = self.receiver(host, port)
+        receiver.healthy = True
+        receiver.failures = 0
+        receiver.timeouts = 0
+        receiver.last_error = None
+
+    def report_timeout(self, host, port=MODBUS_PORT):
+        """Drop a connection that keeps timing out so it gets re-established"""
+        receiver = self.receiver(host, port)
+        receiver.timeouts += 1
+        if receiver.timeouts >= self.max_timeouts and receiver.client is not None:
+            receiver.last_error = "Receiver stopped responding"
+            receiver.client.close()
+            receiver.timeouts = 0
+
+    async def close(self):
+        """Close every pooled connection"""
+        for receiver in self._receivers.values():
+            if receiver.connect_task is not None:
+                receiver.connect_task.cancel()
+        clients = [r.client for r in self._receivers.values() if r.client is not None]
+        for client in clients:
+            client.close()
+        for client in clients:
+            await client.wait_closed()
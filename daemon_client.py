@@ -0,0 +1,110 @@
+import asyncio
+
+from PySide6.QtCore import QThread, Signal
+
+from event_channel import (
+    ALARMS, DEFAULT_SOCKET, EVENTS, LEVEL, FrameError, POLL_FAILED, RECEIVER, SNAPSHOT,
+    decode_alarms, decode_events, decode_level, decode_receiver, encode_level, read_frames
+)
+from sensor_store import SensorStateStore
+
+
+class DaemonClient(QThread):
+    """Follows the shared poller instead of polling the receivers.
+
+    The poller is the monitoring daemon or another dashboard. The client has
+    the same signals as PollingWorker, so the dashboard handles both the
+    same way; the snapshot sent on attach arrives as ordinary sensor_events.
+    daemon_status reports attaching, and losing the poller (after which the
+    thread ends). The alarm level is the poller's: alarm_level reports it
+    on attach and whenever it changes, and set_alarm_level() asks for a new one.
+    store holds the latest values received, like PollingWorker.store.
+    """
+    receiver_status = Signal(str, bool, str)  # host, connected, message
+    sensor_events = Signal(object)  # [SensorEvent]
+    poll_failed = Signal(str)
+    alarms = Signal(object)  # [Alarm]
+    alarm_level = Signal(int)
+    daemon_status = Signal(bool, str)  # attached, message
+
+    def __init__(self, path=DEFAULT_SOCKET, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.store = SensorStateStore()
+        self._loop = None
+        self._writer = None
+        self._stop_event = None
+        self._stop_requested = False
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def stop(self):
+        """Detach from the poller and wait for the thread to exit"""
+        self._stop_requested = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # Loop already shut down
+        self.wait()
+
+    def set_alarm_level(self, level):
+        """Ask the poller to switch the alarm level; call from the GUI thread"""
+        loop = self._loop
+        if self._writer is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._writer.write, encode_level(level))
+            except RuntimeError:
+                pass  # Loop already shut down
+
+    async def _main(self):
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_requested:
+            return
+        try:
+            reader, writer = await asyncio.open_unix_connection(self.path)
+        except OSError as e:
+            self.daemon_status.emit(False, str(e))
+            return
+        self._writer = writer
+        self.daemon_status.emit(True, "")
+
+        reading = asyncio.ensure_future(self._read(reader))
+        stopping = asyncio.ensure_future(self._stop_event.wait())
+        try:
+            await asyncio.wait((reading, stopping), return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            reading.cancel()
+            stopping.cancel()
+            self._writer = None
+            writer.close()
+        if not self._stop_requested:
+            self.daemon_status.emit(False, reading.result())
+
+    async def _read(self, reader):
+        """Dispatch frames until the poller goes away; returns why it did"""
+        try:
+            async for frame_type, payload in read_frames(reader):
+                if frame_type in (EVENTS, SNAPSHOT):
+                    events = decode_events(payload)
+                    if events:
+                        self.store.apply_events(events)
+                        self.sensor_events.emit(events)
+                elif frame_type == RECEIVER:
+                    self.receiver_status.emit(*decode_receiver(payload))
+                elif frame_type == POLL_FAILED:
+                    self.poll_failed.emit(payload.decode(errors="replace"))
+                elif frame_type == ALARMS:
+                    self.alarms.emit(decode_alarms(payload))
+                elif frame_type == LEVEL:
+                    level = decode_level(payload)
+                    self.store.set_alarm_level(level)
+                    self.alarm_level.emit(level)
+        except FrameError as e:
+            return f"Event channel error: {str(e)}"
+        except ConnectionError as e:
+            return str(e)
+        return "The poller closed the connection"
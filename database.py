@@ -0,0 +1,713 @@
+import hashlib
+import hmac
+import os
+import queue
+import secrets
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+DB_PATH = os.environ.get("MONITORING_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "monitoring.db"))
+POOL_SIZE = 4
+
+# A state change to OPEN (0) is an intrusion alert, as is any alarm event
+ALERT_CONDITION = "({row}.event_type = 'alarm' OR ({row}.event_type = 'state' AND {row}.value = 0))"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY,
+    username TEXT NOT NULL UNIQUE,
+    password_hash BLOB NOT NULL,
+    salt BLOB NOT NULL,
+    role TEXT NOT NULL DEFAULT 'operator'
+);
+CREATE TABLE IF NOT EXISTS sensors (
+    id INTEGER PRIMARY KEY,
+    sensor_type TEXT NOT NULL DEFAULT 'Contact Sensor',
+    location TEXT NOT NULL DEFAULT 'Unassigned',
+    battery_level INTEGER,
+    battery_updated REAL
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    timestamp REAL NOT NULL,
+    sensor_id INTEGER NOT NULL REFERENCES sensors(id),
+    event_type TEXT NOT NULL,
+    value INTEGER,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_events_sensor_time
+    ON events (sensor_id, timestamp, event_type, value);
+CREATE INDEX IF NOT EXISTS idx_events_time ON events (timestamp);
+"""
+
+# Alert counters maintained incrementally by triggers on insert, so the
+# history summary reads one row per sensor instead of scanning the log.
+# They count every alert ever logged, even once raw events are pruned.
+ALERT_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS sensor_alert_counts (
+    sensor_id INTEGER PRIMARY KEY,
+    alert_count INTEGER NOT NULL DEFAULT 0,
+    last_alert REAL
+);
+CREATE TABLE IF NOT EXISTS alert_daily (
+    sensor_id INTEGER NOT NULL,
+    day TEXT NOT NULL,
+    alert_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sensor_id, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_alert_daily_day ON alert_daily (day);
+CREATE TRIGGER IF NOT EXISTS trg_events_alert_counts
+AFTER INSERT ON events
+WHEN {ALERT_CONDITION.format(row="NEW")}
+BEGIN
+    INSERT INTO sensor_alert_counts (sensor_id, alert_count, last_alert)
+    VALUES (NEW.sensor_id, 1, NEW.timestamp)
+    ON CONFLICT (sensor_id) DO UPDATE SET
+        alert_count = alert_count + 1,
+        last_alert = MAX(COALESCE(last_alert, 0), excluded.last_alert);
+    INSERT INTO alert_daily (sensor_id, day, alert_count)
+    VALUES (NEW.sensor_id, date(NEW.timestamp, 'unixepoch', 'localtime'), 1)
+    ON CONFLICT (sensor_id, day) DO UPDATE SET alert_count = alert_count + 1;
+END;
+"""
+
+# Battery readings downsampled to one row per sensor and (UTC) day, and
+# running least-squares sums per sensor since its last battery change (a
+# jump up of BATTERY_REPLACEMENT_JUMP points), both kept up to date by a
+# trigger like the alert counters. The sums let the depletion trend of
+# every sensor be fitted from one row each; both survive pruning raw events.
+BATTERY_REPLACEMENT_JUMP = 20
+TREND_EPOCH = 1577836800  # 2020-01-01; trend times are days since then
+_TREND_DAY = f"((NEW.timestamp - {TREND_EPOCH}) / 86400.0)"
+_NEW_BATTERY = f"excluded.last_level - last_level > {BATTERY_REPLACEMENT_JUMP}"
+
+BATTERY_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS battery_daily (
+    sensor_id INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    level_sum REAL NOT NULL,
+    time_sum REAL NOT NULL,
+    min_level INTEGER NOT NULL,
+    max_level INTEGER NOT NULL,
+    PRIMARY KEY (sensor_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS battery_trend (
+    sensor_id INTEGER PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    day_sum REAL NOT NULL,
+    level_sum REAL NOT NULL,
+    day_day_sum REAL NOT NULL,
+    day_level_sum REAL NOT NULL,
+    first_time REAL NOT NULL,
+    last_time REAL NOT NULL,
+    last_level INTEGER NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS trg_events_battery_daily
+AFTER INSERT ON events
+WHEN NEW.event_type = 'battery' AND NEW.value IS NOT NULL
+BEGIN
+    INSERT INTO battery_daily (sensor_id, day, samples, level_sum, time_sum, min_level, max_level)
+    VALUES (NEW.sensor_id, CAST(NEW.timestamp / 86400 AS INTEGER), 1, NEW.value, NEW.timestamp,
+            NEW.value, NEW.value)
+    ON CONFLICT (sensor_id, day) DO UPDATE SET
+        samples = samples + 1,
+        level_sum = level_sum + excluded.level_sum,
+        time_sum = time_sum + excluded.time_sum,
+        min_level = MIN(min_level, excluded.min_level),
+        max_level = MAX(max_level, excluded.max_level);
+    INSERT INTO battery_trend (sensor_id, samples, day_sum, level_sum, day_day_sum, day_level_sum,
+                               first_time, last_time, last_level)
+    VALUES (NEW.sensor_id, 1, {_TREND_DAY}, NEW.value, {_TREND_DAY} * {_TREND_DAY},
+            {_TREND_DAY} * NEW.value, NEW.timestamp, NEW.timestamp, NEW.value)
+    ON CONFLICT (sensor_id) DO UPDATE SET
+        samples = CASE WHEN {_NEW_BATTERY} THEN 1 ELSE samples + 1 END,
+        day_sum = excluded.day_sum + CASE WHEN {_NEW_BATTERY} THEN 0 ELSE day_sum END,
+        level_sum = excluded.level_sum + CASE WHEN {_NEW_BATTERY} THEN 0 ELSE level_sum END,
+        day_day_sum = excluded.day_day_sum + CASE WHEN {_NEW_BATTERY} THEN 0 ELSE day_day_sum END,
+        day_level_sum = excluded.day_level_sum
+            + CASE WHEN {_NEW_BATTERY} THEN 0 ELSE day_level_sum END,
+        first_time = CASE WHEN {_NEW_BATTERY} THEN excluded.first_time ELSE first_time END,
+        last_time = excluded.last_time,
+        last_level = excluded.last_level;
+END;
+"""
+
+# Raw events rolled up into per-sensor minute, hour and day buckets, so
+# history over long ranges reads a few rows per bucket and raw events can
+# be pruned (see retention.py). Rolled up incrementally in id order; the
+# last id included is kept in retention_state.
+MINUTE = 60
+HOUR = 3600
+DAY = 86400
+ROLLUP_RESOLUTIONS = (MINUTE, HOUR, DAY)
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS event_rollups (
+    resolution INTEGER NOT NULL,
+    sensor_id INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    bucket INTEGER NOT NULL,
+    event_count INTEGER NOT NULL,
+    alert_count INTEGER NOT NULL,
+    min_value INTEGER,
+    max_value INTEGER,
+    PRIMARY KEY (resolution, sensor_id, event_type, bucket)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_event_rollups_time ON event_rollups (resolution, bucket);
+CREATE TABLE IF NOT EXISTS retention_state (
+    name TEXT PRIMARY KEY,
+    value
+);
+"""
+
+SQL_REBUILD_ALERT_COUNTS = f"""
+    INSERT INTO sensor_alert_counts (sensor_id, alert_count, last_alert)
+    SELECT e.sensor_id, COUNT(*), MAX(e.timestamp) FROM events e
+    WHERE {ALERT_CONDITION.format(row="e")}
+    GROUP BY e.sensor_id
+"""
+SQL_REBUILD_ALERT_DAILY = f"""
+    INSERT INTO alert_daily (sensor_id, day, alert_count)
+    SELECT e.sensor_id, date(e.timestamp, 'unixepoch', 'localtime'), COUNT(*) FROM events e
+    WHERE {ALERT_CONDITION.format(row="e")}
+    GROUP BY 1, 2
+"""
+SQL_REBUILD_BATTERY_DAILY = """
+    INSERT INTO battery_daily (sensor_id, day, samples, level_sum, time_sum, min_level, max_level)
+    SELECT sensor_id, CAST(timestamp / 86400 AS INTEGER), COUNT(*), SUM(value), SUM(timestamp),
+           MIN(value), MAX(value)
+    FROM events WHERE event_type = 'battery' AND value IS NOT NULL
+    GROUP BY 1, 2
+"""
+SQL_REBUILD_BATTERY_TREND = f"""
+    WITH readings AS (
+        SELECT sensor_id, timestamp, value, (timestamp - {TREND_EPOCH}) / 86400.0 AS day,
+               CASE WHEN value - LAG(value) OVER (PARTITION BY sensor_id ORDER BY timestamp)
+                         > {BATTERY_REPLACEMENT_JUMP} THEN 1 ELSE 0 END AS new_battery
+        FROM events WHERE event_type = 'battery' AND value IS NOT NULL
+    ), batteries AS (
+        SELECT *, SUM(new_battery) OVER (PARTITION BY sensor_id ORDER BY timestamp) AS battery
+        FROM readings
+    ), current AS (
+        SELECT *, MAX(battery) OVER (PARTITION BY sensor_id) AS last_battery FROM batteries
+    )
+    INSERT INTO battery_trend (sensor_id, samples, day_sum, level_sum, day_day_sum, day_level_sum,
+                               first_time, last_time, last_level)
+    SELECT sensor_id, COUNT(*), SUM(day), SUM(value), SUM(day * day), SUM(day * value),
+           MIN(timestamp), MAX(timestamp),
+           (SELECT value FROM current c2 WHERE c2.sensor_id = current.sensor_id
+            ORDER BY timestamp DESC LIMIT 1)
+    FROM current WHERE battery = last_battery
+    GROUP BY sensor_id
+"""
+
+# Bucket start for a resolution; days start at local midnight
+_ROLLUP_BUCKET = """
+    CASE WHEN ?1 = 86400
+         THEN CAST(strftime('%s', timestamp, 'unixepoch', 'localtime', 'start of day', 'utc') AS INTEGER)
+         ELSE CAST(timestamp / ?1 AS INTEGER) * ?1 END
+"""
+SQL_ROLL_UP = f"""
+    INSERT INTO event_rollups (resolution, sensor_id, event_type, bucket, event_count, alert_count,
+                               min_value, max_value)
+    SELECT ?1, sensor_id, event_type, {_ROLLUP_BUCKET}, COUNT(*),
+           SUM({ALERT_CONDITION.format(row="e")}), MIN(value), MAX(value)
+    FROM events e WHERE id > ?2 AND id <= ?3
+    GROUP BY sensor_id, event_type, 4
+    ON CONFLICT (resolution, sensor_id, event_type, bucket) DO UPDATE SET
+        event_count = event_count + excluded.event_count,
+        alert_count = alert_count + excluded.alert_count,
+        min_value = MIN(COALESCE(min_value, excluded.min_value), excluded.min_value),
+        max_value = MAX(COALESCE(max_value, excluded.max_value), excluded.max_value)
+"""
+SQL_ROLLUP_WATERMARK = "SELECT value FROM retention_state WHERE name = 'rolled_up_id'"
+SQL_SET_ROLLUP_WATERMARK = (
+    "INSERT INTO retention_state (name, value) VALUES ('rolled_up_id', ?) "
+    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+)
+SQL_RETENTION_STATE = "SELECT value FROM retention_state WHERE name = ?"
+SQL_SET_RETENTION_STATE = (
+    "INSERT INTO retention_state (name, value) VALUES (?, ?) "
+    "ON CONFLICT (name) DO UPDATE SET value = excluded.value"
+)
+SQL_ROLLUP_CHUNK = "SELECT COUNT(*), MAX(id) FROM (SELECT id FROM events WHERE id > ? ORDER BY id LIMIT ?)"
+SQL_PRUNE_EVENTS = """
+    DELETE FROM events WHERE id IN (
+        SELECT id FROM events WHERE timestamp < ? AND id <= ? LIMIT ?
+    )
+"""
+# Rowids are reused once the highest ids are deleted (events has no
+# AUTOINCREMENT), so after pruning the watermark is lowered to the highest
+# id left; new events then always get ids above it
+SQL_CLAMP_ROLLUP_WATERMARK = """
+    UPDATE retention_state SET value = (SELECT COALESCE(MAX(id), 0) FROM events)
+    WHERE name = 'rolled_up_id' AND value > (SELECT COALESCE(MAX(id), 0) FROM events)
+"""
+SQL_PRUNE_ROLLUPS = """
+    DELETE FROM event_rollups WHERE (resolution, sensor_id, event_type, bucket) IN (
+        SELECT resolution, sensor_id, event_type, bucket FROM event_rollups
+        WHERE resolution = ? AND bucket < ? LIMIT ?
+    )
+"""
+
+# Statements are kept as constants so every call reuses the prepared
+# statement from the connection's statement cache
+SQL_AUTHENTICATE = "SELECT id, username, role, password_hash, salt FROM users WHERE username = ?"
+SQL_ADD_USER = "INSERT INTO users (username, password_hash, salt, role) VALUES (?, ?, ?, ?)"
+SQL_ENSURE_SENSOR = "INSERT OR IGNORE INTO sensors (id) VALUES (?)"
+SQL_UPDATE_BATTERY = "UPDATE sensors SET battery_level = ?, battery_updated = ? WHERE id = ?"
+SQL_INSERT_EVENT = (
+    "INSERT INTO events (timestamp, sensor_id, event_type, value, details) VALUES (?, ?, ?, ?, ?)"
+)
+SQL_ALERT_SUMMARY = """
+    SELECT s.sensor_type, s.id AS sensor_id, s.location,
+           COALESCE(c.alert_count, 0) AS alert_count, c.last_alert
+    FROM sensors s
+    LEFT JOIN sensor_alert_counts c ON c.sensor_id = s.id
+    ORDER BY alert_count DESC, s.id
+"""
+SQL_DAILY_ALERTS = """
+    SELECT day, SUM(alert_count) AS alert_count FROM alert_daily
+    WHERE day >= date('now', 'localtime', ?)
+    GROUP BY day ORDER BY day
+"""
+SQL_SENSOR_DAILY_ALERTS = """
+    SELECT day, alert_count FROM alert_daily
+    WHERE sensor_id = ? AND day >= date('now', 'localtime', ?)
+    ORDER BY day
+"""
+SQL_EVENTS_SELECT = """
+    SELECT e.id, e.timestamp, e.sensor_id, s.sensor_type, s.location, e.event_type, e.value
+    FROM events e JOIN sensors s ON s.id = e.sensor_id
+"""
+# In primary key order, so the scan needs no sort
+SQL_BATTERY_HISTORY = """
+    SELECT sensor_id, day, samples, level_sum, time_sum FROM battery_daily
+    WHERE day >= ? ORDER BY sensor_id, day
+"""
+SQL_BATTERY_TRENDS = """
+    SELECT sensor_id, samples, day_sum, level_sum, day_day_sum, day_level_sum, first_time, last_time
+    FROM battery_trend ORDER BY sensor_id
+"""
+SQL_ROLLUPS_SELECT = """
+    SELECT r.bucket, r.event_type, SUM(r.event_count), SUM(r.alert_count),
+           MIN(r.min_value), MAX(r.max_value)
+    FROM event_rollups r JOIN sensors s ON s.id = r.sensor_id
+"""
+SQL_SENSORS = "SELECT id, sensor_type, location, battery_level, battery_updated FROM sensors ORDER BY id"
+SQL_LOCATIONS = "SELECT DISTINCT location FROM sensors ORDER BY location"
+
+PBKDF2_ITERATIONS = 200_000
+
+
+def hash_password(password, salt=None):
+    salt = os.urandom(16) if salt is None else salt
+    digest = hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS)
+    return digest, salt
+
+
+class QueryCancelled(Exception):
+    """Raised when a query is cancelled through its CancelToken"""
+
+
+class CancelToken:
+    """Lets another thread abort a running query.
+
+    Pass it to a read method as `cancel`; cancel() interrupts the statement
+    currently running on the token's connection (sqlite3 interrupt is safe
+    to call from any thread) and the read raises QueryCancelled.
+    """
+
+    def __init__(self):
+        self.cancelled = False
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    def attach(self, conn):
+        with self._lock:
+            if self.cancelled:
+                raise QueryCancelled()
+            self._conn = conn
+
+    def detach(self):
+        with self._lock:
+            self._conn = None
+
+
+class SQLitePool:
+    """Small pool of SQLite connections shared by every thread.
+
+    Connections are opened in WAL mode, so the GUI can read while the
+    polling and logging threads write. A connection is only ever used by
+    one thread at a time: it is checked out for the duration of a
+    `with pool.connection()` block and then returned.
+    """
+
+    def __init__(self, path=DB_PATH, size=POOL_SIZE):
+        self.path = path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _open(self):
+        conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False,
+                               isolation_level=None, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+
+    @contextmanager
+    def connection(self, cancel=None):
+        """Check out a connection for the calling thread.
+
+        With a CancelToken, the token can interrupt work on the connection
+        until the block ends; an interrupted block raises QueryCancelled.
+        """
+        if self._closed:
+            raise sqlite3.ProgrammingError("Database pool is closed")
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                conn = self._idle.get()
+        try:
+            if cancel is None:
+                yield conn
+            else:
+                cancel.attach(conn)
+                try:
+                    yield conn
+                except sqlite3.OperationalError as e:
+                    if cancel.cancelled:
+                        raise QueryCancelled() from e
+                    raise
+                finally:
+                    cancel.detach()
+                if cancel.cancelled:
+                    raise QueryCancelled()
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        """Check out a connection and run the block in one transaction"""
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process-wide connection pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SQLitePool()
+        return _pool
+
+
+def close_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+
+
+def _execute_script(conn, script):
+    """Run a multi-statement script inside the current transaction"""
+    # executescript() would COMMIT first, so split it into statements
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            conn.execute(statement)
+            statement = ""
+
+
+def initialize_database():
+    """Create the schema and the default administrator account"""
+    with get_pool().transaction() as conn:
+        _execute_script(conn, SCHEMA)
+        # Databases from before the alert counters get them backfilled once
+        has_counters = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sensor_alert_counts'"
+        ).fetchone()
+        _execute_script(conn, ALERT_SCHEMA)
+        if not has_counters:
+            conn.execute(SQL_REBUILD_ALERT_COUNTS)
+            conn.execute(SQL_REBUILD_ALERT_DAILY)
+        has_battery_history = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'battery_daily'"
+        ).fetchone()
+        _execute_script(conn, BATTERY_SCHEMA)
+        if not has_battery_history:
+            conn.execute(SQL_REBUILD_BATTERY_DAILY)
+            conn.execute(SQL_REBUILD_BATTERY_TREND)
+        # Rollups of existing events are built by the retention job
+        _execute_script(conn, ROLLUP_SCHEMA)
+        if conn.execute("SELECT COUNT(*) FROM users").fetchone()[0] == 0:
+            password = os.environ.get("MONITORING_ADMIN_PASSWORD")
+            if not password:
+                # Never fall back to a well-known password; this is shown only once
+                password = secrets.token_urlsafe(12)
+                print(f"Created user 'admin' with password: {password}")
+            digest, salt = hash_password(password)
+            conn.execute(SQL_ADD_USER, ("admin", digest, salt, "admin"))
+
+
+def _filter_conditions(alias, sensor_ids=None, event_types=None, locations=None):
+    """WHERE conditions and parameters shared by the event and rollup queries"""
+    conditions = []
+    params = []
+    if sensor_ids:
+        conditions.append(f"{alias}.sensor_id IN ({', '.join('?' * len(sensor_ids))})")
+        params.extend(sensor_ids)
+    if event_types:
+        conditions.append(f"{alias}.event_type IN ({', '.join('?' * len(event_types))})")
+        params.extend(event_types)
+    if locations:
+        conditions.append(f"s.location IN ({', '.join('?' * len(locations))})")
+        params.extend(locations)
+    return conditions, params
+
+
+class MonitoringDB:
+    """Database access for the windows and the polling threads.
+
+    Instances are cheap handles on the shared connection pool and are safe
+    to use from any thread; close() only retires the handle.
+    """
+
+    def __init__(self, pool=None):
+        self.pool = pool or get_pool()
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    def authenticate_user(self, username, password):
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_AUTHENTICATE, (username,)).fetchone()
+        if row is None:
+            # Hash anyway so unknown users take as long as wrong passwords
+            hash_password(password)
+            return None
+        digest, _ = hash_password(password, row["salt"])
+        if not hmac.compare_digest(digest, row["password_hash"]):
+            return None
+        return {"id": row["id"], "username": row["username"], "role": row["role"]}
+
+    def add_user(self, username, password, role="operator"):
+        digest, salt = hash_password(password)
+        with self.pool.transaction() as conn:
+            conn.execute(SQL_ADD_USER, (username, digest, salt, role))
+
+    def get_alert_summary(self, cancel=None):
+        """Per-sensor alert totals, read from the maintained counters"""
+        with self.pool.connection(cancel) as conn:
+            return [dict(row) for row in conn.execute(SQL_ALERT_SUMMARY)]
+
+    def get_daily_alerts(self, days=30, sensor_id=None, cancel=None):
+        """Alerts per day over the last `days` days, for one or all sensors.
+
+        Read from the per-day counters, so days whose raw events were
+        pruned still count.
+        """
+        since = f"-{int(days)} days"
+        with self.pool.connection(cancel) as conn:
+            if sensor_id is None:
+                rows = conn.execute(SQL_DAILY_ALERTS, (since,))
+            else:
+                rows = conn.execute(SQL_SENSOR_DAILY_ALERTS, (sensor_id, since))
+            return [dict(row) for row in rows]
+
+    def query_events(self, sensor_ids=None, event_types=None, locations=None,
+                     alarm_level=None, since=None, until=None, before=None, limit=200,
+                     cancel=None):
+        """Return one page of events matching the filters, newest first.
+
+        Rows are tuples (id, timestamp, sensor_id, sensor_type, location,
+        event_type, value). since/until bound the timestamp (inclusive,
+        exclusive); alarm_level keeps alarm events at that level or above.
+
+        Paging is keyset based: pass the (timestamp, id) of the last row of
+        a page as `before` to get the next one. Each page is an index seek,
+        so deep pages cost the same as the first, unlike OFFSET.
+        """
+        conditions, params = _filter_conditions("e", sensor_ids, event_types, locations)
+        if alarm_level is not None:
+            conditions.append("e.event_type = 'alarm' AND e.value >= ?")
+            params.append(alarm_level)
+        if since is not None:
+            conditions.append("e.timestamp >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("e.timestamp < ?")
+            params.append(until)
+        if before is not None:
+            conditions.append("(e.timestamp, e.id) < (?, ?)")
+            params.extend(before)
+
+        sql = SQL_EVENTS_SELECT
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY e.timestamp DESC, e.id DESC LIMIT ?"
+        params.append(limit)
+        with self.pool.connection(cancel) as conn:
+            return [tuple(row) for row in conn.execute(sql, params)]
+
+    def get_battery_history(self, since=None, cancel=None):
+        """Daily battery rollup rows (sensor_id, day, samples, level_sum, time_sum).
+
+        Ordered by sensor then day; since is a timestamp limiting how far
+        back to go.
+        """
+        first_day = 0 if since is None else int(since // 86400)
+        with self.pool.connection(cancel) as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = None  # Plain tuples; there can be millions of rows
+            return cursor.execute(SQL_BATTERY_HISTORY, (first_day,)).fetchall()
+
+    def get_battery_trends(self, cancel=None):
+        """Least-squares sums per sensor since its last battery change (see battery_trend)"""
+        with self.pool.connection(cancel) as conn:
+            return conn.execute(SQL_BATTERY_TRENDS).fetchall()
+
+    def query_rollups(self, resolution, sensor_ids=None, event_types=None, locations=None,
+                      alarm_level=None, since=None, until=None, cancel=None):
+        """Event and alert counts per bucket of `resolution` seconds, newest first.
+
+        Rows are tuples (bucket start, event_type, events, alerts, min value,
+        max value) over the sensors matching the filters. Buckets that
+        overlap since are included. alarm_level keeps alarm buckets whose
+        highest level reaches it.
+        """
+        conditions, params = _filter_conditions("r", sensor_ids, event_types, locations)
+        conditions.insert(0, "r.resolution = ?")
+        params.insert(0, resolution)
+        if alarm_level is not None:
+            conditions.append("r.event_type = 'alarm' AND r.max_value >= ?")
+            params.append(alarm_level)
+        if since is not None:
+            conditions.append("r.bucket > ?")
+            params.append(since - resolution)
+        if until is not None:
+            conditions.append("r.bucket < ?")
+            params.append(until)
+        sql = (SQL_ROLLUPS_SELECT + " WHERE " + " AND ".join(conditions)
+               + " GROUP BY r.bucket, r.event_type ORDER BY r.bucket DESC, r.event_type")
+        with self.pool.connection(cancel) as conn:
+            return [tuple(row) for row in conn.execute(sql, params)]
+
+    def roll_up_events(self, max_events=5000):
+        """Add up to max_events events not rolled up yet to every resolution.
+
+        One short transaction; returns how many events were rolled up.
+        """
+        with self.pool.transaction() as conn:
+            row = conn.execute(SQL_ROLLUP_WATERMARK).fetchone()
+            watermark = row[0] if row else 0
+            count, last_id = conn.execute(SQL_ROLLUP_CHUNK, (watermark, max_events)).fetchone()
+            if not count:
+                return 0
+            for resolution in ROLLUP_RESOLUTIONS:
+                conn.execute(SQL_ROLL_UP, (resolution, watermark, last_id))
+            conn.execute(SQL_SET_ROLLUP_WATERMARK, (last_id,))
+        return count
+
+    def prune_events(self, before, limit=5000):
+        """Delete up to limit raw events older than before that are rolled up"""
+        with self.pool.transaction() as conn:
+            row = conn.execute(SQL_ROLLUP_WATERMARK).fetchone()
+            if row is None:
+                return 0
+            count = conn.execute(SQL_PRUNE_EVENTS, (before, row[0], limit)).rowcount
+            conn.execute(SQL_CLAMP_ROLLUP_WATERMARK)
+            return count
+
+    def get_retention_state(self, name, default=None):
+        with self.pool.connection() as conn:
+            row = conn.execute(SQL_RETENTION_STATE, (name,)).fetchone()
+        return default if row is None else row[0]
+
+    def set_retention_state(self, name, value):
+        with self.pool.transaction() as conn:
+            conn.execute(SQL_SET_RETENTION_STATE, (name, value))
+
+    def prune_rollups(self, resolution, before, limit=5000):
+        """Delete up to limit rollup buckets of resolution starting before before"""
+        with self.pool.transaction() as conn:
+            return conn.execute(SQL_PRUNE_ROLLUPS, (resolution, before, limit)).rowcount
+
+    def get_sensors(self):
+        with self.pool.connection() as conn:
+            return [dict(row) for row in conn.execute(SQL_SENSORS)]
+
+    def get_locations(self, cancel=None):
+        with self.pool.connection(cancel) as conn:
+            return [row[0] for row in conn.execute(SQL_LOCATIONS)]
+
+    def update_battery_level(self, sensor_id, level, timestamp=None):
+        timestamp = time.time() if timestamp is None else timestamp
+        with self.pool.transaction() as conn:
+            conn.execute(SQL_ENSURE_SENSOR, (sensor_id,))
+            conn.execute(SQL_UPDATE_BATTERY, (level, timestamp, sensor_id))
+
+    def log_events(self, rows):
+        """Store (timestamp, sensor_id, event_type, value, details) rows.
+
+        Used by EventLogger: the whole batch is one transaction, and battery
+        readings in it also refresh the sensor's current battery level.
+        """
+        battery = {}
+        for timestamp, sensor_id, event_type, value, _ in rows:
+            if event_type == "battery":
+                battery[sensor_id] = (value, timestamp, sensor_id)
+        with self.pool.transaction() as conn:
+            conn.executemany(SQL_ENSURE_SENSOR, {(row[1],) for row in rows})
+            conn.executemany(SQL_INSERT_EVENT, rows)
+            conn.executemany(SQL_UPDATE_BATTERY, battery.values())
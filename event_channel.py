@@ -0,0 +1,322 @@
+"""Local publish/subscribe channel sharing one poller between many dashboards.
+
+The polling process (the monitoring daemon, or the first dashboard that
+connected) listens on a Unix domain socket and fans every change out to
+all attached clients, so extra operator consoles add no MODBUS load.
+
+Every frame is a 5-byte header, payload length (uint32) and frame type
+(uint8), then the payload, all big-endian:
+
+    EVENTS, SNAPSHOT  uint16 count, then count 17-byte records:
+                      sensor_id uint32, kind uint8, value uint16,
+                      previous uint16 (0xFFFF = none), timestamp float64
+    RECEIVER          connected uint8, host length uint16, host, message (UTF-8)
+    POLL_FAILED       message (UTF-8)
+    ALARMS            uint16 count, then count records: sensor_id uint32,
+                      level uint8, timestamp float64, rule length uint16,
+                      zone length uint16 (0 = none), rule, zone (UTF-8)
+    LEVEL             alarm level uint8
+
+A client first gets a SNAPSHOT of the latest value of every sensor, the
+RECEIVER state of every receiver and the alarm LEVEL, then live frames.
+The only frame clients send is LEVEL, to change the alarm level of the
+shared poller, which then announces it to every client; closing the
+connection detaches them. A client that stops
+reading is dropped rather than buffered for without bound, so a hung GUI
+cannot grow the poller's memory.
+"""
+import asyncio
+import os
+import socket
+import struct
+import tempfile
+
+from alarm_engine import LEVELS, Alarm
+from event_pipeline import SensorEvent
+
+DEFAULT_SOCKET = os.environ.get(
+    "MONITORING_SOCKET", os.path.join(tempfile.gettempdir(), "monitoring.sock"))
+MAX_CLIENT_BUFFER = 1 << 20  # Bytes queued for one client before it is dropped
+MAX_CLIENT_FRAME = 64  # Largest payload a client may send (clients only send LEVEL)
+
+# Frame types
+EVENTS = 1
+SNAPSHOT = 2
+RECEIVER = 3
+POLL_FAILED = 4
+ALARMS = 5
+LEVEL = 6
+
+HEADER = struct.Struct(">IB")
+COUNT = struct.Struct(">H")
+RECORD = struct.Struct(">IBHHd")
+RECEIVER_HEADER = struct.Struct(">BH")
+ALARM_RECORD = struct.Struct(">IBdHH")
+LEVEL_RECORD = struct.Struct(">B")
+KINDS = ("state", "battery")
+_KIND_CODES = {kind: code for code, kind in enumerate(KINDS)}
+NO_VALUE = 0xFFFF
+MAX_EVENTS_PER_FRAME = 0xFFFF
+
+
+class FrameError(ValueError):
+    """A frame that does not follow the channel format"""
+
+
+def encode_frame(frame_type, payload):
+    return HEADER.pack(len(payload), frame_type) + payload
+
+
+def encode_events(events, frame_type=EVENTS):
+    """EVENTS (or SNAPSHOT) frames for any number of SensorEvents"""
+    frames = []
+    pack = RECORD.pack
+    for start in range(0, max(len(events), 1), MAX_EVENTS_PER_FRAME):
+        chunk = events[start:start + MAX_EVENTS_PER_FRAME]
+        payload = COUNT.pack(len(chunk)) + b"".join(
+            pack(event.sensor_id, _KIND_CODES[event.kind], int(event.value),
+                 NO_VALUE if event.previous is None else int(event.previous), event.timestamp)
+            for event in chunk
+        )
+        frames.append(encode_frame(frame_type, payload))
+    return b"".join(frames)
+
+
+def decode_events(payload):
+    if len(payload) < COUNT.size:
+        raise FrameError("Truncated event frame")
+    count, = COUNT.unpack_from(payload)
+    if len(payload) != COUNT.size + count * RECORD.size:
+        raise FrameError(f"Event frame of {len(payload)} bytes cannot hold {count} events")
+    events = []
+    for sensor_id, kind, value, previous, timestamp in RECORD.iter_unpack(payload[COUNT.size:]):
+        if kind >= len(KINDS):
+            raise FrameError(f"Unknown event kind {kind}")
+        events.append(SensorEvent(sensor_id, KINDS[kind], value,
+                                  None if previous == NO_VALUE else previous, timestamp))
+    return events
+
+
+def encode_receiver(host, connected, message):
+    host = host.encode()
+    return encode_frame(RECEIVER, RECEIVER_HEADER.pack(bool(connected), len(host))
+                        + host + message.encode())
+
+
+def decode_receiver(payload):
+    """(host, connected, message) from a RECEIVER payload"""
+    if len(payload) < RECEIVER_HEADER.size:
+        raise FrameError("Truncated receiver frame")
+    connected, length = RECEIVER_HEADER.unpack_from(payload)
+    start = RECEIVER_HEADER.size
+    if len(payload) < start + length:
+        raise FrameError("Truncated receiver frame")
+    return (payload[start:start + length].decode(errors="replace"), bool(connected),
+            payload[start + length:].decode(errors="replace"))
+
+
+def encode_poll_failed(message):
+    return encode_frame(POLL_FAILED, message.encode())
+
+
+def encode_alarms(alarms):
+    """ALARMS frames for any number of Alarms"""
+    frames = []
+    for start in range(0, len(alarms), MAX_EVENTS_PER_FRAME):
+        chunk = alarms[start:start + MAX_EVENTS_PER_FRAME]
+        parts = [COUNT.pack(len(chunk))]
+        for alarm in chunk:
+            rule = alarm.rule.encode()
+            zone = (alarm.zone or "").encode()
+            parts.append(ALARM_RECORD.pack(alarm.sensor_id, alarm.level, alarm.timestamp,
+                                           len(rule), len(zone)))
+            parts.append(rule)
+            parts.append(zone)
+        frames.append(encode_frame(ALARMS, b"".join(parts)))
+    return b"".join(frames)
+
+
+def decode_alarms(payload):
+    if len(payload) < COUNT.size:
+        raise FrameError("Truncated alarm frame")
+    count, = COUNT.unpack_from(payload)
+    offset = COUNT.size
+    alarms = []
+    for _ in range(count):
+        if len(payload) < offset + ALARM_RECORD.size:
+            raise FrameError("Truncated alarm frame")
+        sensor_id, level, timestamp, rule_length, zone_length = ALARM_RECORD.unpack_from(payload, offset)
+        offset += ALARM_RECORD.size
+        end = offset + rule_length + zone_length
+        if len(payload) < end:
+            raise FrameError("Truncated alarm frame")
+        rule = payload[offset:offset + rule_length].decode(errors="replace")
+        zone = payload[offset + rule_length:end].decode(errors="replace") or None
+        alarms.append(Alarm(rule, level, sensor_id, zone, timestamp))
+        offset = end
+    if offset != len(payload):
+        raise FrameError(f"Alarm frame of {len(payload)} bytes holds more than {count} alarms")
+    return alarms
+
+
+def encode_level(level):
+    return encode_frame(LEVEL, LEVEL_RECORD.pack(level))
+
+
+def decode_level(payload):
+    if len(payload) != LEVEL_RECORD.size:
+        raise FrameError("Malformed alarm level frame")
+    if payload[0] not in LEVELS:
+        raise FrameError(f"Unknown alarm level {payload[0]}")
+    return payload[0]
+
+
+def daemon_available(path=DEFAULT_SOCKET):
+    """True if a poller is accepting connections on path"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+async def read_frames(reader, max_length=None):
+    """Yield (frame type, payload) from a channel connection until it closes.
+
+    A header announcing more than max_length payload bytes raises FrameError
+    before anything is buffered for it.
+    """
+    while True:
+        try:
+            header = await reader.readexactly(HEADER.size)
+            length, frame_type = HEADER.unpack(header)
+            if max_length is not None and length > max_length:
+                raise FrameError(f"Frame of {length} bytes is larger than {max_length}")
+            payload = await reader.readexactly(length)
+        except asyncio.IncompleteReadError:
+            return
+        yield frame_type, payload
+
+
+class EventPublisher:
+    """Unix socket server fanning poller output out to every attached client.
+
+    Keeps the latest event of every sensor and the state of every receiver
+    so late joiners start from a snapshot. publish_*() must be called on the
+    loop that ran start(). A LEVEL frame from a client is passed to
+    on_alarm_level(level) and then announced to every client.
+    """
+
+    def __init__(self, path=DEFAULT_SOCKET, max_buffer=MAX_CLIENT_BUFFER, on_alarm_level=None):
+        self.path = path
+        self.max_buffer = max_buffer
+        self.on_alarm_level = on_alarm_level or (lambda level: None)
+        self.alarm_level = None
+        self.receivers = {}  # host -> (connected, message)
+        self.latest = {}  # (sensor_id, kind) -> last SensorEvent
+        self._clients = set()
+        self._handlers = set()
+        self._server = None
+
+    @property
+    def client_count(self):
+        return len(self._clients)
+
+    async def start(self):
+        if os.path.exists(self.path):
+            if daemon_available(self.path):
+                raise RuntimeError(f"A poller is already publishing on {self.path}")
+            os.unlink(self.path)  # Left behind by a poller that did not shut down cleanly
+        # Bind under a umask so the socket never exists with world access
+        # (a chmod after bind leaves a window where anyone could connect)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        umask = os.umask(0o117)
+        try:
+            sock.bind(self.path)
+        except OSError:
+            sock.close()
+            raise
+        finally:
+            os.umask(umask)
+        self._server = await asyncio.start_unix_server(self._handle_client, sock=sock)
+
+    async def close(self):
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._clients):
+            writer.transport.abort()
+        self._clients.clear()
+        # Aborted connections read EOF, so their handlers finish on their own
+        await asyncio.gather(*self._handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def snapshot(self):
+        """Frames bringing a new client up to date"""
+        frames = [encode_events(list(self.latest.values()), SNAPSHOT)]
+        frames.extend(encode_receiver(host, connected, message)
+                      for host, (connected, message) in self.receivers.items())
+        if self.alarm_level is not None:
+            frames.append(encode_level(self.alarm_level))
+        return b"".join(frames)
+
+    async def _handle_client(self, reader, writer):
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        # Nothing can be published between the snapshot and joining _clients
+        writer.write(self.snapshot())
+        self._clients.add(writer)
+        try:
+            async for frame_type, payload in read_frames(reader, MAX_CLIENT_FRAME):
+                if frame_type == LEVEL:
+                    level = decode_level(payload)
+                    self.on_alarm_level(level)
+                    self.publish_alarm_level(level)
+        except ConnectionError:
+            pass
+        except FrameError as e:  # Drop a client that does not follow the format
+            print(f"Event channel error: {str(e)}")
+        finally:
+            self._clients.discard(writer)
+            self._handlers.discard(handler)
+            writer.close()
+
+    def _send(self, data):
+        for writer in list(self._clients):
+            if writer.transport.get_write_buffer_size() > self.max_buffer:
+                print("Event channel: dropping a client that stopped reading")
+                self._clients.discard(writer)
+                writer.transport.abort()
+                continue
+            writer.write(data)
+
+    def publish_events(self, events):
+        latest = self.latest
+        for event in events:
+            latest[(event.sensor_id, event.kind)] = event
+        if self._clients:
+            self._send(encode_events(events))
+
+    def publish_receiver_status(self, host, connected, message):
+        self.receivers[host] = (connected, message)
+        if self._clients:
+            self._send(encode_receiver(host, connected, message))
+
+    def publish_poll_failed(self, message):
+        if self._clients:
+            self._send(encode_poll_failed(message))
+
+    def publish_alarms(self, alarms):
+        if self._clients:
+            self._send(encode_alarms(alarms))
+
+    def publish_alarm_level(self, level):
+        self.alarm_level = level
+        if self._clients:
+            self._send(encode_level(level))
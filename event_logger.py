@@ -0,0 +1,207 @@
+import asyncio
+import threading
+import time
+from collections import deque
+
+from metrics import REGISTRY
+from profiling import span
+
+# What to do when the queue is full
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+BLOCK = "block"
+
+QUEUE_DEPTH = REGISTRY.gauge("event_queue_depth", "Events waiting to be written to the database")
+FLUSH_SECONDS = REGISTRY.histogram("event_flush_seconds", "Time to write one batch of events")
+EVENTS_WRITTEN = REGISTRY.counter("events_written_total", "Events written to the database")
+EVENTS_DROPPED = REGISTRY.counter("events_dropped_total", "Events dropped because the queue was full")
+EVENTS_LOST = REGISTRY.counter("events_lost_total", "Events lost because their batch could not be written")
+
+
+def _on_event_loop():
+    """True when called from a thread running an asyncio event loop"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class EventRecord:
+    """One row for the event log"""
+    __slots__ = ("timestamp", "sensor_id", "event_type", "value", "details")
+
+    def __init__(self, timestamp, sensor_id, event_type, value, details=None):
+        self.timestamp = timestamp
+        self.sensor_id = sensor_id
+        self.event_type = event_type  # "state", "battery" or "alarm"
+        self.value = value
+        self.details = details
+
+    def as_row(self):
+        return (self.timestamp, self.sensor_id, self.event_type, self.value, self.details)
+
+
+class EventLogger:
+    """Write-behind queue that batches events into the database.
+
+    Callers (the polling thread, the alarm logic) only append to an
+    in-memory queue. A background thread hands the queued records to
+    write_batch, which stores them in a single transaction, as soon as
+    batch_size records are waiting or flush_interval seconds have passed.
+
+    The queue holds at most max_queue records. When the database cannot
+    keep up, the overflow policy decides what gives: DROP_OLDEST (default)
+    discards the oldest queued records, DROP_NEWEST rejects new ones, and
+    BLOCK makes log() wait up to block_timeout seconds for space.
+
+    A batch that fails to write (e.g. the database is locked) is retried
+    write_retries times, retry_delay seconds apart and doubling; only then
+    are its records given up and counted as lost.
+
+    BLOCK is only for callers that may stall, such as a batch import. On an
+    asyncio event loop (the poller) waiting would stop polling altogether,
+    so there BLOCK behaves like DROP_OLDEST; the poller uses DROP_OLDEST.
+    """
+
+    def __init__(self, write_batch, batch_size=200, flush_interval=1.0,
+                 max_queue=10000, overflow=DROP_OLDEST, block_timeout=1.0,
+                 write_retries=3, retry_delay=0.1):
+        if overflow not in (DROP_OLDEST, DROP_NEWEST, BLOCK):
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.write_batch = write_batch
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.write_retries = write_retries
+        self.retry_delay = retry_delay
+        self.dropped = 0
+        self.written = 0
+        self.lost = 0
+        self.failed_batches = 0
+        self._queue = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._flush_lock = threading.Lock()  # one writer at a time
+        self._closed = False
+        QUEUE_DEPTH.set_function(self._queue.__len__)
+        self._thread = threading.Thread(target=self._run, name="EventLogger", daemon=True)
+        self._thread.start()
+
+    @property
+    def queue_depth(self):
+        return len(self._queue)
+
+    def log(self, event_type, sensor_id, value, timestamp=None, details=None):
+        """Queue one event; returns False if it was dropped"""
+        record = EventRecord(time.time() if timestamp is None else timestamp,
+                             sensor_id, event_type, value, details)
+        return self._put([record])
+
+    def log_events(self, events):
+        """Queue SensorEvent objects coming from the EventPipeline"""
+        return self._put([
+            EventRecord(event.timestamp, event.sensor_id, event.kind, int(event.value))
+            for event in events
+        ])
+
+    def log_alarms(self, alarms):
+        """Queue Alarm objects from the AlarmEngine as alarm events"""
+        return self._put([
+            EventRecord(alarm.timestamp, alarm.sensor_id, "alarm", alarm.level, alarm.rule)
+            for alarm in alarms
+        ])
+
+    def _put(self, records):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Event logger is closed")
+            accepted = True
+            dropped = self.dropped
+            for record in records:
+                if len(self._queue) >= self.max_queue:
+                    if self.overflow == DROP_NEWEST:
+                        self.dropped += 1
+                        accepted = False
+                        continue
+                    if self.overflow == BLOCK and not _on_event_loop():
+                        self._not_empty.notify()
+                        if self._not_full.wait_for(
+                                lambda: len(self._queue) < self.max_queue or self._closed,
+                                self.block_timeout) and not self._closed:
+                            self._queue.append(record)
+                        else:
+                            self.dropped += 1
+                            accepted = False
+                        continue
+                    self._queue.popleft()
+                    self.dropped += 1
+                    accepted = False
+                self._queue.append(record)
+            if len(self._queue) >= self.batch_size:
+                self._not_empty.notify()
+            if self.dropped != dropped:
+                EVENTS_DROPPED.inc(self.dropped - dropped)
+            return accepted
+
+    def _take_batch(self):
+        with self._lock:
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._not_full.notify_all()
+            return batch
+
+    def _write(self, batch):
+        rows = [record.as_row() for record in batch]
+        delay = self.retry_delay
+        for attempt in range(self.write_retries + 1):
+            try:
+                with FLUSH_SECONDS.time(), span("db.write"):
+                    self.write_batch(rows)
+                self.written += len(batch)
+                EVENTS_WRITTEN.inc(len(batch))
+                return
+            except Exception as e:
+                error = e
+            if attempt < self.write_retries:
+                time.sleep(delay)
+                delay *= 2
+        self.failed_batches += 1
+        self.lost += len(batch)
+        EVENTS_LOST.inc(len(batch))
+        print(f"Event log write error, {len(batch)} events lost: {str(error)}")
+
+    def flush(self):
+        """Write everything queued so far, from the calling thread"""
+        with self._flush_lock:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    return
+                self._write(batch)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                # A full queue is written at once, even short of a whole batch
+                self._not_empty.wait_for(
+                    lambda: len(self._queue) >= min(self.batch_size, self.max_queue)
+                    or self._closed,
+                    self.flush_interval
+                )
+                if self._closed:
+                    return
+            self.flush()
+
+    def close(self):
+        """Stop the background thread and flush whatever is still queued"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        self._thread.join()
+        self.flush()
@@ -0,0 +1,93 @@
+import time
+
+
+class SensorEvent:
+    """A confirmed change of one sensor attribute"""
+    __slots__ = ("sensor_id", "kind", "value", "previous", "timestamp")
+
+    def __init__(self, sensor_id, kind, value, previous, timestamp):
+        self.sensor_id = sensor_id
+        self.kind = kind  # "state" or "battery"
+        self.value = value
+        self.previous = previous  # None for the first reading
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return (f"SensorEvent({self.sensor_id!r}, {self.kind}, "
+                f"{self.previous!r} -> {self.value!r}, {self.timestamp:.3f})")
+
+
+class ChangeDetector:
+    """Diff readings of one kind against the last confirmed value.
+
+    A new value only becomes a transition once it has been read consistently
+    for `debounce` seconds, which filters out contacts that chatter between
+    two polls. Readings equal to the confirmed value produce nothing.
+    """
+
+    def __init__(self, kind, debounce=0.0):
+        self.kind = kind
+        self.debounce = debounce
+        self._current = {}  # sensor_id -> confirmed value
+        self._candidate = {}  # sensor_id -> (value, first seen)
+
+    def current(self, sensor_id, default=None):
+        return self._current.get(sensor_id, default)
+
+    def update(self, readings, now):
+        events = []
+        current = self._current
+        candidate = self._candidate
+        for sensor_id, value in readings.items():
+            previous = current.get(sensor_id)
+            timestamp = now
+            if value == previous:
+                candidate.pop(sensor_id, None)
+                continue
+            # The first reading of a sensor is never debounced
+            if previous is not None and self.debounce > 0:
+                pending = candidate.get(sensor_id)
+                if pending is None or pending[0] != value:
+                    candidate[sensor_id] = (value, now)
+                    continue
+                if now - pending[1] < self.debounce:
+                    continue
+                del candidate[sensor_id]
+                # Date the transition from when it was first seen
+                timestamp = pending[1]
+            current[sensor_id] = value
+            events.append(SensorEvent(sensor_id, self.kind, value, previous, timestamp))
+        return events
+
+
+class EventPipeline:
+    """Turn raw poll results into change events for the subscribers.
+
+    The UI, the alarm logic and the database subscribe here and only see
+    actual transitions, not every poll.
+    """
+
+    def __init__(self, state_debounce=0.0, battery_debounce=0.0):
+        self.detectors = {
+            "state": ChangeDetector("state", state_debounce),
+            "battery": ChangeDetector("battery", battery_debounce),
+        }
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call callback(events) with every non-empty list of new events"""
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def current(self, kind, sensor_id, default=None):
+        return self.detectors[kind].current(sensor_id, default)
+
+    def publish(self, kind, readings, now=None):
+        """Feed {sensor_id: value} readings and dispatch resulting events"""
+        events = self.detectors[kind].update(readings, time.time() if now is None else now)
+        if events:
+            for callback in self._subscribers:
+                callback(events)
+        return events
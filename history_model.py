@@ -0,0 +1,315 @@
+from datetime import datetime
+
+from PySide6.QtCore import (
+    QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, Qt, Signal
+)
+from PySide6.QtGui import QColor
+
+from database import DAY, HOUR, CancelToken, QueryCancelled
+from modbus_client import SensorState
+from profiling import span
+
+# Shared colours, so data() never builds a QColor per cell
+RED = QColor("#c0392b")
+ORANGE = QColor("#e67e22")
+GREEN = QColor("#27ae60")
+GREY = QColor("#7f8c8d")
+
+ALARM_LEVELS = ("Low", "Medium", "High")
+
+
+def alert_count_color(count):
+    if count > 10:
+        return RED  # Red for high alerts
+    if count > 5:
+        return ORANGE  # Orange for medium
+    return GREEN  # Green for low
+
+
+class _QueryJob(QRunnable):
+    def __init__(self, runner, token, fn, args, kwargs):
+        super().__init__()
+        self.runner = runner
+        self.token = token
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+
+    def run(self):
+        try:
+            with span("db.query"):
+                result = self.fn(*self.args, cancel=self.token, **self.kwargs)
+        except QueryCancelled:
+            return
+        except Exception as e:
+            self.runner.query_failed.emit(self.token, str(e))
+            return
+        self.runner.result_ready.emit(self.token, result)
+
+
+class QueryRunner(QObject):
+    """Runs MonitoringDB reads on worker threads for the history window.
+
+    submit() returns at once; the callback is invoked on the GUI thread
+    with the result. cancel_all() interrupts queries still running, and
+    results of cancelled queries are discarded.
+    """
+    result_ready = Signal(object, object)  # CancelToken, result
+    query_failed = Signal(object, str)
+
+    def __init__(self, max_threads=2, parent=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._callbacks = {}
+        self.result_ready.connect(self._deliver)
+        self.query_failed.connect(self._fail)
+
+    def submit(self, fn, callback, *args, **kwargs):
+        """Run fn(*args, cancel=token, **kwargs) and pass the result to callback"""
+        token = CancelToken()
+        self._callbacks[token] = callback
+        self.pool.start(_QueryJob(self, token, fn, args, kwargs))
+        return token
+
+    @property
+    def busy(self):
+        return bool(self._callbacks)
+
+    def cancel(self, token):
+        self._callbacks.pop(token, None)
+        token.cancel()
+
+    def cancel_all(self, wait=False):
+        for token in list(self._callbacks):
+            self.cancel(token)
+        if wait:
+            self.pool.waitForDone()
+
+    def _deliver(self, token, result):
+        callback = self._callbacks.pop(token, None)
+        if callback is not None and not token.cancelled:
+            callback(result)
+
+    def _fail(self, token, message):
+        if self._callbacks.pop(token, None) is not None:
+            print(f"History query error: {message}")
+
+
+class AlertSummaryModel(QAbstractTableModel):
+    """Per-sensor alert totals from MonitoringDB.get_alert_summary()"""
+    HEADERS = ("Sensor Type", "ID", "Location", "Alert Count")
+    KEYS = ("sensor_type", "sensor_id", "location", "alert_count")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self._rows = rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return str(row[self.KEYS[index.column()]])
+        if role == Qt.ItemDataRole.ForegroundRole and index.column() == 3:
+            return alert_count_color(row["alert_count"])
+        return None
+
+
+class ActivityModel(QAbstractTableModel):
+    """Event and alert counts per time bucket from MonitoringDB.query_rollups()"""
+    HEADERS = ("Time", "Event", "Events", "Alerts", "Min", "Max")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self.resolution = HOUR
+
+    def set_rows(self, rows, resolution):
+        self.beginResetModel()
+        self._rows = rows
+        self.resolution = resolution
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        # (bucket, event_type, events, alerts, min value, max value)
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                fmt = "%Y-%m-%d" if self.resolution == DAY else (
+                    "%Y-%m-%d %H:00" if self.resolution == HOUR else "%Y-%m-%d %H:%M")
+                return datetime.fromtimestamp(row[0]).strftime(fmt)
+            if column >= 4:
+                return EventTableModel.format_value(row[1], row[column])
+            return str(row[column])
+        if role == Qt.ItemDataRole.ForegroundRole and column == 3:
+            return alert_count_color(row[3])
+        return None
+
+
+class EventTableModel(QAbstractTableModel):
+    """Raw event log, fetched lazily from the database one page at a time.
+
+    Rows are only loaded when the view scrolls near the end of what it has
+    (canFetchMore/fetchMore), using (timestamp, id) of the last row as the
+    cursor for the next page. Rows are kept as plain tuples and all display
+    text and colours are computed in data() for visible cells only.
+
+    With a QueryRunner, pages are fetched on a worker thread and appended
+    when they arrive, so scrolling never waits on the database.
+    """
+    HEADERS = ("Time", "Sensor ID", "Sensor Type", "Location", "Event", "Value")
+
+    # Column -> index into the row tuple
+    # (id, timestamp, sensor_id, sensor_type, location, event_type, value)
+    COLUMNS = (1, 2, 3, 4, 5, 6)
+
+    def __init__(self, db, page_size=200, runner=None, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.page_size = page_size
+        self.runner = runner
+        self.filters = {}
+        self._rows = []
+        self._exhausted = False
+        self._pending = None  # CancelToken of the page being fetched
+
+    def set_filters(self, **filters):
+        """Show only events matching MonitoringDB.query_events filters"""
+        self.filters = filters
+        self.reload()
+
+    def reload(self):
+        """Drop loaded rows and start again from the newest event"""
+        self.cancel()
+        self.beginResetModel()
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+
+    def cancel(self):
+        """Abandon the page being fetched, if any"""
+        if self._pending is not None:
+            self.runner.cancel(self._pending)
+            self._pending = None
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+        return not parent.isValid() and not self._exhausted and self._pending is None
+
+    def fetchMore(self, parent=QModelIndex()):
+        if not self.canFetchMore(parent):
+            return
+        before = None
+        if self._rows:
+            last = self._rows[-1]
+            before = (last[1], last[0])
+        if self.runner is None:
+            self.append_page(self.db.query_events(before=before, limit=self.page_size, **self.filters))
+        else:
+            self._pending = self.runner.submit(
+                self.db.query_events, self._page_loaded,
+                before=before, limit=self.page_size, **self.filters
+            )
+
+    def _page_loaded(self, page):
+        self._pending = None
+        self.append_page(page)
+
+    def append_page(self, page):
+        if len(page) < self.page_size:
+            self._exhausted = True
+        if not page:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(page) - 1)
+        self._rows.extend(page)
+        self.endInsertRows()
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        column = index.column()
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == 0:
+                return datetime.fromtimestamp(row[1]).strftime("%Y-%m-%d %H:%M:%S")
+            if column == 5:
+                return self.format_value(row[5], row[6])
+            return str(row[self.COLUMNS[column]])
+        if role == Qt.ItemDataRole.ForegroundRole and column in (4, 5):
+            return self.value_color(row[5], row[6])
+        return None
+
+    @staticmethod
+    def format_value(event_type, value):
+        if value is None:
+            return ""
+        if event_type == "state":
+            try:
+                return SensorState(value).name
+            except ValueError:
+                return str(value)
+        if event_type == "battery":
+            return f"{value}%"
+        if event_type == "alarm" and 0 <= value < len(ALARM_LEVELS):
+            return ALARM_LEVELS[value]
+        return str(value)
+
+    @staticmethod
+    def value_color(event_type, value):
+        if event_type == "alarm":
+            return RED
+        if event_type == "state":
+            if value == SensorState.OPEN:
+                return RED
+            if value == SensorState.CLOSED:
+                return GREEN
+            return GREY
+        if event_type == "battery" and value is not None:
+            if value < 20:
+                return RED
+            if value < 40:
+                return ORANGE
+            return GREEN
+        return None
@@ -1,9 +1,13 @@
 # main.py
+import argparse
+import os
 import sys
 from PySide6.QtWidgets import QApplication, QMessageBox
 from PySide6.QtCore import QTimer
 from login_window import LoginWindow
-from database import initialize_database
+from database import close_pool, initialize_database
+from metrics import METRICS_PORT, start_metrics_server
+import profiling
 
 def handle_exception(exc_type, exc_value, exc_traceback):
     """Global exception handler"""
@@ -15,20 +19,59 @@ def handle_exception(exc_type, exc_value, exc_traceback):
     )
     sys.__excepthook__(exc_type, exc_value, exc_traceback)
 
+def parse_profile_options(argv):
+    """Profiling flags; MONITORING_PROFILE=1 (spans) or =sample does the same.
+
+    Unrecognised arguments are returned for QApplication.
+    """
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--profile", action="store_true",
+                        help="time the poll, decode, UI and database paths")
+    parser.add_argument("--profile-sample", nargs="?", const=profiling.DEFAULT_OUTPUT,
+                        metavar="FILE", help="also sample stacks and write them to FILE")
+    options, remaining = parser.parse_known_args(argv[1:])
+    mode = os.environ.get("MONITORING_PROFILE", "").lower()
+    if mode == "sample" and options.profile_sample is None:
+        options.profile_sample = os.environ.get("MONITORING_PROFILE_OUTPUT", profiling.DEFAULT_OUTPUT)
+    options.profile = options.profile or options.profile_sample is not None \
+        or mode in ("1", "true", "spans", "sample")
+    return options, argv[:1] + remaining
+
 if __name__ == "__main__":
     # Set up global exception handling
     sys.excepthook = handle_exception
     
+    options, qt_argv = parse_profile_options(sys.argv)
+    if options.profile:
+        profiling.enable(sampling=options.profile_sample is not None)
+    
     try:
         # Initialize the database
         initialize_database()
         
+        # Local Prometheus endpoint; MONITORING_METRICS_PORT=0 turns it off
+        metrics_port = int(os.environ.get("MONITORING_METRICS_PORT", METRICS_PORT))
+        if metrics_port:
+            try:
+                start_metrics_server(metrics_port)
+            except OSError as e:
+                print(f"Metrics endpoint error: {str(e)}")
+        
         # Create application
-        app = QApplication(sys.argv)
+        app = QApplication(qt_argv)
         
         # Set application style and palette
         app.setStyle('Fusion')
         
+        # Release the shared database connections on exit
+        app.aboutToQuit.connect(close_pool)
+        
+        # Print the span summary and write the stack samples on exit
+        if options.profile:
+            app.aboutToQuit.connect(
+                lambda: profiling.shutdown(options.profile_sample or profiling.DEFAULT_OUTPUT)
+            )
+        
         # Create and show login window
         window = LoginWindow()
         window.show()
@@ -0,0 +1,308 @@
+"""Process-wide metrics: counters, gauges and histograms.
+
+Modules declare their metrics once at import time on REGISTRY and update
+them from any thread. The registry renders the Prometheus text format,
+served by MetricsServer on a local port, and gives the diagnostics panel
+a snapshot of every series.
+"""
+import bisect
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Seconds; fine enough for sub-millisecond requests and multi-second flushes
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_PORT = 9108
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        """The series for one combination of label values"""
+        values = tuple(str(value) for value in values)
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def series(self):
+        """[(label values, child)] for every series seen so far"""
+        if not self.labelnames and () not in self._children:
+            self.labels()
+        return sorted(self._children.items())
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    # Unlabelled metrics are used directly
+    def __getattr__(self, name):
+        if name.startswith("_") or self.labelnames:
+            raise AttributeError(name)
+        return getattr(self.labels(), name)
+
+
+class _CounterChild:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """A value that only goes up"""
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_function")
+
+    def __init__(self):
+        self._value = 0
+        self._function = None
+
+    def set(self, value):
+        self._value = value
+
+    def set_function(self, function):
+        """Read the value from function() whenever the gauge is collected"""
+        self._function = function
+
+    @property
+    def value(self):
+        if self._function is not None:
+            try:
+                return self._function()
+            except Exception:
+                return math.nan
+        return self._value
+
+
+class Gauge(_Metric):
+    """A value that can go up and down"""
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+
+class _HistogramChild:
+    __slots__ = ("buckets", "counts", "count", "sum", "_lock")
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the duration of its block"""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimate a quantile by interpolating within its bucket"""
+        if not self.count:
+            return math.nan
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                if i == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[i - 1] if i else 0.0
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (durations, in seconds)"""
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+
+class MetricsRegistry:
+    """All metrics of the process, by name"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} already registered as a {metric.kind}")
+            return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def metrics(self):
+        with self._lock:
+            return sorted(self._metrics.values(), key=lambda metric: metric.name)
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self.metrics():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for values, child in metric.series():
+                labels = _format_labels(metric.labelnames, values)
+                if metric.kind == "histogram":
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (math.inf,), child.counts):
+                        cumulative += count
+                        le = "+Inf" if bound == math.inf else repr(bound)
+                        bucket_labels = _format_labels(metric.labelnames + ("le",), values + (le,))
+                        lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+                    lines.append(f"{metric.name}_sum{labels} {_format_value(child.sum)}")
+                    lines.append(f"{metric.name}_count{labels} {child.count}")
+                else:
+                    lines.append(f"{metric.name}{labels} {_format_value(child.value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        """[(name, labels, kind, summary)] rows for the diagnostics panel"""
+        rows = []
+        for metric in self.metrics():
+            for values, child in metric.series():
+                labels = ", ".join(f"{k}={v}" for k, v in zip(metric.labelnames, values))
+                if metric.kind == "histogram":
+                    summary = {"count": child.count,
+                               "mean": child.sum / child.count if child.count else math.nan,
+                               "p50": child.quantile(0.5), "p99": child.quantile(0.99)}
+                else:
+                    summary = {"value": child.value}
+                rows.append((metric.name, labels, metric.kind, summary))
+        return rows
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isnan(value):
+            return "NaN"
+        if math.isinf(value):
+            return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+REGISTRY = MetricsRegistry()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # No access log on stderr
+
+
+class MetricsServer:
+    """Serve /metrics for Prometheus from a background thread"""
+
+    def __init__(self, host="127.0.0.1", port=METRICS_PORT, registry=REGISTRY):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.host = host
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="MetricsServer",
+                                        daemon=True)
+        self._thread.start()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+_server = None
+
+
+def start_metrics_server(port=METRICS_PORT, host="127.0.0.1"):
+    """Start the process-wide /metrics endpoint (once)"""
+    global _server
+    if _server is None:
+        _server = MetricsServer(host, port)
+    return _server
+
+
+def metrics_endpoint():
+    """URL of the running /metrics endpoint, or None"""
+    if _server is None:
+        return None
+    return f"http://{_server.host}:{_server.port}/metrics"
@@ -0,0 +1,322 @@
+import asyncio
+import struct
+import time
+from enum import IntEnum
+
+from metrics import REGISTRY
+from profiling import span
+
+# Define Modbus constants
+MODBUS_PORT = 502
+MODBUS_UNIT_ID = 1
+MBAP_HEADER_SIZE = 7
+MAX_MBAP_LENGTH = 254  # unit id + largest PDU (260 byte ADU)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "modbus_request_seconds", "Round trip of MODBUS requests", ("receiver",))
+REQUEST_TIMEOUTS = REGISTRY.counter(
+    "modbus_timeouts_total", "MODBUS requests that got no response in time", ("receiver",))
+DECODE_ERRORS = REGISTRY.counter(
+    "modbus_decode_errors_total", "Responses that could not be framed or decoded", ("receiver",))
+
+class SensorState(IntEnum):
+    OPEN = 0
+    CLOSED = 1
+    UNKNOWN = 2
+    LOW_BATTERY = 3
+
+class ModbusFunction(IntEnum):
+    READ_COILS = 1
+    READ_DISCRETE_INPUTS = 2
+    READ_HOLDING_REGISTERS = 3
+    READ_INPUT_REGISTERS = 4
+    WRITE_SINGLE_COIL = 5
+
+BIT_FUNCTIONS = (ModbusFunction.READ_COILS, ModbusFunction.READ_DISCRETE_INPUTS)
+REGISTER_FUNCTIONS = (ModbusFunction.READ_HOLDING_REGISTERS, ModbusFunction.READ_INPUT_REGISTERS)
+
+# Largest quantity a single read request may ask for (MODBUS spec)
+MAX_READ_BITS = 2000
+MAX_READ_REGISTERS = 125
+
+
+def create_modbus_request(function, address, count=0, value=0,
+                          transaction_id=0x0001, unit_id=MODBUS_UNIT_ID):
+    """Create MODBUS TCP request"""
+    protocol_id = 0x0000
+
+    if function in BIT_FUNCTIONS or function in REGISTER_FUNCTIONS:
+        # Read request
+        data = struct.pack(">BHH", function, address, count)
+    elif function == ModbusFunction.WRITE_SINGLE_COIL:
+        # Write request
+        data = struct.pack(">BHH", function, address, value)
+    else:
+        raise ValueError("Unsupported function code")
+
+    # Length covers the unit id plus the PDU
+    length = 1 + len(data)
+    header = struct.pack(">HHHB", transaction_id, protocol_id, length, unit_id)
+    return header + data
+
+
+class ModbusError(Exception):
+    """Raised when the receiver answers with a MODBUS exception response"""
+
+    def __init__(self, function, code):
+        super().__init__(f"MODBUS exception code {code} for function {function}")
+        self.function = function
+        self.code = code
+
+
+class MBAPFrameReader:
+    """Streaming decoder that splits a MODBUS/TCP byte stream into frames.
+
+    TCP may deliver half a frame or several frames in one read, so frames
+    are delimited with the MBAP length field rather than per read. Incoming
+    bytes are written straight into a preallocated buffer (see get_buffer)
+    and complete frames are handed out as memoryview slices of it, which
+    stay valid until the next call to get_buffer.
+    """
+
+    def __init__(self, capacity=4096):
+        if capacity < 2 * (6 + MAX_MBAP_LENGTH):
+            raise ValueError("Buffer too small for a MODBUS frame")
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def get_buffer(self, sizehint=-1):
+        """Return the writable free space at the end of the buffer"""
+        if self._start == self._end:
+            self._start = self._end = 0
+        elif len(self._buffer) - self._end < 6 + MAX_MBAP_LENGTH:
+            # Move the partial frame to the front to make room
+            pending = self._end - self._start
+            self._view[:pending] = self._view[self._start:self._end]
+            self._start, self._end = 0, pending
+        return self._view[self._end:]
+
+    def buffer_updated(self, nbytes):
+        """Record that nbytes were written into the last get_buffer()"""
+        self._end += nbytes
+
+    def feed(self, data):
+        """Copy data into the buffer (for callers that read into bytes)"""
+        data = memoryview(data)
+        while data:
+            buffer = self.get_buffer()
+            nbytes = min(len(buffer), len(data))
+            buffer[:nbytes] = data[:nbytes]
+            self.buffer_updated(nbytes)
+            data = data[nbytes:]
+            if data and self._start == 0 and self._end == len(self._buffer):
+                raise ValueError("Frame buffer overflow")
+
+    def frames(self):
+        """Yield every complete frame currently in the buffer"""
+        while self._end - self._start >= MBAP_HEADER_SIZE:
+            length = (self._buffer[self._start + 4] << 8) | self._buffer[self._start + 5]
+            if not 2 <= length <= MAX_MBAP_LENGTH:
+                self._start = self._end = 0
+                raise ValueError(f"Invalid MBAP length {length}")
+            frame_end = self._start + 6 + length
+            if frame_end > self._end:
+                break
+            frame = self._view[self._start:frame_end]
+            self._start = frame_end
+            yield frame
+
+    def clear(self):
+        self._start = self._end = 0
+
+
+def decode_bits(response, count):
+    """Decode the bit values of a READ_COILS/READ_DISCRETE_INPUTS response"""
+    byte_count = response[MBAP_HEADER_SIZE + 1]
+    data = response[MBAP_HEADER_SIZE + 2:MBAP_HEADER_SIZE + 2 + byte_count]
+    if len(data) * 8 < count:
+        raise ValueError("Invalid response length")
+    return [bool(data[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+def decode_registers(response, count):
+    """Decode the values of a READ_HOLDING/INPUT_REGISTERS response"""
+    byte_count = response[MBAP_HEADER_SIZE + 1]
+    if byte_count < 2 * count or len(response) < MBAP_HEADER_SIZE + 2 + 2 * count:
+        raise ValueError("Invalid response length")
+    return list(struct.unpack_from(f">{count}H", response, MBAP_HEADER_SIZE + 2))
+
+
+class ModbusClient(asyncio.BufferedProtocol):
+    """Pipelined MODBUS/TCP client.
+
+    Every request gets its own transaction id and is recorded in a table of
+    pending requests. Responses are matched back to their request by the
+    MBAP header, so many requests can be in flight on one connection and a
+    late reply to a timed-out request is recognised and dropped.
+
+    The socket reads straight into an MBAPFrameReader buffer, and responses
+    are decoded in place by the decoder given with each request.
+    """
+
+    def __init__(self, unit_id=MODBUS_UNIT_ID, timeout=2.0, max_in_flight=32, receiver=""):
+        self.unit_id = unit_id
+        self.receiver = receiver  # Label for the metrics
+        self.timeout = timeout
+        self.transport = None
+        self.stale_responses = 0
+        self._pending = {}  # transaction id -> (future, unit id, function, decoder)
+        self._last_transaction_id = 0
+        self._reader = MBAPFrameReader()
+        self._in_flight = asyncio.Semaphore(max_in_flight)
+        self._closed = None
+        self._latency = REQUEST_SECONDS.labels(receiver)
+        self._timeouts = REQUEST_TIMEOUTS.labels(receiver)
+        self._decode_errors = DECODE_ERRORS.labels(receiver)
+
+    @classmethod
+    async def connect(cls, host, port=MODBUS_PORT, unit_id=MODBUS_UNIT_ID,
+                      timeout=2.0, max_in_flight=32):
+        """Open a connection to a receiver and return the connected client"""
+        loop = asyncio.get_running_loop()
+        client = cls(unit_id, timeout, max_in_flight, receiver=host)
+        await asyncio.wait_for(
+            loop.create_connection(lambda: client, host, port), timeout
+        )
+        return client
+
+    @property
+    def connected(self):
+        return self.transport is not None and not self.transport.is_closing()
+
+    @property
+    def in_flight(self):
+        return len(self._pending)
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+
+    async def wait_closed(self):
+        if self._closed is not None:
+            await self._closed
+
+    # asyncio.Protocol callbacks
+    def connection_made(self, transport):
+        self.transport = transport
+        self._closed = asyncio.get_running_loop().create_future()
+
+    def get_buffer(self, sizehint):
+        return self._reader.get_buffer(sizehint)
+
+    def buffer_updated(self, nbytes):
+        self._reader.buffer_updated(nbytes)
+        try:
+            for frame in self._reader.frames():
+                self._dispatch(frame)
+        except ValueError:
+            # Framing lost, there is no way to resynchronise the stream
+            self._decode_errors.inc()
+            self.transport.close()
+
+    def connection_lost(self, exc):
+        error = exc or ConnectionError("Connection closed by receiver")
+        for future, _, _, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+        if self._closed is not None and not self._closed.done():
+            self._closed.set_result(None)
+
+    def _dispatch(self, frame):
+        transaction_id, protocol_id, _, unit_id = struct.unpack_from(">HHHB", frame)
+        entry = self._pending.pop(transaction_id, None)
+        if entry is None or protocol_id != 0:
+            # Reply to a request that already timed out (or garbage)
+            self.stale_responses += 1
+            return
+        future, expected_unit, function, decoder = entry
+        if future.done():
+            return
+        if unit_id != expected_unit or len(frame) <= MBAP_HEADER_SIZE \
+                or frame[MBAP_HEADER_SIZE] & 0x7F != function:
+            self._decode_errors.inc()
+            future.set_exception(ValueError("Response does not match request"))
+        elif frame[MBAP_HEADER_SIZE] & 0x80:
+            code = frame[MBAP_HEADER_SIZE + 1] if len(frame) > MBAP_HEADER_SIZE + 1 else 0
+            future.set_exception(ModbusError(function, code))
+        else:
+            try:
+                with span("decode"):
+                    result = decoder(frame) if decoder else bytes(frame)
+                future.set_result(result)
+            except Exception as e:
+                self._decode_errors.inc()
+                future.set_exception(e)
+
+    def _next_transaction_id(self):
+        """Allocate the next free transaction id (1..0xFFFF, wrapping)"""
+        transaction_id = self._last_transaction_id
+        for _ in range(0xFFFF):
+            transaction_id = transaction_id % 0xFFFF + 1
+            if transaction_id not in self._pending:
+                self._last_transaction_id = transaction_id
+                return transaction_id
+        raise RuntimeError("No free MODBUS transaction ids")
+
+    async def request(self, function, address, count=0, value=0, unit_id=None, decoder=None):
+        """Send one request and wait for its matching response.
+
+        The response frame is passed to decoder (if given) while it is still
+        in the receive buffer; otherwise a copy of the frame is returned.
+        """
+        unit_id = self.unit_id if unit_id is None else unit_id
+        async with self._in_flight:
+            if not self.connected:
+                raise ConnectionError("Not connected to receiver")
+            transaction_id = self._next_transaction_id()
+            future = asyncio.get_running_loop().create_future()
+            self._pending[transaction_id] = (future, unit_id, int(function), decoder)
+            start = time.perf_counter()
+            try:
+                self.transport.write(create_modbus_request(
+                    function, address, count, value, transaction_id, unit_id
+                ))
+                result = await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self._timeouts.inc()
+                raise
+            finally:
+                self._pending.pop(transaction_id, None)
+            self._latency.observe(time.perf_counter() - start)
+            return result
+
+    async def read_coils(self, address, count, unit_id=None):
+        return await self.request(ModbusFunction.READ_COILS, address, count, unit_id=unit_id,
+                                  decoder=lambda frame: decode_bits(frame, count))
+
+    async def read_discrete_inputs(self, address, count, unit_id=None):
+        return await self.request(ModbusFunction.READ_DISCRETE_INPUTS, address, count, unit_id=unit_id,
+                                  decoder=lambda frame: decode_bits(frame, count))
+
+    async def read_holding_registers(self, address, count, unit_id=None):
+        return await self.request(ModbusFunction.READ_HOLDING_REGISTERS, address, count, unit_id=unit_id,
+                                  decoder=lambda frame: decode_registers(frame, count))
+
+    async def read_input_registers(self, address, count, unit_id=None):
+        return await self.request(ModbusFunction.READ_INPUT_REGISTERS, address, count, unit_id=unit_id,
+                                  decoder=lambda frame: decode_registers(frame, count))
+
+    async def read(self, function, address, count, unit_id=None):
+        """Read bits or registers depending on the function code"""
+        decode = decode_bits if function in BIT_FUNCTIONS else decode_registers
+        return await self.request(function, address, count, unit_id=unit_id,
+                                  decoder=lambda frame: decode(frame, count))
+
+    async def write_single_coil(self, address, value, unit_id=None):
+        return await self.request(ModbusFunction.WRITE_SINGLE_COIL, address, value=value, unit_id=unit_id)
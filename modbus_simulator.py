@@ -0,0 +1,299 @@
+"""Local MODBUS/TCP receiver simulator for load and soak testing.
+
+Emulates a receiver with N Enless sensors on localhost, so the polling
+stack can be exercised without the hardware:
+
+    python modbus_simulator.py --sensors 300 --port 5020 --latency 0.01
+
+Sensor n (1-based) reports its contact state as discrete input n - 1
+(set = CLOSED) and its battery level in input register 0x200 + n - 1,
+matching SensorBank.sensor_configs(). Coils are writable and readable.
+"""
+import argparse
+import asyncio
+import heapq
+import random
+import struct
+import time
+
+from modbus_client import (
+    BIT_FUNCTIONS, MAX_READ_BITS, MAX_READ_REGISTERS, MODBUS_PORT, MBAPFrameReader,
+    ModbusFunction, REGISTER_FUNCTIONS
+)
+from read_planner import BATTERY_REGISTER_BASE, sequential_sensors
+
+# MODBUS exception codes
+ILLEGAL_FUNCTION = 1
+ILLEGAL_DATA_ADDRESS = 2
+ILLEGAL_DATA_VALUE = 3
+
+SIMULATOR_PORT = 5020  # Unprivileged stand-in for MODBUS_PORT
+
+
+class SensorBank:
+    """State and battery of the simulated sensors.
+
+    Each sensor flips between OPEN and CLOSED as a Poisson process with
+    state_change_rate changes per second, and its battery drains linearly
+    by battery_drain percent per hour from a random starting level. The
+    simulation is advanced lazily, only when the receiver is read.
+    """
+
+    def __init__(self, count, state_change_rate=1 / 60, battery_drain=0.0,
+                 battery_range=(60, 100), seed=None):
+        self.count = count
+        self.state_change_rate = state_change_rate
+        self.battery_drain = battery_drain
+        self.random = random.Random(seed)
+        self.started = time.monotonic()
+        self.states = bytearray(self.random.randint(0, 1) for _ in range(count))
+        self.batteries = [self.random.uniform(*battery_range) for _ in range(count)]
+        self.coils = {}
+        self.state_changes = 0
+        self._now = self.started
+        # (time of next change, sensor index)
+        self._changes = []
+        if state_change_rate > 0:
+            self._changes = [(self._now + self.random.expovariate(state_change_rate), i)
+                             for i in range(count)]
+            heapq.heapify(self._changes)
+
+    def sensor_configs(self, host=None, unit_id=1, **kwargs):
+        """SensorConfig for every simulated sensor, for PollingWorker"""
+        return sequential_sensors(self.count, host, unit_id=unit_id, **kwargs)
+
+    def advance(self, now=None):
+        """Apply every state change due by now"""
+        now = time.monotonic() if now is None else now
+        self._now = now
+        changes = self._changes
+        while changes and changes[0][0] <= now:
+            due, i = changes[0]
+            self.states[i] ^= 1
+            self.state_changes += 1
+            heapq.heapreplace(changes, (due + self.random.expovariate(self.state_change_rate), i))
+
+    def set_all(self, state):
+        """Force every sensor to one state, e.g. to simulate a fire alarm"""
+        self.states[:] = bytes([state]) * self.count
+
+    def battery(self, i):
+        hours = (self._now - self.started) / 3600.0
+        return max(0, min(100, int(self.batteries[i] - self.battery_drain * hours)))
+
+    def read_bits(self, function, address, count):
+        """Packed bits, or None if the range is not mapped"""
+        if function == ModbusFunction.READ_COILS:
+            values = [self.coils.get(address + i, 0) for i in range(count)]
+        elif address + count <= self.count:
+            values = self.states[address:address + count]
+        else:
+            return None
+        packed = bytearray((count + 7) // 8)
+        for i, value in enumerate(values):
+            if value:
+                packed[i >> 3] |= 1 << (i & 7)
+        return bytes(packed)
+
+    def read_registers(self, address, count):
+        """Big-endian register values, or None if the range is not mapped"""
+        first = address - BATTERY_REGISTER_BASE
+        if first < 0 or first + count > self.count:
+            return None
+        return struct.pack(f">{count}H", *(self.battery(first + i) for i in range(count)))
+
+
+class SimulatorProtocol(asyncio.Protocol):
+    """One client connection to the simulated receiver"""
+
+    def __init__(self, simulator):
+        self.simulator = simulator
+        self.reader = MBAPFrameReader()
+        self.transport = None
+        self.outgoing = asyncio.Queue()
+        self.writer = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.simulator.connections.add(self)
+        self.writer = asyncio.ensure_future(self._write_responses())
+
+    def connection_lost(self, exc):
+        self.simulator.connections.discard(self)
+        self.writer.cancel()
+
+    def data_received(self, data):
+        simulator = self.simulator
+        try:
+            self.reader.feed(data)
+            for frame in self.reader.frames():
+                simulator.requests += 1
+                if simulator.random.random() < simulator.drop_rate:
+                    simulator.dropped_connections += 1
+                    self.transport.abort()
+                    return
+                response = simulator.respond(frame)
+                delay = simulator.response_delay()
+                if delay > 0:
+                    asyncio.get_running_loop().call_later(delay, self.outgoing.put_nowait, response)
+                else:
+                    self.outgoing.put_nowait(response)
+        except ValueError as e:
+            print(f"Simulator error: {str(e)}")
+            self.transport.abort()
+
+    async def _write_responses(self):
+        """Write responses in order, splitting some across several segments"""
+        simulator = self.simulator
+        while True:
+            response = await self.outgoing.get()
+            if self.transport.is_closing():
+                return
+            if len(response) > 1 and simulator.random.random() < simulator.split_rate:
+                simulator.split_responses += 1
+                cut = simulator.random.randint(1, len(response) - 1)
+                self.transport.write(response[:cut])
+                await asyncio.sleep(simulator.split_delay)
+                if self.transport.is_closing():
+                    return
+                response = response[cut:]
+            self.transport.write(response)
+
+
+class ModbusSimulator:
+    """MODBUS/TCP server answering for a SensorBank.
+
+    latency (+ up to latency_jitter) delays every response, so responses to
+    pipelined requests can come back out of order. split_rate is the share
+    of responses written as two TCP segments split_delay apart, and
+    drop_rate the chance that a request makes the receiver drop the
+    connection instead of answering.
+    """
+
+    def __init__(self, bank, host="127.0.0.1", port=SIMULATOR_PORT, latency=0.0,
+                 latency_jitter=0.0, split_rate=0.0, split_delay=0.001, drop_rate=0.0,
+                 seed=None):
+        self.bank = bank
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.split_rate = split_rate
+        self.split_delay = split_delay
+        self.drop_rate = drop_rate
+        self.random = random.Random(seed)
+        self.connections = set()
+        self.requests = 0
+        self.split_responses = 0
+        self.dropped_connections = 0
+        self._server = None
+
+    async def start(self):
+        """Start listening; with port=0 the chosen port is stored in self.port"""
+        self._server = await asyncio.get_running_loop().create_server(
+            lambda: SimulatorProtocol(self), self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._server.serve_forever()
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for connection in list(self.connections):
+                connection.transport.abort()
+            await self._server.wait_closed()
+            self._server = None
+
+    def drop_connections(self):
+        """Abort every open connection, as a receiver reboot would"""
+        for connection in list(self.connections):
+            self.dropped_connections += 1
+            connection.transport.abort()
+
+    def response_delay(self):
+        if self.latency_jitter:
+            return self.latency + self.random.uniform(0, self.latency_jitter)
+        return self.latency
+
+    def respond(self, frame):
+        """Build the response frame to one request frame"""
+        transaction_id, protocol_id, length, unit_id = struct.unpack_from(">HHHB", frame)
+        function = frame[7]
+        if function in BIT_FUNCTIONS or function in REGISTER_FUNCTIONS:
+            if length != 6:
+                return self._exception(transaction_id, unit_id, function, ILLEGAL_DATA_VALUE)
+            address, count = struct.unpack_from(">HH", frame, 8)
+            limit = MAX_READ_BITS if function in BIT_FUNCTIONS else MAX_READ_REGISTERS
+            if not 1 <= count <= limit:
+                return self._exception(transaction_id, unit_id, function, ILLEGAL_DATA_VALUE)
+            self.bank.advance()
+            if function in BIT_FUNCTIONS:
+                data = self.bank.read_bits(function, address, count)
+            else:
+                data = self.bank.read_registers(address, count)
+            if data is None:
+                return self._exception(transaction_id, unit_id, function, ILLEGAL_DATA_ADDRESS)
+            pdu = struct.pack(">BB", function, len(data)) + data
+        elif function == ModbusFunction.WRITE_SINGLE_COIL and length == 6:
+            address, value = struct.unpack_from(">HH", frame, 8)
+            self.bank.coils[address] = 1 if value else 0
+            pdu = bytes(frame[7:12])  # Echo the request
+        else:
+            return self._exception(transaction_id, unit_id, function, ILLEGAL_FUNCTION)
+        return struct.pack(">HHHB", transaction_id, 0, len(pdu) + 1, unit_id) + pdu
+
+    @staticmethod
+    def _exception(transaction_id, unit_id, function, code):
+        return struct.pack(">HHHBBB", transaction_id, 0, 3, unit_id, function | 0x80, code)
+
+
+async def run_simulator(args):
+    bank = SensorBank(args.sensors, args.change_rate, args.battery_drain, seed=args.seed)
+    simulator = ModbusSimulator(
+        bank, args.host, args.port, args.latency, args.jitter, args.split_rate,
+        drop_rate=args.drop_rate, seed=args.seed
+    )
+    await simulator.start()
+    print(f"Simulating {args.sensors} sensors on {args.host}:{simulator.port}")
+    last_requests = 0
+    while True:
+        await asyncio.sleep(args.report_interval)
+        rate = (simulator.requests - last_requests) / args.report_interval
+        last_requests = simulator.requests
+        print(f"{rate:.0f} req/s, {len(simulator.connections)} connections, "
+              f"{bank.state_changes} state changes, {simulator.split_responses} split, "
+              f"{simulator.dropped_connections} dropped")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulated MODBUS/TCP sensor receiver")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SIMULATOR_PORT,
+                        help=f"listening port (the real receiver uses {MODBUS_PORT})")
+    parser.add_argument("--sensors", type=int, default=50)
+    parser.add_argument("--change-rate", type=float, default=1 / 60,
+                        help="state changes per sensor per second")
+    parser.add_argument("--battery-drain", type=float, default=0.0,
+                        help="battery percent lost per hour")
+    parser.add_argument("--latency", type=float, default=0.0, help="response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random delay in seconds")
+    parser.add_argument("--split-rate", type=float, default=0.0,
+                        help="share of responses sent in two segments")
+    parser.add_argument("--drop-rate", type=float, default=0.0,
+                        help="chance per request of dropping the connection")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--report-interval", type=float, default=5.0)
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(run_simulator(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
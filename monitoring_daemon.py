@@ -0,0 +1,157 @@
+"""Headless monitoring service: polling and event logging without Qt.
+
+Runs the PollingEngine and the EventLogger in a plain asyncio process, so
+monitoring carries on around the clock whether or not anyone is logged in
+to the dashboard. GUI sessions attach to it over the local event channel
+(see event_channel.py) and detach again on logout:
+
+    python monitoring_daemon.py --host 192.168.1.100 --sensors 50
+
+The daemon also evaluates the alarm rules (see alarm_engine.py), logging
+every alarm, and runs the retention job (see retention.py), so old raw
+events are rolled up and pruned while it runs.
+
+Stops cleanly on SIGINT or SIGTERM, writing out any queued events first.
+"""
+import argparse
+import asyncio
+import os
+import signal
+
+from alarm_engine import DEFAULT_RULES, RULES_PATH, load_rules, zones_from_sensors
+from database import MonitoringDB, close_pool, initialize_database
+from event_channel import DEFAULT_SOCKET, EventPublisher
+from event_logger import EventLogger
+from metrics import METRICS_PORT, start_metrics_server
+from modbus_client import MODBUS_PORT
+from polling_engine import PollingEngine
+from read_planner import sequential_sensors
+from retention import RetentionJob, RetentionPolicy
+import profiling
+
+
+class MonitoringDaemon:
+    """Polls the receivers, logs every change and publishes it to GUI clients"""
+
+    def __init__(self, host, sensors, socket_path=DEFAULT_SOCKET, port=MODBUS_PORT,
+                 interval=5.0, state_debounce=0.0, retention=None, alarm_rules=DEFAULT_RULES,
+                 zones=None, alarm_level=0):
+        self.retention = retention
+        self.publisher = EventPublisher(socket_path, on_alarm_level=self.on_alarm_level)
+        self.engine = PollingEngine(
+            host, sensors, port, interval, state_debounce=state_debounce,
+            on_receiver_status=self.on_receiver_status,
+            on_poll_failed=self.publisher.publish_poll_failed,
+            alarm_rules=alarm_rules, zones=zones, alarm_level=alarm_level
+        )
+        self._stop_event = None
+
+    def on_receiver_status(self, host, connected, message):
+        if not connected:
+            print(f"Receiver {host} unavailable: {message}")
+        else:
+            print(f"Receiver {host} connected")
+        self.publisher.publish_receiver_status(host, connected, message)
+
+    def on_alarm_level(self, level):
+        """A dashboard moved its alarm level slider"""
+        self.engine.set_alarm_level(level)
+        print(f"Alarm level set to {level}")
+
+    def on_alarms(self, alarms):
+        for alarm in alarms:
+            print(f"Alarm (level {alarm.level}): {alarm.rule}, sensor {alarm.sensor_id}")
+        self.publisher.publish_alarms(alarms)
+
+    async def run(self):
+        self._stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self._stop_event.set)
+
+        await self.publisher.start()
+        db = MonitoringDB()
+        event_logger = EventLogger(db.log_events)
+        self.engine.pipeline.subscribe(event_logger.log_events)
+        self.engine.pipeline.subscribe(self.publisher.publish_events)
+        self.engine.alarms.subscribe(event_logger.log_alarms)
+        self.engine.alarms.subscribe(self.on_alarms)
+        self.publisher.publish_alarm_level(self.engine.alarms.level)
+        retention_job = RetentionJob(db, self.retention or RetentionPolicy.load(db))
+        retention_job.start()
+        print(f"Monitoring {len(self.engine.jobs)} poll jobs; clients attach on {self.publisher.path}")
+        try:
+            await self.engine.run(self._stop_event)
+        finally:
+            await self.publisher.close()
+            retention_job.close()
+            event_logger.close()
+            db.close()
+
+    def stop(self):
+        """Stop polling; call on the daemon's loop"""
+        if self._stop_event is not None:
+            self._stop_event.set()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Headless sensor monitoring service")
+    parser.add_argument("--host", default="192.168.1.100", help="MODBUS receiver address")
+    parser.add_argument("--port", type=int, default=MODBUS_PORT)
+    parser.add_argument("--sensors", type=int, default=1,
+                        help="sensors 1..N in the receiver's default register layout")
+    parser.add_argument("--interval", type=float, default=5.0, help="state poll interval (s)")
+    parser.add_argument("--debounce", type=float, default=0.0,
+                        help="seconds a new state must persist before it is reported")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET, help="path GUI clients attach on")
+    parser.add_argument("--metrics-port", type=int,
+                        default=int(os.environ.get("MONITORING_METRICS_PORT", METRICS_PORT)),
+                        help="Prometheus endpoint port, 0 to disable")
+    parser.add_argument("--retain-raw-days", type=float, default=None,
+                        help="days raw events are kept before only rollups remain; "
+                             "saved for later runs (default: the saved value, or 90)")
+    parser.add_argument("--rules", default=RULES_PATH,
+                        help="JSON file of alarm rules (default: built-in rules)")
+    parser.add_argument("--alarm-level", type=int, choices=(0, 1, 2), default=0,
+                        help="alarm level at start: 0 Low, 1 Medium, 2 High")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the poll, decode and database paths")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        profiling.enable()
+    initialize_database()
+    try:
+        rules = load_rules(args.rules)
+    except (OSError, ValueError, TypeError) as e:
+        print(f"Alarm rules error: {str(e)}")
+        raise SystemExit(1)
+    db = MonitoringDB()
+    zones = zones_from_sensors(db.get_sensors())
+    retention = RetentionPolicy.load(db)
+    if args.retain_raw_days is not None:
+        retention.raw_days = args.retain_raw_days
+        retention.save(db)
+    db.close()
+    if args.metrics_port:
+        try:
+            start_metrics_server(args.metrics_port)
+        except OSError as e:
+            print(f"Metrics endpoint error: {str(e)}")
+
+    daemon = MonitoringDaemon(args.host, sequential_sensors(args.sensors), args.socket,
+                              args.port, args.interval, args.debounce,
+                              retention, rules, zones,
+                              args.alarm_level)
+    try:
+        asyncio.run(daemon.run())
+    except RuntimeError as e:
+        print(f"Daemon error: {str(e)}")
+        raise SystemExit(1)
+    finally:
+        close_pool()
+        profiling.shutdown()
+
+
+if __name__ == "__main__":
+    main()
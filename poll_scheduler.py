@@ -0,0 +1,106 @@
+import asyncio
+import heapq
+import itertools
+import random
+import time
+
+
+class PollJob:
+    """A callback that the scheduler runs every `interval` seconds"""
+
+    def __init__(self, key, interval, callback, jitter):
+        self.key = key
+        self.interval = interval
+        self.callback = callback
+        self.jitter = jitter
+        self.next_run = 0.0
+        self.task = None
+        self.runs = 0
+        self.skipped = 0
+        self.cancelled = False
+
+    @property
+    def in_flight(self):
+        return self.task is not None and not self.task.done()
+
+
+class PollScheduler:
+    """Heap-ordered asyncio scheduler for polls with their own intervals.
+
+    Each job keeps its own cadence (state every second, battery every few
+    minutes, ...). A random jitter is added to every interval so jobs that
+    share a cadence spread out instead of bursting onto the receiver at the
+    same instant. If a job's previous run is still in flight when it comes
+    due again, that run is skipped rather than stacking up requests.
+    """
+
+    def __init__(self, jitter=0.1, start_spread=1.0):
+        self.jitter = jitter
+        self.start_spread = start_spread
+        self._jobs = {}
+        self._heap = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+
+    def add(self, key, interval, callback, jitter=None):
+        """Schedule `await callback()` every interval seconds"""
+        if key in self._jobs:
+            self.remove(key)
+        job = PollJob(key, interval, callback, self.jitter if jitter is None else jitter)
+        # Spread the first runs over a short window to desynchronise jobs
+        job.next_run = time.monotonic() + random.uniform(0, min(interval, self.start_spread))
+        self._jobs[key] = job
+        self._push(job)
+        return job
+
+    def remove(self, key):
+        job = self._jobs.pop(key, None)
+        if job is not None:
+            job.cancelled = True
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def _push(self, job):
+        heapq.heappush(self._heap, (job.next_run, next(self._counter), job))
+        self._wakeup.set()
+
+    def _reschedule(self, job, now):
+        spread = job.interval * job.jitter
+        job.next_run += job.interval + random.uniform(-spread, spread)
+        if job.next_run <= now:
+            # Fell behind (e.g. the loop was blocked), do not try to catch up
+            job.next_run = now + job.interval
+        self._push(job)
+
+    async def run(self, stop_event):
+        """Run due jobs until stop_event is set, then cancel running ones"""
+        try:
+            while not stop_event.is_set():
+                now = time.monotonic()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, job = heapq.heappop(self._heap)
+                    if job.cancelled:
+                        continue
+                    if job.in_flight:
+                        job.skipped += 1
+                    else:
+                        job.runs += 1
+                        job.task = asyncio.ensure_future(job.callback())
+                    self._reschedule(job, now)
+
+                timeout = self._heap[0][0] - now if self._heap else None
+                self._wakeup.clear()
+                waiters = [asyncio.ensure_future(stop_event.wait()),
+                           asyncio.ensure_future(self._wakeup.wait())]
+                try:
+                    await asyncio.wait(waiters, timeout=timeout,
+                                       return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    for waiter in waiters:
+                        waiter.cancel()
+        finally:
+            running = [job.task for job in self._jobs.values() if job.in_flight]
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
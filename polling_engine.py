@@ -0,0 +1,178 @@
+import asyncio
+import time
+
+from alarm_engine import DEFAULT_RULES, AlarmEngine
+from connection_pool import ConnectionPool
+from event_pipeline import EventPipeline
+from metrics import REGISTRY
+from modbus_client import MODBUS_PORT, SensorState
+from poll_scheduler import PollScheduler
+from profiling import span
+from read_planner import ReadPlanner
+from sensor_store import SensorStateStore
+
+POLL_SECONDS = REGISTRY.histogram(
+    "poll_cycle_seconds", "Time to read one group of sensors", ("receiver", "attribute"))
+SENSORS_STALE = REGISTRY.gauge(
+    "sensors_stale", "Sensors not read successfully for three state poll intervals")
+SENSORS_FAILING = REGISTRY.gauge("sensors_failing", "Sensors whose last read failed")
+
+
+class PollingEngine:
+    """Polls the receivers on an asyncio loop; has no Qt dependency.
+
+    Every receiver is polled concurrently through a ConnectionPool, so a
+    dead receiver only affects its own sensors. Readings go through an
+    EventPipeline, so subscribers only see actual changes. Connection
+    changes and failures are reported through the on_receiver_status(host,
+    connected, message) and on_poll_failed(message) callbacks. The current
+    state of every sensor, with last-seen times and error counts, is kept
+    in a SensorStateStore, and every state change is run through the
+    AlarmEngine (alarms) on the polling thread, ahead of logging and display.
+
+    Used by PollingWorker inside the GUI and by the headless daemon.
+    """
+
+    def __init__(self, host, sensors, port=MODBUS_PORT, interval=5.0, timeout=2.0,
+                 max_connections=16, jitter=0.1, state_debounce=0.0,
+                 on_receiver_status=None, on_poll_failed=None, alarm_rules=DEFAULT_RULES,
+                 zones=None, alarm_level=0):
+        self.host = host
+        self.port = port
+        self.max_connections = max_connections
+        self.interval = interval
+        self.timeout = timeout
+        self.jitter = jitter
+        self.jobs = self._plan_jobs(sensors)
+        self.store = SensorStateStore(sensor.sensor_id for sensor in sensors)
+        self.pipeline = EventPipeline(state_debounce)
+        self.pipeline.subscribe(self.store.apply_events)  # Before anyone who queries it
+        self.alarms = AlarmEngine(alarm_rules, zones, alarm_level)
+        self.store.set_alarm_level(alarm_level)
+        self.pipeline.subscribe(self.alarms.evaluate)
+        stale_after = 3 * max([self.interval] + [sensor.state_interval or 0 for sensor in sensors])
+        SENSORS_STALE.set_function(lambda: len(self.store.stale(stale_after)))
+        SENSORS_FAILING.set_function(lambda: len(self.store.failing()))
+        self.on_receiver_status = on_receiver_status or (lambda host, connected, message: None)
+        self.on_poll_failed = on_poll_failed or (lambda message: None)
+
+    def set_alarm_level(self, level):
+        """Arm the alarm rules for level; safe from any thread"""
+        self.alarms.set_level(level)
+        self.store.set_alarm_level(level)
+
+    def _plan_jobs(self, sensors):
+        """Group sensors into (receiver, attribute, interval) poll jobs.
+
+        Sensors sharing a receiver and a cadence are read together by one
+        ReadPlanner, so batching still applies within each job.
+        """
+        groups = {}
+        for sensor in sensors:
+            host = sensor.host or self.host
+            state_interval = sensor.state_interval or self.interval
+            groups.setdefault((host, "state", state_interval), []).append(sensor)
+            if sensor.battery_register is not None and sensor.battery_interval:
+                groups.setdefault((host, "battery", sensor.battery_interval), []).append(sensor)
+        return {key: ReadPlanner(group) for key, group in groups.items()}
+
+    async def run(self, stop_event):
+        """Poll until stop_event is set, then close every connection"""
+        self._pool = ConnectionPool(self.max_connections, timeout=self.timeout)
+        self._configured = {}  # host -> client the sensor configuration was sent on
+        self._configuring = {}  # host -> task, shared by the jobs of one receiver
+        self._status = {}  # host -> last reported connection state
+
+        scheduler = PollScheduler(self.jitter)
+        for key, planner in self.jobs.items():
+            host, attribute, interval = key
+            scheduler.add(key, interval, self._make_job(host, attribute, planner))
+        scheduler.add("alarms", 1.0, self._check_alarms, jitter=0.0)
+        try:
+            await scheduler.run(stop_event)
+        finally:
+            await self._pool.close()
+
+    def _make_job(self, host, attribute, planner):
+        async def job():
+            client = await self._receiver_client(host)
+            if client is None:
+                self._mark_unknown(planner, attribute)
+            else:
+                await self._poll_sensors(host, client, planner, attribute)
+        return job
+
+    async def _check_alarms(self):
+        """Fire open-duration alarms that came due"""
+        self.alarms.check()
+
+    def _mark_unknown(self, planner, attribute):
+        """Count a failed read and report the sensors as UNKNOWN"""
+        self.store.record_errors(sensor.sensor_id for sensor in planner.sensors)
+        if attribute == "state":
+            self.pipeline.publish("state", {
+                sensor.sensor_id: SensorState.UNKNOWN for sensor in planner.sensors
+            })
+
+    async def _receiver_client(self, host):
+        """Return a configured client for the receiver, or None if it is down"""
+        try:
+            client = await self._pool.get(host, self.port)
+        except ConnectionError as e:
+            if self._status.get(host) is not False:
+                self._status[host] = False
+                self.on_receiver_status(host, False, str(e))
+            return None
+
+        if self._status.get(host) is not True:
+            self._status[host] = True
+            self.on_receiver_status(host, True, "")
+        if self._configured.get(host) is not client:
+            task = self._configuring.get(host)
+            if task is None:
+                task = asyncio.ensure_future(self._configure_sensor(client))
+                self._configuring[host] = task
+            await asyncio.shield(task)
+            self._configuring.pop(host, None)
+            self._configured[host] = client
+        return client
+
+    async def _configure_sensor(self, client):
+        """Configure sensor transmission parameters"""
+        try:
+            # Set to send on state change + periodic every 5 minutes (as per specs)
+            # (This would require knowing the specific configuration registers)
+            await client.write_single_coil(
+                address=0x100,  # Example configuration address
+                value=0x01       # State change + periodic mode
+            )
+        except Exception as e:
+            print(f"Configuration error: {str(e)}")
+
+    async def _poll_sensors(self, host, client, planner, attribute):
+        """Poll one attribute of a group of sensors with as few requests as possible"""
+        start = time.perf_counter()
+        failed = set()
+        try:
+            with span("poll"):
+                results = await planner.read(client, (attribute,), failed)
+        except asyncio.TimeoutError:
+            self._pool.report_timeout(host, self.port)
+            self.on_poll_failed(f"{host}: request timed out")
+            self._mark_unknown(planner, attribute)
+            return
+        except Exception as e:
+            self.on_poll_failed(f"{host}: {str(e) or type(e).__name__}")
+            self._mark_unknown(planner, attribute)
+            return
+
+        POLL_SECONDS.labels(host, attribute).observe(time.perf_counter() - start)
+        self._pool.report_success(host, self.port)
+        # Sensors of failed ranges are in results too, as UNKNOWN
+        self.store.mark_seen(sensor_id for sensor_id in results if sensor_id not in failed)
+        if failed:
+            self.store.record_errors(failed)
+        values = {sensor_id: readings[attribute]
+                  for sensor_id, readings in results.items() if attribute in readings}
+        if values:
+            self.pipeline.publish(attribute, values)
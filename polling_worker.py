@@ -0,0 +1,128 @@
+import asyncio
+
+from PySide6.QtCore import QThread, Signal
+
+from alarm_engine import DEFAULT_RULES
+from event_channel import EventPublisher
+from modbus_client import MODBUS_PORT
+from polling_engine import PollingEngine
+
+
+class PollingWorker(QThread):
+    """Background thread that runs a PollingEngine for the GUI.
+
+    The thread runs its own asyncio loop so socket waits never block the GUI.
+    Results are delivered through signals; because the worker lives in a
+    different thread, Qt queues them onto the receiver's (GUI) thread.
+    The engine's EventPipeline only passes on actual changes, so only those
+    cross over to the GUI thread. With publish_path set, the worker also
+    shares its results over the event channel, so other dashboards attach
+    to it instead of polling the receivers again.
+
+    Alarms are decided on the polling thread and arrive through the alarms
+    signal. alarm_level reports level changes made from another dashboard.
+
+    Only the poller logs events and runs retention: the event_logger is
+    subscribed and the retention job started once the channel is published.
+    If it cannot be (another dashboard got there first), nothing is polled
+    and publish_failed is emitted instead, so the dashboard can attach.
+    """
+    receiver_status = Signal(str, bool, str)  # host, connected, message
+    sensor_events = Signal(object)  # [SensorEvent]
+    poll_failed = Signal(str)
+    alarms = Signal(object)  # [Alarm]
+    alarm_level = Signal(int)
+    publish_failed = Signal(str)
+
+    def __init__(self, host, sensors, port=MODBUS_PORT, interval=5.0, timeout=2.0,
+                 max_connections=16, jitter=0.1, state_debounce=0.0, publish_path=None,
+                 alarm_rules=DEFAULT_RULES, zones=None, alarm_level=0, event_logger=None,
+                 retention=None, parent=None):
+        super().__init__(parent)
+        self.engine = PollingEngine(
+            host, sensors, port, interval, timeout, max_connections, jitter, state_debounce,
+            on_receiver_status=self._on_receiver_status, on_poll_failed=self._on_poll_failed,
+            alarm_rules=alarm_rules, zones=zones, alarm_level=alarm_level
+        )
+        self.pipeline = self.engine.pipeline
+        self.store = self.engine.store  # Last-seen times and error counts per sensor
+        self.pipeline.subscribe(self.sensor_events.emit)
+        self.engine.alarms.subscribe(self._on_alarms)
+        self.publish_path = publish_path
+        self.publisher = None
+        self.event_logger = event_logger
+        self.retention = retention
+        self._loop = None
+        self._stop_event = None
+        self._stop_requested = False
+
+    def run(self):
+        asyncio.run(self._main())
+
+    def stop(self):
+        """Ask the polling loop to finish and wait for the thread to exit"""
+        self._stop_requested = True
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self._stop_event.set)
+            except RuntimeError:
+                pass  # Loop already shut down
+        self.wait()
+
+    def set_alarm_level(self, level):
+        """Change the level arming the alarm rules; call from the GUI thread"""
+        self.engine.set_alarm_level(level)
+        loop = self._loop
+        if self.publisher is not None and not loop.is_closed():
+            try:
+                loop.call_soon_threadsafe(self.publisher.publish_alarm_level, level)
+            except RuntimeError:
+                pass  # Loop already shut down
+
+    async def _main(self):
+        self._stop_event = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._stop_requested:
+            return
+        if self.publish_path:
+            publisher = EventPublisher(self.publish_path, on_alarm_level=self._on_remote_alarm_level)
+            try:
+                await publisher.start()
+            except (OSError, RuntimeError) as e:
+                self.publish_failed.emit(str(e))
+                return
+            self.publisher = publisher
+            self.pipeline.subscribe(publisher.publish_events)
+            publisher.publish_alarm_level(self.engine.alarms.level)
+        if self.event_logger is not None:
+            # Logged straight from the polling thread, never via the GUI thread
+            self.pipeline.subscribe(self.event_logger.log_events)
+            self.engine.alarms.subscribe(self.event_logger.log_alarms)
+        if self.retention is not None:
+            self.retention.start()
+        try:
+            await self.engine.run(self._stop_event)
+        finally:
+            if self.publisher is not None:
+                await self.publisher.close()
+
+    def _on_receiver_status(self, host, connected, message):
+        self.receiver_status.emit(host, connected, message)
+        if self.publisher is not None:
+            self.publisher.publish_receiver_status(host, connected, message)
+
+    def _on_poll_failed(self, message):
+        self.poll_failed.emit(message)
+        if self.publisher is not None:
+            self.publisher.publish_poll_failed(message)
+
+    def _on_alarms(self, alarms):
+        self.alarms.emit(alarms)
+        if self.publisher is not None:
+            self.publisher.publish_alarms(alarms)
+
+    def _on_remote_alarm_level(self, level):
+        """An attached dashboard moved its slider"""
+        self.engine.set_alarm_level(level)
+        self.alarm_level.emit(level)
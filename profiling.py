@@ -0,0 +1,144 @@
+"""Opt-in profiling: timing spans on the hot paths and a sampling profiler.
+
+The poll, decode, UI-update and database paths are wrapped in
+`with span("name"):`. Until enable() is called span() hands back a shared
+no-op context manager, so the cost when profiling is off is one function
+call. When enabled, span durations go into the profile_span_seconds
+histogram (visible in the diagnostics panel and on /metrics) and are
+summarised on shutdown.
+
+With sampling on, a background thread records the Python stack of every
+thread at a fixed interval and shutdown() writes them in the collapsed
+"frame;frame;frame count" format read by flamegraph.pl and speedscope.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+from metrics import REGISTRY
+
+SPAN_SECONDS = REGISTRY.histogram("profile_span_seconds", "Duration of profiled code paths", ("span",))
+DEFAULT_OUTPUT = "profile.folded"
+
+_enabled = False
+_sampler = None
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    """Context manager timing a block under name, if profiling is on"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(SPAN_SECONDS.labels(name))
+
+
+def enabled():
+    return _enabled
+
+
+class SamplingProfiler:
+    """Samples the stacks of all threads every interval seconds"""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="SamplingProfiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        own = threading.get_ident()
+        labels = {}  # code object -> frame label
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    label = labels.get(code)
+                    if label is None:
+                        label = labels[code] = (
+                            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+                        )
+                    stack.append(label)
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def enable(sampling=False, interval=0.005):
+    """Turn spans on, and optionally the sampling profiler"""
+    global _enabled, _sampler
+    _enabled = True
+    if sampling and _sampler is None:
+        _sampler = SamplingProfiler(interval)
+        _sampler.start()
+
+
+def summary():
+    """Text table of every span: count, total, mean and p99"""
+    lines = [f"{'span':24s} {'count':>9s} {'total s':>10s} {'mean ms':>10s} {'p99 ms':>10s}"]
+    for (name,), child in SPAN_SECONDS.series():
+        if child.count:
+            lines.append(f"{name:24s} {child.count:9d} {child.sum:10.3f} "
+                         f"{child.sum / child.count * 1000:10.3f} {child.quantile(0.99) * 1000:10.3f}")
+    return "\n".join(lines)
+
+
+def shutdown(output=DEFAULT_OUTPUT):
+    """Stop profiling, print the span summary and write the samples"""
+    global _enabled, _sampler
+    if not _enabled:
+        return
+    _enabled = False
+    print(summary())
+    if _sampler is not None:
+        _sampler.stop()
+        try:
+            _sampler.write(output)
+            print(f"Profile samples written to {output}")
+        except OSError as e:
+            print(f"Profile write error: {str(e)}")
+        _sampler = None
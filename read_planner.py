@@ -0,0 +1,147 @@
+import asyncio
+
+from modbus_client import (
+    BIT_FUNCTIONS, MAX_READ_BITS, MAX_READ_REGISTERS, MODBUS_UNIT_ID,
+    ModbusFunction, SensorState
+)
+
+# Enless receiver layout: sensor n at discrete input n - 1, its battery
+# level in input register BATTERY_REGISTER_BASE + n - 1
+BATTERY_REGISTER_BASE = 0x200
+
+
+class SensorConfig:
+    """Where an Enless sensor's values live on its receiver"""
+
+    def __init__(self, sensor_id, state_address=0, battery_register=None,
+                 unit_id=MODBUS_UNIT_ID, host=None,
+                 state_function=ModbusFunction.READ_DISCRETE_INPUTS,
+                 battery_function=ModbusFunction.READ_INPUT_REGISTERS,
+                 state_interval=None, battery_interval=300.0):
+        self.sensor_id = sensor_id
+        self.state_address = state_address
+        self.battery_register = battery_register
+        self.unit_id = unit_id
+        self.host = host  # Receiver address, None for the default receiver
+        self.state_function = state_function
+        self.battery_function = battery_function
+        # Poll intervals in seconds; None uses the poller's default
+        self.state_interval = state_interval
+        self.battery_interval = battery_interval
+
+    def points(self, attributes):
+        """Yield (attribute, function, address) for the requested attributes"""
+        if "state" in attributes and self.state_address is not None:
+            yield "state", self.state_function, self.state_address
+        if "battery" in attributes and self.battery_register is not None:
+            yield "battery", self.battery_function, self.battery_register
+
+
+def sequential_sensors(count, host=None, **kwargs):
+    """SensorConfig for sensors 1..count in the receiver's default layout"""
+    return [
+        SensorConfig(i + 1, state_address=i, battery_register=BATTERY_REGISTER_BASE + i,
+                     host=host, **kwargs)
+        for i in range(count)
+    ]
+
+
+class ReadRange:
+    """One MODBUS read request covering the points of several sensors"""
+
+    def __init__(self, unit_id, function, address, count, points):
+        self.unit_id = unit_id
+        self.function = function
+        self.address = address
+        self.count = count
+        self.points = points  # list of (offset, sensor_id, attribute)
+
+    def __repr__(self):
+        return (f"ReadRange(unit={self.unit_id}, function={self.function.name}, "
+                f"address={self.address:#x}, count={self.count}, points={len(self.points)})")
+
+
+class ReadPlanner:
+    """Merge the addresses of many sensors into as few reads as possible.
+
+    Addresses are grouped per unit id and function code, sorted, and merged
+    into contiguous ranges. A gap of up to max_gap unused addresses is read
+    through, since a few extra bits or registers cost far less than another
+    round trip. Ranges never exceed the MODBUS per-request quantity limits.
+    """
+
+    def __init__(self, sensors, max_gap=16):
+        self.sensors = list(sensors)
+        self.max_gap = max_gap
+        self._plans = {}
+
+    def plan(self, attributes=("state", "battery")):
+        """Return the list of ReadRange needed to read the given attributes"""
+        key = tuple(sorted(attributes))
+        if key not in self._plans:
+            self._plans[key] = self._build_plan(key)
+        return self._plans[key]
+
+    def _build_plan(self, attributes):
+        groups = {}
+        for sensor in self.sensors:
+            for attribute, function, address in sensor.points(attributes):
+                groups.setdefault((sensor.unit_id, function), []).append(
+                    (address, sensor.sensor_id, attribute)
+                )
+
+        ranges = []
+        for (unit_id, function), points in sorted(groups.items()):
+            limit = MAX_READ_BITS if function in BIT_FUNCTIONS else MAX_READ_REGISTERS
+            points.sort(key=lambda point: point[0])
+            current = None
+            for address, sensor_id, attribute in points:
+                if current is not None:
+                    end = current.address + current.count
+                    if address - end <= self.max_gap and address - current.address < limit:
+                        current.count = max(current.count, address - current.address + 1)
+                        current.points.append((address - current.address, sensor_id, attribute))
+                        continue
+                current = ReadRange(unit_id, function, address, 1, [(0, sensor_id, attribute)])
+                ranges.append(current)
+        return ranges
+
+    @staticmethod
+    def fan_out(read_range, values, results):
+        """Distribute the decoded values of one range to per-sensor results"""
+        for offset, sensor_id, attribute in read_range.points:
+            value = values[offset]
+            if attribute == "state":
+                value = SensorState.CLOSED if value else SensorState.OPEN
+            elif attribute == "battery":
+                value = max(0, min(100, value))
+            results.setdefault(sensor_id, {})[attribute] = value
+
+    async def read(self, client, attributes=("state", "battery"), failed=None):
+        """Execute the plan on a ModbusClient and return per-sensor values.
+
+        All ranges are sent at once and pipelined on the connection. Sensors
+        whose range failed are reported with SensorState.UNKNOWN, and their
+        IDs are added to the `failed` set if one is given.
+        """
+        ranges = self.plan(attributes)
+        replies = await asyncio.gather(
+            *(client.read(r.function, r.address, r.count, unit_id=r.unit_id) for r in ranges),
+            return_exceptions=True
+        )
+
+        results = {}
+        errors = []
+        for read_range, values in zip(ranges, replies):
+            if isinstance(values, Exception):
+                errors.append(values)
+                for _, sensor_id, attribute in read_range.points:
+                    if failed is not None:
+                        failed.add(sensor_id)
+                    if attribute == "state":
+                        results.setdefault(sensor_id, {})["state"] = SensorState.UNKNOWN
+                continue
+            self.fan_out(read_range, values, results)
+        if errors and len(errors) == len(ranges):
+            raise errors[0]
+        return results
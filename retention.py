@@ -0,0 +1,141 @@
+"""Rollups and retention for the event log.
+
+A background job folds new raw events into per-sensor minute, hour and
+day buckets (event_rollups), then deletes raw events and fine-grained
+buckets older than the RetentionPolicy allows. All work is done in
+chunks, each in its own short transaction, so the event logger is never
+kept waiting behind a long delete. Raw events are only deleted once they
+are rolled up, and history over long ranges reads the coarsest
+resolution that still shows enough detail (choose_resolution).
+
+Only the process that polls runs the job (the daemon, or the dashboard
+polling for the others), with the policy saved in the database, so every
+process prunes by the same rules.
+"""
+import json
+import threading
+import time
+
+from database import DAY, HOUR, MINUTE
+from metrics import REGISTRY
+from profiling import span
+
+EVENTS_ROLLED_UP = REGISTRY.counter("events_rolled_up_total", "Raw events added to the rollups")
+ROWS_PRUNED = REGISTRY.counter("retention_pruned_total", "Rows deleted by the retention job", ("table",))
+RETENTION_SECONDS = REGISTRY.histogram("retention_run_seconds", "Time for one pass of the retention job")
+
+
+class RetentionPolicy:
+    """How long each level of detail is kept, in days; None keeps it forever"""
+
+    def __init__(self, raw_days=90, minute_days=7, hour_days=180, day_days=None):
+        self.raw_days = raw_days
+        self.rollup_days = {MINUTE: minute_days, HOUR: hour_days, DAY: day_days}
+
+    @classmethod
+    def load(cls, db):
+        """The policy saved in the database, or the defaults"""
+        saved = db.get_retention_state("policy")
+        return cls() if saved is None else cls(**json.loads(saved))
+
+    def save(self, db):
+        db.set_retention_state("policy", json.dumps({
+            "raw_days": self.raw_days, "minute_days": self.rollup_days[MINUTE],
+            "hour_days": self.rollup_days[HOUR], "day_days": self.rollup_days[DAY],
+        }))
+
+    def raw_cutoff(self, now):
+        """Raw events before this time may be deleted (None: keep all)"""
+        return None if self.raw_days is None else now - self.raw_days * DAY
+
+    def rollup_cutoff(self, resolution, now):
+        days = self.rollup_days[resolution]
+        return None if days is None else now - days * DAY
+
+
+def choose_resolution(since, until=None, min_buckets=24, policy=None, now=None):
+    """Coarsest rollup resolution giving at least min_buckets over the range.
+
+    With a policy, resolutions already pruned at `since` are skipped.
+    since None means all history, which is always shown per day.
+    """
+    if since is None:
+        return DAY
+    now = time.time() if now is None else now
+    span_seconds = (now if until is None else until) - since
+    resolution = next((r for r in (DAY, HOUR) if span_seconds >= r * min_buckets), MINUTE)
+    if policy is not None:
+        while resolution != DAY:
+            cutoff = policy.rollup_cutoff(resolution, now)
+            if cutoff is None or since >= cutoff:
+                break
+            resolution = HOUR if resolution == MINUTE else DAY
+    return resolution
+
+
+class RetentionJob:
+    """Keeps the rollups up to date and prunes old data in the background.
+
+    Every interval seconds the job rolls up the events written since the
+    last pass and then applies the policy, chunk_size rows per transaction.
+    run_once() does one pass from the calling thread.
+    """
+
+    def __init__(self, db, policy=None, interval=60.0, chunk_size=5000):
+        self.db = db
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="RetentionJob", daemon=True)
+            self._thread.start()
+
+    def run_once(self, now=None):
+        """Roll up and prune until caught up; returns (rolled up, pruned)"""
+        now = time.time() if now is None else now
+        with RETENTION_SECONDS.time(), span("db.retention"):
+            rolled_up = self._repeat(lambda: self.db.roll_up_events(self.chunk_size))
+            EVENTS_ROLLED_UP.inc(rolled_up)
+            pruned = 0
+            cutoff = self.policy.raw_cutoff(now)
+            if cutoff is not None:
+                count = self._repeat(lambda: self.db.prune_events(cutoff, self.chunk_size))
+                ROWS_PRUNED.labels("events").inc(count)
+                pruned += count
+            for resolution in self.policy.rollup_days:
+                cutoff = self.policy.rollup_cutoff(resolution, now)
+                if cutoff is not None:
+                    count = self._repeat(
+                        lambda: self.db.prune_rollups(resolution, cutoff, self.chunk_size))
+                    ROWS_PRUNED.labels("event_rollups").inc(count)
+                    pruned += count
+        return rolled_up, pruned
+
+    def _repeat(self, step):
+        """Run one chunked step until a chunk comes back short"""
+        total = 0
+        while not self._stop.is_set():
+            count = step()
+            total += count
+            if count < self.chunk_size:
+                break
+        return total
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Retention error: {str(e)}")
+            self._stop.wait(self.interval)
+
+    def close(self):
+        """Stop after the chunk in progress and wait for the thread"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
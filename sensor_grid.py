@@ -0,0 +1,251 @@
+import time
+
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, QTimer
+from PySide6.QtGui import QColor, QFont, QPen
+from PySide6.QtWidgets import QListView, QStyle, QStyledItemDelegate
+
+from history_model import ALARM_LEVELS
+from modbus_client import SensorState
+from profiling import span
+from theme import GREEN, GREY, LEVEL_COLORS as LEVEL_STYLE_COLORS, ORANGE, RED
+
+# Roles for the tile values, next to DisplayRole (the tile title)
+SENSOR_ID_ROLE = Qt.ItemDataRole.UserRole + 1
+STATE_ROLE = Qt.ItemDataRole.UserRole + 2
+ALARM_LEVEL_ROLE = Qt.ItemDataRole.UserRole + 3
+BATTERY_ROLE = Qt.ItemDataRole.UserRole + 4
+
+# Row layout: [sensor_id, state, alarm level, battery]
+_ID, _STATE, _LEVEL, _BATTERY = range(4)
+_FIELDS = {"state": _STATE, "battery": _BATTERY, "alarm": _LEVEL}
+
+STATE_COLORS = {
+    SensorState.OPEN: QColor(RED),
+    SensorState.CLOSED: QColor(GREEN),
+    SensorState.UNKNOWN: QColor(GREY),
+    SensorState.LOW_BATTERY: QColor(ORANGE),
+}
+LEVEL_COLORS = tuple(QColor(LEVEL_STYLE_COLORS[level][1]) for level in sorted(LEVEL_STYLE_COLORS))
+
+
+class SensorGridModel(QAbstractListModel):
+    """State, alarm level and battery of every sensor, one row per sensor.
+
+    Changes are not applied as they arrive. apply_events() only records
+    the latest value per sensor; the pending changes are applied together
+    at most max_refresh_rate times per second, with a single dataChanged
+    over the rows that moved, so the view repaints once per frame even
+    when every sensor flips at the same time. Sensors that report without
+    being listed yet (e.g. from the daemon) are added as rows.
+    """
+
+    def __init__(self, sensor_ids=(), max_refresh_rate=10, parent=None):
+        super().__init__(parent)
+        self.max_refresh_rate = max_refresh_rate
+        self._rows = []
+        self._index = {}  # sensor_id -> row
+        self._pending = {}  # sensor_id -> {field: value}
+        self._alarm_level = None  # shown on rows added later
+        self._last_flush = 0.0
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+        self.set_sensors(sensor_ids)
+
+    def set_sensors(self, sensor_ids):
+        self.beginResetModel()
+        self._rows = [[sensor_id, SensorState.UNKNOWN, self._alarm_level, None]
+                      for sensor_id in sensor_ids]
+        self._index = {row[_ID]: i for i, row in enumerate(self._rows)}
+        self._pending = {}
+        self.endResetModel()
+
+    def add_sensors(self, sensor_ids):
+        """Append rows for the sensors not shown yet, in one insert"""
+        new_ids = list(dict.fromkeys(i for i in sensor_ids if i not in self._index))
+        if not new_ids:
+            return
+        first = len(self._rows)
+        self.beginInsertRows(QModelIndex(), first, first + len(new_ids) - 1)
+        for offset, sensor_id in enumerate(new_ids):
+            self._rows.append([sensor_id, SensorState.UNKNOWN, self._alarm_level, None])
+            self._index[sensor_id] = first + offset
+        self.endInsertRows()
+
+    def sensor_id(self, row):
+        return self._rows[row][_ID]
+
+    def tile(self, row):
+        """(sensor_id, state, alarm level, battery) for painting a row"""
+        return self._rows[row]
+
+    def sensor(self, sensor_id):
+        """(state, alarm level, battery) as currently displayed"""
+        row = self._rows[self._index[sensor_id]]
+        return row[_STATE], row[_LEVEL], row[_BATTERY]
+
+    def apply_events(self, events):
+        """Queue SensorEvents from the EventPipeline for the next refresh"""
+        index = self._index
+        unknown = [event.sensor_id for event in events if event.sensor_id not in index]
+        if unknown:
+            self.add_sensors(unknown)
+        for event in events:
+            self._queue(event.sensor_id, _FIELDS[event.kind], event.value)
+        self._schedule()
+
+    def set_alarm_level(self, level, sensor_ids=None):
+        """Set the alarm level shown on the given sensors (default: all)"""
+        if sensor_ids is None:
+            self._alarm_level = level
+        for sensor_id in self._index if sensor_ids is None else sensor_ids:
+            self._queue(sensor_id, _LEVEL, level)
+        self._schedule()
+
+    def mark_unknown(self):
+        """Show every sensor as UNKNOWN, e.g. after a disconnect"""
+        for sensor_id in self._index:
+            self._queue(sensor_id, _STATE, SensorState.UNKNOWN)
+        self._schedule()
+
+    def _queue(self, sensor_id, field, value):
+        if sensor_id in self._index:
+            self._pending.setdefault(sensor_id, {})[field] = value
+
+    def _schedule(self):
+        if not self._pending or self._timer.isActive():
+            return
+        frame = 1.0 / self.max_refresh_rate
+        delay = max(0.0, self._last_flush + frame - time.monotonic())
+        self._timer.start(int(delay * 1000))
+
+    def flush(self):
+        """Apply all pending changes with one dataChanged"""
+        self._timer.stop()
+        self._last_flush = time.monotonic()
+        pending, self._pending = self._pending, {}
+        first = last = None
+        with span("ui.grid"):
+            for sensor_id, changes in pending.items():
+                i = self._index[sensor_id]
+                row = self._rows[i]
+                changed = False
+                for field, value in changes.items():
+                    if row[field] != value:
+                        row[field] = value
+                        changed = True
+                if changed:
+                    first = i if first is None else min(first, i)
+                    last = i if last is None else max(last, i)
+            if first is not None:
+                self.dataChanged.emit(self.index(first), self.index(last))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            return f"Sensor {row[_ID]}"
+        if role == SENSOR_ID_ROLE:
+            return row[_ID]
+        if role == STATE_ROLE:
+            return row[_STATE]
+        if role == ALARM_LEVEL_ROLE:
+            return row[_LEVEL]
+        if role == BATTERY_ROLE:
+            return row[_BATTERY]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            battery = "unknown" if row[_BATTERY] is None else f"{row[_BATTERY]}%"
+            return f"Sensor {row[_ID]}: {state_name(row[_STATE])}, battery {battery}"
+        return None
+
+
+def state_name(state):
+    try:
+        return SensorState(state).name
+    except ValueError:
+        return "UNKNOWN"
+
+
+class SensorTileDelegate(QStyledItemDelegate):
+    """Paints a sensor tile directly, without a widget per sensor"""
+    TILE_SIZE = QSize(110, 64)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.title_font = QFont("Arial", 9, QFont.Weight.Bold)
+        self.text_font = QFont("Arial", 8)
+        self.background = QColor("#ffffff")
+        self.border = QPen(QColor("#bdc3c7"))
+        self.selected_border = QPen(QColor("#1e3c72"), 2)
+        self.text_color = QColor("#2c3e50")
+        self.battery_colors = (QColor(RED), QColor(ORANGE), QColor(GREEN))
+
+    def sizeHint(self, option, index):
+        return self.TILE_SIZE
+
+    def paint(self, painter, option, index):
+        # Straight from the model rather than one QVariant per value
+        sensor_id, state, level, battery = index.model().tile(index.row())
+        rect = option.rect.adjusted(3, 3, -3, -3)
+
+        painter.save()
+        painter.setRenderHint(painter.RenderHint.Antialiasing)
+        selected = option.state & QStyle.StateFlag.State_Selected
+        painter.setPen(self.selected_border if selected else self.border)
+        painter.setBrush(self.background)
+        painter.drawRoundedRect(rect, 6, 6)
+
+        # State stripe on the left
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(STATE_COLORS.get(state, STATE_COLORS[SensorState.UNKNOWN]))
+        painter.drawRoundedRect(QRect(rect.left(), rect.top(), 6, rect.height()), 3, 3)
+
+        text_rect = rect.adjusted(12, 4, -6, -4)
+        painter.setPen(self.text_color)
+        painter.setFont(self.title_font)
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignTop,
+                         f"Sensor {sensor_id}")
+        painter.setFont(self.text_font)
+        painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         state_name(state))
+        if level is not None:
+            painter.setPen(LEVEL_COLORS[level])
+            painter.drawText(text_rect, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignBottom,
+                             ALARM_LEVELS[level])
+
+        # Battery gauge in the bottom right corner
+        gauge = QRect(text_rect.right() - 24, text_rect.bottom() - 10, 24, 10)
+        painter.setPen(self.border)
+        painter.setBrush(Qt.BrushStyle.NoBrush)
+        painter.drawRect(gauge)
+        if battery is not None:
+            if battery < 20:
+                color = self.battery_colors[0]
+            elif battery < 40:
+                color = self.battery_colors[1]
+            else:
+                color = self.battery_colors[2]
+            fill = gauge.adjusted(1, 1, 0, 0)
+            fill.setWidth(max(1, (gauge.width() - 1) * battery // 100))
+            painter.fillRect(fill, color)
+        painter.restore()
+
+
+class SensorGridView(QListView):
+    """Grid of sensor tiles over a SensorGridModel"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setMovement(QListView.Movement.Static)
+        # Every tile has the same size, so the layout never measures them
+        self.setUniformItemSizes(True)
+        self.setGridSize(SensorTileDelegate.TILE_SIZE)
+        self.setSpacing(0)
+        self.setSelectionMode(QListView.SelectionMode.SingleSelection)
+        self.setItemDelegate(SensorTileDelegate(self))
@@ -0,0 +1,171 @@
+"""Compact in-memory state of every sensor.
+
+Each attribute is a NumPy array indexed directly by sensor ID, so a
+sensor's values are a handful of bytes instead of a dict, single updates
+are O(1) and questions about the whole fleet ("battery below 20%", "not
+seen for 10 minutes") are one vectorized comparison:
+
+    store.low_battery(20)
+    store.stale(600)
+"""
+import threading
+import time
+
+import numpy as np
+
+from modbus_client import SensorState
+
+NO_VALUE = -1  # Battery or alarm level not known yet
+
+# name -> (dtype, initial value)
+FIELDS = {
+    "known": (np.bool_, False),  # a sensor with this ID exists
+    "state": (np.uint8, SensorState.UNKNOWN),
+    "alarm_level": (np.int8, NO_VALUE),
+    "battery": (np.int16, NO_VALUE),
+    "last_seen": (np.float64, 0.0),  # time of the last successful read, 0 = never
+    "last_change": (np.float64, 0.0),  # time of the last state transition
+    "errors": (np.uint32, 0),  # failed reads in total
+    "error_streak": (np.uint32, 0),  # failed reads since the last success
+}
+
+
+class SensorStateStore:
+    """State, alarm level, battery, last-seen time and error counts per sensor.
+
+    Sensor IDs are small non-negative integers and index the arrays
+    directly; the arrays grow (doubling) when a larger ID shows up. Safe to
+    update from the polling thread while another thread queries.
+    Queries return NumPy arrays of sensor IDs.
+    """
+
+    def __init__(self, sensor_ids=(), capacity=64):
+        self._lock = threading.Lock()
+        for name, (dtype, initial) in FIELDS.items():
+            setattr(self, name, np.full(capacity, initial, dtype))
+        self.add(sensor_ids)
+
+    def __len__(self):
+        return int(np.count_nonzero(self.known))
+
+    def __contains__(self, sensor_id):
+        return 0 <= sensor_id < len(self.known) and bool(self.known[sensor_id])
+
+    @property
+    def sensor_ids(self):
+        return np.flatnonzero(self.known)
+
+    def _ensure(self, sensor_id):
+        """Grow the arrays to hold sensor_id; call with the lock held"""
+        capacity = len(self.known)
+        if sensor_id < capacity:
+            return
+        if sensor_id < 0:
+            raise ValueError(f"Invalid sensor ID {sensor_id}")
+        new_capacity = max(capacity * 2, sensor_id + 1)
+        for name, (dtype, initial) in FIELDS.items():
+            grown = np.full(new_capacity, initial, dtype)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    def add(self, sensor_ids):
+        ids = np.fromiter(sensor_ids, np.int64)
+        if not len(ids):
+            return
+        if ids.min() < 0:
+            raise ValueError(f"Invalid sensor ID {ids.min()}")
+        with self._lock:
+            self._ensure(int(ids.max()))
+            self.known[ids] = True
+
+    def sensor(self, sensor_id):
+        """{field: value} for one sensor; battery and alarm level None if unknown"""
+        with self._lock:
+            if not self.__contains__(sensor_id):
+                raise KeyError(sensor_id)
+            values = {name: getattr(self, name)[sensor_id].item() for name in FIELDS if name != "known"}
+        values["state"] = SensorState(values["state"])
+        for name in ("battery", "alarm_level"):
+            if values[name] == NO_VALUE:
+                values[name] = None
+        return values
+
+    # Updates
+
+    def apply_events(self, events):
+        """Record SensorEvents from the EventPipeline"""
+        with self._lock:
+            for event in events:
+                i = event.sensor_id
+                if i >= len(self.known):
+                    self._ensure(i)
+                self.known[i] = True
+                if event.kind == "state":
+                    self.state[i] = event.value
+                    self.last_change[i] = event.timestamp
+                    if event.value == SensorState.UNKNOWN:
+                        continue  # Not a reading
+                elif event.kind == "battery":
+                    self.battery[i] = event.value
+                if event.timestamp > self.last_seen[i]:
+                    self.last_seen[i] = event.timestamp
+
+    def mark_seen(self, sensor_ids, now=None):
+        """Sensors read successfully at now"""
+        ids = np.fromiter(sensor_ids, np.int64)
+        with self._lock:
+            self.last_seen[ids] = time.time() if now is None else now
+            self.error_streak[ids] = 0
+
+    def record_errors(self, sensor_ids):
+        """One failed read for each of sensor_ids (which must be distinct)"""
+        ids = np.fromiter(sensor_ids, np.int64)
+        with self._lock:
+            self.errors[ids] += 1
+            self.error_streak[ids] += 1
+
+    def set_alarm_level(self, level, sensor_ids=None):
+        """Set the alarm level of the given sensors (default: all)"""
+        with self._lock:
+            if sensor_ids is None:
+                self.alarm_level[self.known] = level
+            else:
+                self.alarm_level[np.fromiter(sensor_ids, np.int64)] = level
+
+    def mark_unknown(self):
+        """Every sensor back to UNKNOWN, e.g. after a disconnect"""
+        with self._lock:
+            self.state[self.known] = SensorState.UNKNOWN
+
+    # Vectorized queries
+
+    def where(self, mask):
+        """IDs of the known sensors selected by a boolean mask over the arrays"""
+        with self._lock:
+            return np.flatnonzero(mask & self.known[:len(mask)])
+
+    def in_state(self, state):
+        return self.where(self.state == state)
+
+    def at_alarm_level(self, level):
+        return self.where(self.alarm_level == level)
+
+    def low_battery(self, threshold=20):
+        """Sensors whose last battery reading is below threshold percent"""
+        battery = self.battery
+        return self.where((battery >= 0) & (battery < threshold))
+
+    def stale(self, max_age, now=None):
+        """Sensors not read successfully for max_age seconds (or ever)"""
+        now = time.time() if now is None else now
+        return self.where(self.last_seen < now - max_age)
+
+    def failing(self, min_streak=1):
+        """Sensors whose last min_streak reads all failed"""
+        return self.where(self.error_streak >= min_streak)
+
+    def state_counts(self):
+        """{SensorState: number of sensors in it}"""
+        with self._lock:
+            counts = np.bincount(self.state[self.known], minlength=len(SensorState))
+        return {state: int(counts[state]) for state in SensorState}
@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, not in a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """MonitoringDB on a fresh database in a temporary directory"""
+    import database
+    pool = database.SQLitePool(str(tmp_path / "monitoring.db"))
+    monkeypatch.setattr(database, "_pool", pool)
+    monkeypatch.setenv("MONITORING_ADMIN_PASSWORD", "test")
+    database.initialize_database()
+    yield database.MonitoringDB(pool)
+    pool.close()
@@ -0,0 +1,114 @@
+import time
+
+from alarm_engine import AlarmEngine, AlarmRule
+from event_pipeline import SensorEvent
+from modbus_client import SensorState
+
+OPEN = SensorState.OPEN
+CLOSED = SensorState.CLOSED
+UNKNOWN = SensorState.UNKNOWN
+T0 = 1_000_000.0
+
+
+def state(sensor_id, value, timestamp):
+    return SensorEvent(sensor_id, "state", value, None, timestamp)
+
+
+def make_engine(*rules, zones=None, level=2):
+    engine = AlarmEngine(rules, zones, level)
+    raised = []
+    engine.subscribe(raised.extend)
+    return engine, raised
+
+
+def test_every_opening_fires_once_per_cooldown():
+    engine, raised = make_engine(AlarmRule("Intrusion", level=2, cooldown=60))
+    engine.evaluate([state(1, CLOSED, T0), state(1, OPEN, T0 + 1)])
+    engine.evaluate([state(1, CLOSED, T0 + 2), state(1, OPEN, T0 + 3)])
+    assert [(a.rule, a.sensor_id, a.timestamp) for a in raised] == [("Intrusion", 1, T0 + 1)]
+    engine.evaluate([state(1, CLOSED, T0 + 70), state(1, OPEN, T0 + 71)])
+    assert len(raised) == 2
+
+
+def test_rule_above_the_alarm_level_is_not_armed():
+    engine, raised = make_engine(AlarmRule("Intrusion", level=2), level=1)
+    engine.evaluate([state(1, OPEN, T0)])
+    assert raised == []
+    engine.set_level(2)
+    engine.evaluate([state(1, CLOSED, T0 + 1), state(1, OPEN, T0 + 2)])
+    assert len(raised) == 1
+
+
+def test_count_in_window():
+    engine, raised = make_engine(AlarmRule("Repeated", count=3, window=60))
+    for i in range(2):
+        engine.evaluate([state(1, OPEN, T0 + i * 10), state(1, CLOSED, T0 + i * 10 + 1)])
+    assert raised == []
+    engine.evaluate([state(1, OPEN, T0 + 20)])
+    assert [a.timestamp for a in raised] == [T0 + 20]
+
+
+def test_count_window_expires():
+    engine, raised = make_engine(AlarmRule("Repeated", count=3, window=60))
+    for i in range(3):
+        engine.evaluate([state(1, OPEN, T0 + i * 40), state(1, CLOSED, T0 + i * 40 + 1)])
+    assert raised == []
+
+
+def test_zone_counts_openings_across_its_sensors():
+    engine, raised = make_engine(AlarmRule("Hall", zones=["Hall"], count=2, window=30),
+                                 zones={"Hall": [1, 2], "Lab": [3]})
+    engine.evaluate([state(1, OPEN, T0), state(3, OPEN, T0 + 1)])
+    assert raised == []
+    engine.evaluate([state(2, OPEN, T0 + 5)])
+    assert [(a.sensor_id, a.zone) for a in raised] == [(2, "Hall")]
+
+
+def test_held_open_fires_at_the_deadline():
+    engine, raised = make_engine(AlarmRule("Held open", open_for=60))
+    engine.evaluate([state(1, OPEN, T0)])
+    engine.check(T0 + 59)
+    assert raised == []
+    engine.check(T0 + 60)
+    assert [(a.rule, a.timestamp) for a in raised] == [("Held open", T0 + 60)]
+
+
+def test_closing_cancels_held_open():
+    engine, raised = make_engine(AlarmRule("Held open", open_for=60))
+    engine.evaluate([state(1, OPEN, T0), state(1, CLOSED, T0 + 30)])
+    engine.check(T0 + 120)
+    assert raised == []
+
+
+def test_lost_reading_while_open_is_not_a_new_opening():
+    engine, raised = make_engine(
+        AlarmRule("Intrusion", cooldown=60),
+        AlarmRule("Repeated", count=3, window=600),
+        AlarmRule("Held open", open_for=300),
+    )
+    engine.evaluate([state(1, OPEN, T0)])
+    assert [a.rule for a in raised] == ["Intrusion"]
+    # The door stays open; the receiver drops out now and then
+    for i in range(1, 5):
+        engine.evaluate([state(1, UNKNOWN, T0 + i * 100), state(1, OPEN, T0 + i * 100 + 5)])
+    engine.check(T0 + 299)
+    assert [a.rule for a in raised] == ["Intrusion"]
+    # Held open still counts from the first opening
+    engine.check(T0 + 300)
+    assert [a.rule for a in raised] == ["Intrusion", "Held open"]
+
+
+def test_reopening_after_a_lost_reading_while_closed_fires():
+    engine, raised = make_engine(AlarmRule("Intrusion"))
+    engine.evaluate([state(1, CLOSED, T0), state(1, UNKNOWN, T0 + 1), state(1, OPEN, T0 + 2)])
+    assert len(raised) == 1
+
+
+def test_time_of_day_arming_wraps_midnight():
+    engine, raised = make_engine(AlarmRule("Night", armed=("22:00", "06:00"), cooldown=0))
+    night = time.mktime((2026, 1, 15, 23, 30, 0, 0, 0, -1))
+    noon = time.mktime((2026, 1, 15, 12, 0, 0, 0, 0, -1))
+    early = time.mktime((2026, 1, 16, 5, 59, 0, 0, 0, -1))
+    for timestamp in (noon, night, early):
+        engine.evaluate([state(1, OPEN, timestamp), state(1, CLOSED, timestamp + 1)])
+    assert [a.timestamp for a in raised] == [night, early]
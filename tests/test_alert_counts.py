@@ -0,0 +1,34 @@
+import time
+
+DAY = 86400
+
+
+def day_of(timestamp):
+    return time.strftime("%Y-%m-%d", time.localtime(timestamp))
+
+
+def test_alerts_are_counted_per_sensor_and_day(db):
+    now = time.time()
+    db.log_events([
+        (now, 1, "state", 0, None),  # OPEN is an alert
+        (now, 1, "state", 1, None),
+        (now, 2, "alarm", 2, "Intrusion"),
+        (now - 3 * DAY, 1, "state", 0, None),
+        (now - 3 * DAY, 1, "battery", 80, None),
+    ])
+    summary = {row["sensor_id"]: row["alert_count"] for row in db.get_alert_summary()}
+    assert summary == {1: 2, 2: 1}
+    assert db.get_daily_alerts(days=7) == [
+        {"day": day_of(now - 3 * DAY), "alert_count": 1},
+        {"day": day_of(now), "alert_count": 2},
+    ]
+    assert [row["alert_count"] for row in db.get_daily_alerts(days=7, sensor_id=2)] == [1]
+    assert [row["day"] for row in db.get_daily_alerts(days=1)] == [day_of(now)]
+
+
+def test_daily_counts_survive_pruning(db):
+    now = time.time()
+    db.log_events([(now - DAY, 1, "state", 0, None), (now - DAY, 1, "state", 1, None)])
+    db.roll_up_events()
+    assert db.prune_events(now) == 2
+    assert [row["alert_count"] for row in db.get_daily_alerts(days=7)] == [1]
@@ -0,0 +1,94 @@
+import numpy as np
+import pytest
+
+from battery_analytics import DAY, YEAR, fit_depletion, fit_trends, forecast
+from database import TREND_EPOCH
+
+T0 = TREND_EPOCH + 1000 * DAY
+
+
+def series(sensor_id, level, slope, days, step=1):
+    """Readings every step days from T0, draining slope percent per day"""
+    return [(sensor_id, T0 + d * DAY, level + slope * d) for d in range(0, days, step)]
+
+
+def depletion(readings, **kwargs):
+    sensor_ids, times, levels = zip(*readings)
+    return fit_depletion(sensor_ids, times, levels, **kwargs)
+
+
+def trend_sums(readings):
+    """get_battery_trends() rows for readings grouped by sensor"""
+    rows = []
+    for sensor_id in sorted({r[0] for r in readings}):
+        times = np.array([r[1] for r in readings if r[0] == sensor_id])
+        levels = np.array([r[2] for r in readings if r[0] == sensor_id])
+        days = (times - TREND_EPOCH) / DAY
+        rows.append((sensor_id, len(days), days.sum(), levels.sum(), (days * days).sum(),
+                     (days * levels).sum(), times.min(), times.max()))
+    return rows
+
+
+def test_known_slopes():
+    readings = series(1, 90, -0.01, 400) + series(2, 80, -0.05, 400)
+    for result in (depletion(readings), fit_trends(trend_sums(readings))):
+        assert result.sensor_ids.tolist() == [1, 2]
+        assert result.samples.tolist() == [400, 400]
+        assert result.slope == pytest.approx([-0.01, -0.05])
+        assert result.level == pytest.approx([90 - 0.01 * 399, 80 - 0.05 * 399])
+        days_left = (result.level - 20) / np.array([0.01, 0.05])
+        assert result.replacement_time == pytest.approx(T0 + (399 + days_left) * DAY)
+        assert result.life_years == pytest.approx([80 / 0.01 * DAY / YEAR, 80 / 0.05 * DAY / YEAR])
+        # 80 points at 0.05/day lasts under 5 years; at 0.01/day about 22
+        assert result.short_lived().tolist() == [2]
+        assert [row["sensor_id"] for row in result.rows()] == [2, 1]
+
+
+def test_flat_series_has_no_replacement_date():
+    readings = series(1, 75, 0.0, 100) + series(2, 90, -0.05, 100)
+    for result in (depletion(readings), fit_trends(trend_sums(readings))):
+        assert result.slope[0] == pytest.approx(0.0)
+        assert np.isnan(result.replacement_time[0]) and np.isnan(result.life_years[0])
+        assert result.level[0] == pytest.approx(75)
+        assert result.due_within(100 * YEAR, now=T0).tolist() == [2]
+        assert result.rows()[-1]["sensor_id"] == 1
+        assert result.rows()[-1]["replacement_time"] is None
+
+
+def test_too_few_samples_give_no_slope():
+    readings = [(1, T0, 60.0)] + series(2, 90, -0.05, 30) + [(3, T0, 50.0), (3, T0, 52.0)]
+    for result in (depletion(readings), fit_trends(trend_sums(readings))):
+        assert result.samples.tolist() == [1, 30, 2]
+        assert np.isnan(result.slope[[0, 2]]).all()
+        assert result.slope[1] == pytest.approx(-0.05)
+        assert result.level[[0, 2]] == pytest.approx([60, 51])
+        assert np.isnan(result.replacement_time[[0, 2]]).all()
+
+
+def test_trend_ignores_readings_less_than_an_hour_apart():
+    readings = [(1, T0 + i * 60.0, 80.0 - i) for i in range(30)]
+    assert np.isnan(fit_trends(trend_sums(readings)).slope).all()
+
+
+def test_only_readings_since_the_last_battery_change_are_fitted():
+    readings = (series(1, 40, -0.1, 100)  # Old battery, down to 30%
+                + [(1, T0 + (200 + d) * DAY, 100 - 0.02 * d) for d in range(50)])
+    result = depletion(readings)
+    assert result.samples.tolist() == [50]
+    assert result.slope == pytest.approx([-0.02])
+    assert result.first_seen.tolist() == [T0 + 200 * DAY]
+
+
+def test_no_readings():
+    assert len(fit_depletion((), (), ())) == 0
+    assert len(fit_trends([])) == 0
+    assert fit_depletion((), (), ()).rows() == []
+
+
+def test_forecast_from_the_database(db):
+    # One point lost every 10 days: -0.1 percent per day
+    db.log_events([(T0 + 10 * k * DAY, 1, "battery", 90 - k, None) for k in range(60)])
+    assert forecast(db).slope == pytest.approx([-0.1])
+    windowed = forecast(db, since=T0 + 300 * DAY, bucket_days=7)
+    assert windowed.slope == pytest.approx([-0.1], rel=0.05)
+    assert windowed.first_seen[0] >= T0 + 300 * DAY
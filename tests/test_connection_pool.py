@@ -0,0 +1,108 @@
+import asyncio
+import socket
+import time
+
+import pytest
+
+import connection_pool
+from connection_pool import ConnectionPool
+from modbus_simulator import ModbusSimulator, SensorBank
+
+
+def closed_port():
+    """A local port nothing listens on, so connects are refused at once"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_simulators(count):
+    return [await ModbusSimulator(SensorBank(4, state_change_rate=0), port=0).start()
+            for _ in range(count)]
+
+
+def test_backoff_doubles_up_to_the_maximum(monkeypatch):
+    monkeypatch.setattr(connection_pool.random, "uniform", lambda low, high: high)
+    port = closed_port()
+
+    async def main():
+        pool = ConnectionPool(backoff_initial=1.0, backoff_max=8.0)
+        receiver = pool.receiver("127.0.0.1", port)
+        delays = []
+        for _ in range(6):
+            with pytest.raises(ConnectionError, match="Could not connect"):
+                await pool.get("127.0.0.1", port)
+            delays.append(receiver.retry_at - time.monotonic())
+            # Backing off: fails without another connect attempt
+            with pytest.raises(ConnectionError, match="retrying"):
+                await pool.get("127.0.0.1", port)
+            receiver.retry_at = 0.0
+        return delays, receiver.failures
+
+    delays, failures = asyncio.run(main())
+    assert delays == pytest.approx([1, 2, 4, 8, 8, 8], abs=0.1)
+    assert failures == 6
+
+
+def test_backoff_jitter_only_shortens_the_delay(monkeypatch):
+    monkeypatch.setattr(connection_pool.random, "uniform", lambda low, high: low)
+    port = closed_port()
+
+    async def main():
+        pool = ConnectionPool(backoff_initial=4.0)
+        with pytest.raises(ConnectionError):
+            await pool.get("127.0.0.1", port)
+        return pool.receiver("127.0.0.1", port).retry_at - time.monotonic()
+
+    assert asyncio.run(main()) == pytest.approx(2.0, abs=0.1)
+
+
+def test_success_resets_the_backoff():
+    port = closed_port()
+
+    async def main():
+        pool = ConnectionPool(backoff_initial=1.0)
+        with pytest.raises(ConnectionError):
+            await pool.get("127.0.0.1", port)
+        pool.report_success("127.0.0.1", port)
+        return pool.receiver("127.0.0.1", port).failures
+
+    assert asyncio.run(main()) == 0
+
+
+def test_one_connection_per_receiver():
+    async def main():
+        simulator, = await start_simulators(1)
+        pool = ConnectionPool()
+        clients = await asyncio.gather(*(pool.get("127.0.0.1", simulator.port) for _ in range(5)))
+        connections = len(simulator.connections)
+        await pool.close()
+        await simulator.close()
+        return clients, connections
+
+    clients, connections = asyncio.run(main())
+    assert all(client is clients[0] for client in clients)
+    assert connections == 1
+
+
+def test_connection_limit_across_receivers():
+    async def main():
+        simulators = await start_simulators(3)
+        ports = [simulator.port for simulator in simulators]
+        pool = ConnectionPool(max_connections=2)
+        first = await pool.get("127.0.0.1", ports[0])
+        await pool.get("127.0.0.1", ports[1])
+        with pytest.raises(ConnectionError, match="Connection limit of 2"):
+            await pool.get("127.0.0.1", ports[2])
+        # Closing a connection gives its slot back
+        first.close()
+        await first.wait_closed()
+        await asyncio.sleep(0)
+        third = await pool.get("127.0.0.1", ports[2])
+        connected = third.connected
+        await pool.close()
+        for simulator in simulators:
+            await simulator.close()
+        return connected
+
+    assert asyncio.run(main())
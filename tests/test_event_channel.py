@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from alarm_engine import Alarm
+from event_channel import (
+    ALARMS, EVENTS, LEVEL, MAX_CLIENT_FRAME, MAX_EVENTS_PER_FRAME, POLL_FAILED, RECEIVER,
+    SNAPSHOT, EventPublisher, FrameError, decode_alarms, decode_events, decode_level,
+    decode_receiver, encode_alarms, encode_events, encode_frame, encode_level,
+    encode_poll_failed, encode_receiver, read_frames
+)
+from event_pipeline import SensorEvent
+
+
+def frames(data, max_length=None):
+    """[(frame type, payload)] parsed from a byte stream"""
+    async def main():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return [frame async for frame in read_frames(reader, max_length)]
+
+    return asyncio.run(main())
+
+
+def payload(data):
+    (_, only), = frames(data)
+    return only
+
+
+def event_tuples(events):
+    return [(e.sensor_id, e.kind, e.value, e.previous, e.timestamp) for e in events]
+
+
+def alarm_tuples(alarms):
+    return [(a.rule, a.level, a.sensor_id, a.zone, a.timestamp) for a in alarms]
+
+
+EVENT_LIST = [
+    SensorEvent(1, "state", 0, None, 1.5),
+    SensorEvent(70000, "battery", 42, 43, 1_700_000_000.25),
+    SensorEvent(3, "state", 2, 1, 0.0),
+]
+
+
+def test_events_round_trip():
+    (frame_type, data), = frames(encode_events(EVENT_LIST))
+    assert frame_type == EVENTS
+    assert event_tuples(decode_events(data)) == event_tuples(EVENT_LIST)
+
+
+def test_empty_snapshot_is_one_frame():
+    assert frames(encode_events([], SNAPSHOT)) == [(SNAPSHOT, b"\x00\x00")]
+    assert decode_events(b"\x00\x00") == []
+
+
+def test_other_frames_round_trip():
+    alarms = [Alarm("door", 2, 7, "Hall", 12.5), Alarm("fenêtre", 0, 8, None, 13.0)]
+    stream = (encode_receiver("10.0.0.5", True, "Connecté") + encode_poll_failed("timed out")
+              + encode_alarms(alarms) + encode_level(1))
+    parsed = frames(stream)
+    assert [frame_type for frame_type, _ in parsed] == [RECEIVER, POLL_FAILED, ALARMS, LEVEL]
+    assert decode_receiver(parsed[0][1]) == ("10.0.0.5", True, "Connecté")
+    assert parsed[1][1] == b"timed out"
+    assert alarm_tuples(decode_alarms(parsed[2][1])) == alarm_tuples(alarms)
+    assert decode_level(parsed[3][1]) == 1
+
+
+def test_more_events_than_a_frame_holds_are_chunked():
+    events = [SensorEvent(i, "state", i % 2, None, float(i))
+              for i in range(2 * MAX_EVENTS_PER_FRAME + 3)]
+    parsed = frames(encode_events(events))
+    assert [frame_type for frame_type, _ in parsed] == [EVENTS] * 3
+    chunks = [decode_events(data) for _, data in parsed]
+    assert [len(chunk) for chunk in chunks] == [MAX_EVENTS_PER_FRAME, MAX_EVENTS_PER_FRAME, 3]
+    decoded = [event for chunk in chunks for event in chunk]
+    assert event_tuples(decoded) == event_tuples(events)
+
+
+def test_more_alarms_than_a_frame_holds_are_chunked():
+    alarms = [Alarm("r", 0, i, None, 0.0) for i in range(MAX_EVENTS_PER_FRAME + 1)]
+    parsed = frames(encode_alarms(alarms))
+    assert [len(decode_alarms(data)) for _, data in parsed] == [MAX_EVENTS_PER_FRAME, 1]
+    assert encode_alarms([]) == b""
+
+
+def test_truncated_payloads_raise_frame_error():
+    events = payload(encode_events(EVENT_LIST))
+    alarms = payload(encode_alarms([Alarm("door", 2, 7, "Hall", 12.5)]))
+    receiver = payload(encode_receiver("host", False, ""))
+    for decode, data in ((decode_events, events), (decode_alarms, alarms),
+                         (decode_receiver, receiver)):
+        for end in (0, 1, len(data) - 1):
+            with pytest.raises(FrameError):
+                decode(data[:end])
+    with pytest.raises(FrameError):
+        decode_level(b"")
+
+
+def test_oversized_payloads_raise_frame_error():
+    with pytest.raises(FrameError, match="cannot hold"):
+        decode_events(payload(encode_events(EVENT_LIST)) + b"\x00")
+    with pytest.raises(FrameError, match="more than"):
+        decode_alarms(payload(encode_alarms([Alarm("door", 2, 7, None, 1.0)])) + b"\x00")
+    with pytest.raises(FrameError):
+        decode_level(b"\x01\x01")
+
+
+def test_invalid_values_raise_frame_error():
+    data = bytearray(payload(encode_events(EVENT_LIST[:1])))
+    data[2 + 4] = 9  # Kind byte of the first record
+    with pytest.raises(FrameError, match="Unknown event kind"):
+        decode_events(bytes(data))
+    with pytest.raises(FrameError, match="Unknown alarm level"):
+        decode_level(b"\x07")
+
+
+def test_frame_longer_than_the_limit_is_rejected_before_reading_it():
+    # Only the header arrives; the payload it announces is never buffered
+    header = encode_frame(LEVEL, bytes(MAX_CLIENT_FRAME + 1))[:5]
+    with pytest.raises(FrameError, match="larger than"):
+        frames(header, MAX_CLIENT_FRAME)
+    assert frames(encode_level(2), MAX_CLIENT_FRAME) == [(LEVEL, b"\x02")]
+
+
+def test_stream_cut_inside_a_frame_ends_the_frames():
+    data = encode_level(1) + encode_events(EVENT_LIST)
+    assert frames(data[:-3]) == [(LEVEL, b"\x01")]
+
+
+def test_publisher_drops_a_client_sending_an_oversized_frame(tmp_path):
+    async def main():
+        publisher = EventPublisher(str(tmp_path / "channel.sock"))
+        await publisher.start()
+        reader, writer = await asyncio.open_unix_connection(publisher.path)
+        writer.write(encode_frame(LEVEL, bytes(MAX_CLIENT_FRAME + 1))[:5])
+        await writer.drain()
+        received = await asyncio.wait_for(reader.read(), 2)  # Snapshot, then EOF
+        clients = publisher.client_count
+        writer.close()
+        await publisher.close()
+        return received, clients
+
+    received, clients = asyncio.run(main())
+    assert frames(received) == [(SNAPSHOT, b"\x00\x00")]
+    assert clients == 0
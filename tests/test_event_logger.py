@@ -0,0 +1,137 @@
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from event_logger import BLOCK, DROP_NEWEST, DROP_OLDEST, EventLogger
+
+
+class Sink:
+    """write_batch that records rows, optionally failing or held back"""
+
+    def __init__(self, failures=0):
+        self.rows = []
+        self.failures = failures
+        self.calls = 0
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, rows):
+        self.calls += 1
+        self.release.wait()
+        if self.failures:
+            self.failures -= 1
+            raise sqlite3.OperationalError("database is locked")
+        self.rows.extend(rows)
+
+
+def values(rows):
+    return [row[3] for row in rows]
+
+
+def make_logger(sink, **kwargs):
+    # Nothing is written before close() unless the test asks for it
+    kwargs.setdefault("batch_size", 1000)
+    kwargs.setdefault("flush_interval", 60)
+    return EventLogger(sink, **kwargs)
+
+
+def test_close_writes_everything_queued():
+    sink = Sink()
+    logger = make_logger(sink, batch_size=7)
+    for i in range(50):
+        logger.log("state", 1, i, timestamp=i)
+    logger.close()
+    assert values(sink.rows) == list(range(50))
+    assert logger.written == 50
+    with pytest.raises(RuntimeError):
+        logger.log("state", 1, 0)
+
+
+def test_drop_oldest_keeps_the_newest_records():
+    sink = Sink()
+    logger = make_logger(sink, max_queue=3, overflow=DROP_OLDEST)
+    accepted = [logger.log("state", 1, i) for i in range(5)]
+    assert accepted == [True, True, True, False, False]
+    logger.close()
+    assert values(sink.rows) == [2, 3, 4]
+    assert logger.dropped == 2
+
+
+def test_drop_newest_rejects_new_records():
+    sink = Sink()
+    logger = make_logger(sink, max_queue=3, overflow=DROP_NEWEST)
+    accepted = [logger.log("state", 1, i) for i in range(5)]
+    assert accepted == [True, True, True, False, False]
+    logger.close()
+    assert values(sink.rows) == [0, 1, 2]
+    assert logger.dropped == 2
+
+
+def test_block_waits_for_the_writer():
+    sink = Sink()
+    logger = make_logger(sink, max_queue=3, overflow=BLOCK, block_timeout=5)
+    for i in range(3):
+        logger.log("state", 1, i)
+    # The full queue wakes the writer, which makes room
+    assert logger.log("state", 1, 3)
+    logger.close()
+    assert values(sink.rows) == [0, 1, 2, 3]
+    assert logger.dropped == 0
+
+
+def test_block_gives_up_after_the_timeout():
+    sink = Sink()
+    sink.release.clear()  # The database is stuck
+    logger = make_logger(sink, batch_size=3, max_queue=3, overflow=BLOCK, block_timeout=0.1)
+    for i in range(3):
+        logger.log("state", 1, i)
+    while sink.calls == 0:
+        time.sleep(0.01)  # The writer holds the first batch
+    for i in range(3, 6):
+        logger.log("state", 1, i)
+    start = time.monotonic()
+    assert not logger.log("state", 1, 6)
+    assert time.monotonic() - start >= 0.1
+    sink.release.set()
+    logger.close()
+    assert logger.dropped == 1
+    assert values(sink.rows) == [0, 1, 2, 3, 4, 5]
+
+
+def test_block_does_not_wait_on_an_event_loop():
+    sink = Sink()
+    logger = make_logger(sink, max_queue=3, overflow=BLOCK, block_timeout=5)
+
+    async def log_all():
+        start = time.monotonic()
+        for i in range(5):
+            logger.log("state", 1, i)
+        return time.monotonic() - start
+
+    assert asyncio.run(log_all()) < 1
+    logger.close()
+    assert values(sink.rows) == [2, 3, 4]
+
+
+def test_failed_batch_is_retried():
+    sink = Sink(failures=2)
+    logger = make_logger(sink, retry_delay=0.01)
+    for i in range(3):
+        logger.log("state", 1, i)
+    logger.close()
+    assert values(sink.rows) == [0, 1, 2]
+    assert (logger.written, logger.lost, logger.failed_batches) == (3, 0, 0)
+
+
+def test_batch_is_lost_only_after_the_retries():
+    sink = Sink(failures=10)
+    logger = make_logger(sink, write_retries=2, retry_delay=0.01)
+    for i in range(3):
+        logger.log("state", 1, i)
+    logger.close()
+    assert sink.calls == 3
+    assert sink.rows == []
+    assert (logger.written, logger.lost, logger.failed_batches) == (0, 3, 1)
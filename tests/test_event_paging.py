@@ -0,0 +1,37 @@
+T0 = 1_700_000_000.0
+
+
+def all_pages(db, limit, **filters):
+    pages = []
+    before = None
+    while True:
+        page = db.query_events(before=before, limit=limit, **filters)
+        if not page:
+            return pages
+        pages.append(page)
+        before = (page[-1][1], page[-1][0])
+
+
+def test_pages_do_not_skip_or_repeat_equal_timestamps(db):
+    # Ten events share every timestamp, so page boundaries fall inside a tie
+    db.log_events([(T0 + i // 10, i % 4 + 1, "state", i % 2, None) for i in range(50)])
+    pages = all_pages(db, limit=7)
+    rows = [row for page in pages for row in page]
+    assert len(rows) == 50
+    assert len({row[0] for row in rows}) == 50
+    assert [len(page) for page in pages] == [7] * 7 + [1]
+    keys = [(row[1], row[0]) for row in rows]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_paging_with_filters_and_time_range(db):
+    db.log_events([(T0 + i // 3, i % 3 + 1, "state", 0, None) for i in range(30)])
+    rows = [row for page in all_pages(db, limit=2, sensor_ids=[2], since=T0 + 2, until=T0 + 8)
+            for row in page]
+    assert [(row[1], row[2]) for row in rows] == [(T0 + t, 2) for t in range(7, 1, -1)]
+
+
+def test_page_after_the_last_row_is_empty(db):
+    db.log_events([(T0, 1, "state", 0, None), (T0, 1, "state", 1, None)])
+    page = db.query_events(limit=2)
+    assert db.query_events(before=(page[-1][1], page[-1][0])) == []
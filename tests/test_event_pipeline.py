@@ -0,0 +1,81 @@
+from event_pipeline import ChangeDetector, EventPipeline
+from modbus_client import SensorState
+
+OPEN = SensorState.OPEN
+CLOSED = SensorState.CLOSED
+UNKNOWN = SensorState.UNKNOWN
+
+
+def changes(events):
+    return [(e.sensor_id, e.previous, e.value, e.timestamp) for e in events]
+
+
+def test_only_changes_are_reported():
+    detector = ChangeDetector("state")
+    assert changes(detector.update({1: OPEN, 2: CLOSED}, now=0)) == [
+        (1, None, OPEN, 0), (2, None, CLOSED, 0)
+    ]
+    assert detector.update({1: OPEN, 2: CLOSED}, now=1) == []
+    assert changes(detector.update({1: CLOSED, 2: CLOSED}, now=2)) == [(1, OPEN, CLOSED, 2)]
+    assert detector.current(1) == CLOSED
+
+
+def test_chatter_inside_the_debounce_window_is_ignored():
+    detector = ChangeDetector("state", debounce=1.0)
+    detector.update({1: CLOSED}, now=0)
+    for now, value in ((1, OPEN), (1.5, CLOSED), (2, OPEN), (2.5, CLOSED)):
+        assert detector.update({1: value}, now=now) == []
+    assert detector.current(1) == CLOSED
+
+
+def test_debounced_change_is_dated_from_when_it_was_first_seen():
+    detector = ChangeDetector("state", debounce=1.0)
+    detector.update({1: CLOSED}, now=0)
+    assert detector.update({1: OPEN}, now=10) == []
+    assert detector.update({1: OPEN}, now=10.5) == []
+    assert changes(detector.update({1: OPEN}, now=11)) == [(1, CLOSED, OPEN, 10)]
+    assert detector.update({1: OPEN}, now=12) == []
+
+
+def test_first_reading_is_not_debounced():
+    detector = ChangeDetector("state", debounce=5.0)
+    assert changes(detector.update({1: UNKNOWN}, now=0)) == [(1, None, UNKNOWN, 0)]
+    # Leaving UNKNOWN is debounced like any other change
+    assert detector.update({1: CLOSED}, now=1) == []
+    assert changes(detector.update({1: CLOSED}, now=6)) == [(1, UNKNOWN, CLOSED, 1)]
+
+
+def test_single_failed_read_does_not_report_unknown():
+    detector = ChangeDetector("state", debounce=1.0)
+    detector.update({1: OPEN}, now=0)
+    assert detector.update({1: UNKNOWN}, now=1) == []
+    assert detector.update({1: OPEN}, now=1.5) == []
+    # The failed read left no candidate behind
+    assert detector.update({1: UNKNOWN}, now=3) == []
+    assert detector.current(1) == OPEN
+
+
+def test_persistent_failure_reports_unknown_then_recovers():
+    detector = ChangeDetector("state")
+    detector.update({1: OPEN, 2: CLOSED}, now=0)
+    assert changes(detector.update({1: UNKNOWN, 2: UNKNOWN}, now=1)) == [
+        (1, OPEN, UNKNOWN, 1), (2, CLOSED, UNKNOWN, 1)
+    ]
+    assert detector.update({1: UNKNOWN, 2: UNKNOWN}, now=2) == []
+    assert changes(detector.update({1: OPEN, 2: OPEN}, now=3)) == [
+        (1, UNKNOWN, OPEN, 3), (2, UNKNOWN, OPEN, 3)
+    ]
+
+
+def test_pipeline_only_dispatches_non_empty_batches():
+    pipeline = EventPipeline()
+    batches = []
+    pipeline.subscribe(batches.append)
+    pipeline.publish("state", {1: OPEN}, now=0)
+    pipeline.publish("state", {1: OPEN}, now=1)
+    pipeline.publish("battery", {1: 80}, now=1)
+    assert [changes(batch) for batch in batches] == [[(1, None, OPEN, 0)], [(1, None, 80, 1)]]
+    assert pipeline.current("state", 1) == OPEN
+    pipeline.unsubscribe(batches.append)
+    pipeline.publish("state", {1: CLOSED}, now=2)
+    assert len(batches) == 2
@@ -0,0 +1,88 @@
+import asyncio
+import struct
+
+import pytest
+
+from modbus_client import DECODE_ERRORS, MAX_MBAP_LENGTH, ModbusClient, ModbusError
+from modbus_simulator import ModbusSimulator, SensorBank
+from read_planner import BATTERY_REGISTER_BASE
+
+
+class BadLengthSimulator(ModbusSimulator):
+    """Answers every request with a header claiming an impossible length"""
+
+    def respond(self, frame):
+        transaction_id = struct.unpack_from(">H", frame)[0]
+        return struct.pack(">HHHB", transaction_id, 0, MAX_MBAP_LENGTH + 1, 1) + bytes(8)
+
+
+def run(test, bank=None, simulator_class=ModbusSimulator, timeout=2.0, **kwargs):
+    """Run test(client, simulator) against a simulator on a free port"""
+    bank = bank or SensorBank(16, state_change_rate=0, seed=1)
+
+    async def main():
+        simulator = await simulator_class(bank, port=0, seed=1, **kwargs).start()
+        client = await ModbusClient.connect("127.0.0.1", simulator.port, timeout=timeout)
+        try:
+            return await test(client, simulator)
+        finally:
+            client.close()
+            await client.wait_closed()
+            await simulator.close()
+
+    return asyncio.run(main())
+
+
+def test_out_of_order_responses_reach_their_requests():
+    bank = SensorBank(16, state_change_rate=0, seed=1)
+
+    async def test(client, simulator):
+        # The jitter makes the receiver answer in a different order than asked
+        return await asyncio.gather(
+            *(client.read_discrete_inputs(i, 1) for i in range(16)),
+            *(client.read_input_registers(BATTERY_REGISTER_BASE + i, 1) for i in range(16)),
+        )
+
+    results = run(test, bank, latency_jitter=0.05)
+    assert results[:16] == [[bool(state)] for state in bank.states]
+    assert results[16:] == [[bank.battery(i)] for i in range(16)]
+
+
+def test_late_reply_after_a_timeout_is_dropped():
+    bank = SensorBank(16, state_change_rate=0, seed=1)
+
+    async def test(client, simulator):
+        with pytest.raises(asyncio.TimeoutError):
+            await client.read_discrete_inputs(0, 16)
+        assert client.in_flight == 0
+        simulator.latency = 0
+        # The next request must not be handed the late reply to the first
+        battery = await client.read_input_registers(BATTERY_REGISTER_BASE, 2)
+        await asyncio.sleep(0.3)
+        return battery, client.stale_responses, client.connected
+
+    assert run(test, bank, timeout=0.05, latency=0.2) == (
+        [bank.battery(0), bank.battery(1)], 1, True
+    )
+
+
+def test_exception_response_raises_modbus_error():
+    async def test(client, simulator):
+        with pytest.raises(ModbusError):
+            await client.read_discrete_inputs(100, 1)  # Past the last sensor
+        return client.connected
+
+    assert run(test)
+
+
+def test_invalid_mbap_length_closes_the_connection():
+    errors = DECODE_ERRORS.labels("127.0.0.1")
+    before = errors.value
+
+    async def test(client, simulator):
+        with pytest.raises(ConnectionError):
+            await client.read_discrete_inputs(0, 1)
+        return client.connected, client.in_flight
+
+    assert run(test, simulator_class=BadLengthSimulator) == (False, 0)
+    assert errors.value == before + 1
@@ -0,0 +1,80 @@
+import struct
+
+import pytest
+
+from modbus_client import MAX_MBAP_LENGTH, MBAPFrameReader, ModbusFunction
+
+
+def response(transaction_id, payload, unit_id=1):
+    """READ_COILS response frame carrying the payload bytes"""
+    pdu = struct.pack(">BB", ModbusFunction.READ_COILS, len(payload)) + bytes(payload)
+    return struct.pack(">HHHB", transaction_id, 0, 1 + len(pdu), unit_id) + pdu
+
+
+def read_frames(reader):
+    return [bytes(frame) for frame in reader.frames()]
+
+
+def test_frame_split_across_reads():
+    reader = MBAPFrameReader()
+    frame = response(1, [10, 20, 30])
+    reader.feed(frame[:3])
+    assert read_frames(reader) == []  # Not even a whole header yet
+    reader.feed(frame[3:9])
+    assert read_frames(reader) == []  # Header, but only part of the PDU
+    reader.feed(frame[9:])
+    assert read_frames(reader) == [frame]
+    assert len(reader) == 0
+
+
+def test_concatenated_frames_in_one_read():
+    reader = MBAPFrameReader()
+    frames = [response(i, [i] * (i + 1)) for i in range(1, 5)]
+    reader.feed(b"".join(frames))
+    assert read_frames(reader) == frames
+    assert frames[2][9:] == bytes([3, 3, 3, 3])
+
+
+def test_trailing_partial_frame_is_kept():
+    reader = MBAPFrameReader()
+    first, second = response(1, [1]), response(2, [2, 2])
+    reader.feed(first + second[:5])
+    assert read_frames(reader) == [first]
+    assert len(reader) == 5
+    reader.feed(second[5:])
+    assert read_frames(reader) == [second]
+
+
+def test_partial_frame_is_moved_to_the_front_of_the_buffer():
+    reader = MBAPFrameReader(capacity=2 * (6 + MAX_MBAP_LENGTH))
+    frames = [response(i, [i] * 240) for i in range(1, 10)]
+    stream = b"".join(frames)
+    received = []
+    for start in range(0, len(stream), 100):
+        reader.feed(stream[start:start + 100])
+        received.extend(read_frames(reader))
+    assert received == frames
+
+
+def test_oversized_frame_is_rejected():
+    reader = MBAPFrameReader()
+    header = struct.pack(">HHHB", 1, 0, MAX_MBAP_LENGTH + 1, 1)
+    reader.feed(header + bytes(10))
+    with pytest.raises(ValueError, match="Invalid MBAP length"):
+        read_frames(reader)
+    assert len(reader) == 0  # The stream is resynchronised from scratch
+    frame = response(2, [7])
+    reader.feed(frame)
+    assert read_frames(reader) == [frame]
+
+
+def test_too_short_length_is_rejected():
+    reader = MBAPFrameReader()
+    reader.feed(struct.pack(">HHHB", 1, 0, 1, 1))
+    with pytest.raises(ValueError, match="Invalid MBAP length"):
+        read_frames(reader)
+
+
+def test_buffer_too_small_for_a_frame():
+    with pytest.raises(ValueError):
+        MBAPFrameReader(capacity=6 + MAX_MBAP_LENGTH)
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+from poll_scheduler import PollScheduler
+
+
+def run_for(scheduler, seconds):
+    async def main():
+        stop = asyncio.Event()
+        asyncio.get_running_loop().call_later(seconds, stop.set)
+        await scheduler.run(stop)
+
+    asyncio.run(main())
+
+
+def test_run_in_flight_is_skipped_not_stacked():
+    scheduler = PollScheduler(jitter=0, start_spread=0)
+    started = []
+    cancelled = []
+
+    async def slow_poll():
+        started.append(time.monotonic())
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    job = scheduler.add("state", 0.01, slow_poll)
+    run_for(scheduler, 0.2)
+    assert len(started) == job.runs == 1
+    assert job.skipped >= 5
+    # Stopping the scheduler cancels the run still in flight
+    assert cancelled == [True]
+
+
+def test_job_runs_again_once_the_previous_run_finishes():
+    scheduler = PollScheduler(jitter=0, start_spread=0)
+    runs = []
+
+    async def poll():
+        runs.append(time.monotonic())
+        await asyncio.sleep(0.03)
+
+    job = scheduler.add("state", 0.01, poll)
+    run_for(scheduler, 0.25)
+    assert job.runs == len(runs) >= 3
+    assert job.skipped >= job.runs
+    assert all(b - a >= 0.03 for a, b in zip(runs, runs[1:]))
+
+
+def test_jitter_stays_within_the_interval_fraction():
+    scheduler = PollScheduler(jitter=0.2)
+
+    async def poll():
+        pass
+
+    job = scheduler.add("battery", 10.0, poll)
+    gaps = []
+    for _ in range(1000):
+        job.next_run = 100.0
+        scheduler._reschedule(job, now=0.0)
+        gaps.append(job.next_run - 100.0)
+    assert all(8.0 <= gap <= 12.0 for gap in gaps)
+    # The jitter actually spreads the runs both ways
+    assert min(gaps) < 9.0 and max(gaps) > 11.0
+
+
+def test_first_runs_are_spread_over_the_start_window():
+    scheduler = PollScheduler(start_spread=1.0)
+
+    async def poll():
+        pass
+
+    now = time.monotonic()
+    starts = [scheduler.add(i, 5.0, poll).next_run - now for i in range(200)]
+    assert all(0 <= start <= 1.0 + 0.1 for start in starts)
+    assert max(starts) - min(starts) > 0.5
+    # A short interval bounds the spread instead
+    assert scheduler.add("fast", 0.1, poll).next_run - now <= 0.1 + 0.1
+
+
+def test_late_job_does_not_try_to_catch_up():
+    scheduler = PollScheduler(jitter=0)
+
+    async def poll():
+        pass
+
+    job = scheduler.add("state", 1.0, poll)
+    job.next_run = 0.0
+    scheduler._reschedule(job, now=50.0)
+    assert job.next_run == 51.0
+
+
+def test_removed_job_does_not_run():
+    scheduler = PollScheduler(start_spread=0)
+    runs = []
+
+    async def poll():
+        runs.append(1)
+
+    scheduler.add("state", 0.01, poll)
+    scheduler.remove("state")
+    run_for(scheduler, 0.05)
+    assert runs == []
+    assert scheduler.jobs() == []
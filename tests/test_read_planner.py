@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+
+from modbus_client import ModbusError, ModbusFunction, SensorState
+from read_planner import ReadPlanner, SensorConfig
+
+INPUTS = ModbusFunction.READ_DISCRETE_INPUTS
+REGISTERS = ModbusFunction.READ_INPUT_REGISTERS
+BATTERY = 0x200
+
+
+class FakeClient:
+    """Answers reads from a register map; reads starting at a failing address raise"""
+
+    def __init__(self, values, failing=()):
+        self.values = values  # (function, address) -> value
+        self.failing = set(failing)  # (function, address) of ranges that fail
+        self.requests = []
+
+    async def read(self, function, address, count, unit_id=None):
+        self.requests.append((function, address, count))
+        if (function, address) in self.failing:
+            raise ModbusError(function, 2)
+        return [self.values.get((function, address + i), 0) for i in range(count)]
+
+
+def sensors(count):
+    return [SensorConfig(i + 1, state_address=i, battery_register=BATTERY + i)
+            for i in range(count)]
+
+
+def test_plan_merges_gaps_and_splits_far_addresses():
+    configs = [SensorConfig(1, state_address=0), SensorConfig(2, state_address=10),
+               SensorConfig(3, state_address=100)]
+    ranges = ReadPlanner(configs, max_gap=16).plan(("state",))
+    assert [(r.address, r.count) for r in ranges] == [(0, 11), (100, 1)]
+
+
+def test_failed_range_reports_its_sensors_unknown():
+    configs = [SensorConfig(1, state_address=0), SensorConfig(2, state_address=1),
+               SensorConfig(3, state_address=100)]
+    client = FakeClient({(INPUTS, 0): 1, (INPUTS, 1): 0}, failing=[(INPUTS, 100)])
+    failed = set()
+    results = asyncio.run(ReadPlanner(configs).read(client, ("state",), failed))
+    assert results == {
+        1: {"state": SensorState.CLOSED},
+        2: {"state": SensorState.OPEN},
+        3: {"state": SensorState.UNKNOWN},
+    }
+    assert failed == {3}
+
+
+def test_failed_battery_range_keeps_the_states():
+    client = FakeClient({(INPUTS, 0): 1, (INPUTS, 2): 1}, failing=[(REGISTERS, BATTERY)])
+    failed = set()
+    results = asyncio.run(ReadPlanner(sensors(3)).read(client, failed=failed))
+    # Battery values are missing rather than guessed; the states are still reported
+    assert results == {
+        1: {"state": SensorState.CLOSED},
+        2: {"state": SensorState.OPEN},
+        3: {"state": SensorState.CLOSED},
+    }
+    assert failed == {1, 2, 3}
+
+
+def test_battery_values_are_clamped():
+    client = FakeClient({(REGISTERS, BATTERY): 250, (REGISTERS, BATTERY + 1): 40})
+    results = asyncio.run(ReadPlanner(sensors(2)).read(client, ("battery",)))
+    assert results == {1: {"battery": 100}, 2: {"battery": 40}}
+
+
+def test_every_range_failing_raises():
+    configs = [SensorConfig(1, state_address=0), SensorConfig(2, state_address=100)]
+    client = FakeClient({}, failing=[(INPUTS, 0), (INPUTS, 100)])
+    with pytest.raises(ModbusError):
+        asyncio.run(ReadPlanner(configs).read(client, ("state",)))
@@ -0,0 +1,44 @@
+from database import DAY, HOUR, MINUTE
+from retention import RetentionJob, RetentionPolicy, choose_resolution
+
+NOW = 1_800_000_000.0
+
+
+def events(start, count, sensor_id=1):
+    return [(start + i, sensor_id, "state", i % 2, None) for i in range(count)]
+
+
+def test_events_are_rolled_up_then_pruned(db):
+    db.log_events(events(NOW - 100 * DAY, 10) + events(NOW - 60, 4))
+    job = RetentionJob(db, RetentionPolicy(raw_days=90))
+    rolled_up, _ = job.run_once(NOW)
+    assert rolled_up == 14
+    assert len(db.query_events()) == 4
+    # The pruned events are still counted in the day rollups
+    assert sum(row[2] for row in db.query_rollups(DAY)) == 14
+
+
+def test_events_logged_after_pruning_every_event_are_rolled_up(db):
+    # Pruning the highest ids lets SQLite hand out the same ids again
+    db.log_events(events(NOW - 100 * DAY, 10))
+    job = RetentionJob(db, RetentionPolicy(raw_days=90))
+    assert job.run_once(NOW)[0] == 10
+    assert db.query_events() == []
+    db.log_events(events(NOW, 5))
+    assert job.run_once(NOW)[0] == 5
+    assert [row[2] for row in db.query_rollups(MINUTE, since=NOW - 60)] == [5]
+
+
+def test_policy_is_saved_in_the_database(db):
+    RetentionPolicy(raw_days=30, hour_days=None).save(db)
+    policy = RetentionPolicy.load(db)
+    assert policy.raw_days == 30
+    assert policy.rollup_days == {MINUTE: 7, HOUR: None, DAY: None}
+
+
+def test_resolution_skips_pruned_detail():
+    policy = RetentionPolicy(minute_days=7, hour_days=180)
+    assert choose_resolution(NOW - 3600, now=NOW, policy=policy) == MINUTE
+    assert choose_resolution(NOW - 10 * DAY, until=NOW - 10 * DAY + 3600, now=NOW,
+                             policy=policy) == HOUR
+    assert choose_resolution(None) == DAY
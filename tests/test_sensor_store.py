@@ -0,0 +1,105 @@
+import pytest
+
+from event_pipeline import SensorEvent
+from modbus_client import SensorState
+from sensor_store import SensorStateStore
+
+OPEN = SensorState.OPEN
+CLOSED = SensorState.CLOSED
+UNKNOWN = SensorState.UNKNOWN
+
+
+def ids(array):
+    return array.tolist()
+
+
+def test_arrays_grow_for_large_ids():
+    store = SensorStateStore([1, 2], capacity=4)
+    store.apply_events([SensorEvent(2, "battery", 55, None, 10.0)])
+    store.add([1000])
+    assert len(store.known) >= 1001
+    assert ids(store.sensor_ids) == [1, 2, 1000]
+    assert len(store) == 3
+    assert 1000 in store and 3 not in store and -1 not in store
+    assert store.sensor(2)["battery"] == 55  # Kept across the growth
+    with pytest.raises(ValueError):
+        store.add([-5])
+
+
+def test_sensor_values():
+    store = SensorStateStore([1])
+    assert store.sensor(1) == {
+        "state": UNKNOWN, "alarm_level": None, "battery": None, "last_seen": 0.0,
+        "last_change": 0.0, "errors": 0, "error_streak": 0,
+    }
+    with pytest.raises(KeyError):
+        store.sensor(2)
+
+
+def test_events_update_state_battery_and_times():
+    store = SensorStateStore([1])
+    store.apply_events([
+        SensorEvent(1, "state", OPEN, None, 10.0),
+        SensorEvent(1, "battery", 80, None, 12.0),
+        SensorEvent(70, "state", CLOSED, None, 11.0),  # Not added yet
+    ])
+    assert store.sensor(1)["state"] == OPEN
+    assert (store.sensor(1)["last_change"], store.sensor(1)["last_seen"]) == (10.0, 12.0)
+    assert store.sensor(70)["state"] == CLOSED
+    # UNKNOWN is a failed read, not a sighting
+    store.apply_events([SensorEvent(1, "state", UNKNOWN, OPEN, 20.0)])
+    assert store.sensor(1)["last_seen"] == 12.0
+    assert store.sensor(1)["last_change"] == 20.0
+
+
+def test_state_and_alarm_level_queries():
+    store = SensorStateStore(range(1, 6))
+    store.apply_events([SensorEvent(i, "state", OPEN if i % 2 else CLOSED, None, 1.0)
+                        for i in range(1, 5)])
+    assert ids(store.in_state(OPEN)) == [1, 3]
+    assert ids(store.in_state(CLOSED)) == [2, 4]
+    assert ids(store.in_state(UNKNOWN)) == [5]
+    assert store.state_counts() == {OPEN: 2, CLOSED: 2, UNKNOWN: 1, SensorState.LOW_BATTERY: 0}
+
+    store.set_alarm_level(1)
+    store.set_alarm_level(2, [4, 5])
+    assert ids(store.at_alarm_level(1)) == [1, 2, 3]
+    assert ids(store.at_alarm_level(2)) == [4, 5]
+
+    store.mark_unknown()
+    assert ids(store.in_state(UNKNOWN)) == [1, 2, 3, 4, 5]
+
+
+def test_low_battery_skips_sensors_without_a_reading():
+    store = SensorStateStore(range(1, 5))
+    store.apply_events([SensorEvent(1, "battery", 5, None, 1.0),
+                        SensorEvent(2, "battery", 19, None, 1.0),
+                        SensorEvent(3, "battery", 20, None, 1.0)])
+    assert ids(store.low_battery(20)) == [1, 2]
+    assert ids(store.low_battery(21)) == [1, 2, 3]
+
+
+def test_stale_includes_sensors_never_seen():
+    store = SensorStateStore(range(1, 4))
+    store.mark_seen([1], now=1000.0)
+    store.mark_seen([2], now=1500.0)
+    assert ids(store.stale(600, now=2000.0)) == [1, 3]
+    assert ids(store.stale(600, now=1550.0)) == [3]
+
+
+def test_failing_follows_the_error_streak():
+    store = SensorStateStore(range(1, 4))
+    store.record_errors([1, 2])
+    store.record_errors([1])
+    assert ids(store.failing()) == [1, 2]
+    assert ids(store.failing(min_streak=2)) == [1]
+    store.mark_seen([1], now=1.0)
+    assert ids(store.failing()) == [2]
+    assert (store.sensor(1)["errors"], store.sensor(1)["error_streak"]) == (2, 0)
+
+
+def test_queries_ignore_unused_slots():
+    store = SensorStateStore([3], capacity=8)
+    # Slots 0-2 and 4-7 hold the initial values but are not sensors
+    assert ids(store.in_state(UNKNOWN)) == [3]
+    assert ids(store.stale(1, now=100.0)) == [3]
@@ -0,0 +1,106 @@
+"""Styles for the dashboard's state, alarm level and battery displays.
+
+Nothing here is rebuilt per update. Each styled widget gets one
+stylesheet holding a rule per dynamic property value, e.g.
+QLabel[battery="low"] or QLabel[status="open"], and set_style_state()
+only changes the property and re-polishes the widget, so the stylesheet
+is never parsed again.
+"""
+RED = "#e74c3c"
+ORANGE = "#f39c12"
+GREEN = "#27ae60"
+GREY = "#7f8c8d"
+
+# Alarm level -> (colour, dark colour): Low, Medium, High
+LEVEL_COLORS = {
+    0: ("#4CAF50", "#388E3C"),  # Green
+    1: ("#2196F3", "#1976D2"),  # Blue
+    2: ("#FF9800", "#F57C00"),  # Orange
+}
+
+# Text colour per value of a status label's 'status' property
+SENSOR_STATE_COLORS = {"open": RED, "closed": GREEN, "unknown": GREY, "error": RED}
+ALARM_COLORS = {"none": GREY, "alarm": RED}
+CONNECTION_COLORS = {"connected": GREEN, "connecting": ORANGE, "partial": ORANGE,
+                     "reconnecting": RED, "disconnected": RED}
+
+
+def status_style(colors):
+    """Stylesheet for a bold status label coloured by its 'status' property"""
+    return "QLabel { font-weight: bold; }" + "".join(
+        f' QLabel[status="{name}"] {{ color: {color}; }}' for name, color in colors.items()
+    )
+
+
+SENSOR_STATE_STYLE = status_style(SENSOR_STATE_COLORS)
+ALARM_STATUS_STYLE = status_style(ALARM_COLORS)
+CONNECTION_STYLE = status_style(CONNECTION_COLORS)
+
+BATTERY_STYLE = f"""
+    QLabel {{
+        background-color: #bdc3c7;
+        border: 1px solid {GREY};
+        border-radius: 3px;
+    }}
+    QLabel[battery="low"] {{ background-color: {RED}; }}
+    QLabel[battery="medium"] {{ background-color: {ORANGE}; }}
+    QLabel[battery="ok"] {{ background-color: {GREEN}; }}
+"""
+
+SLIDER_STYLE = """
+    QSlider {
+        min-height: 30px;
+    }
+    QSlider::groove:horizontal {
+        height: 8px;
+        background: #d3d3d3;
+        border-radius: 4px;
+        margin: 0 10px;
+    }
+    QSlider::sub-page:horizontal {
+        border-radius: 4px;
+    }
+    QSlider::handle:horizontal {
+        width: 20px;
+        height: 20px;
+        margin: -6px -10px;
+        background: #1e3c72;
+        border-radius: 10px;
+    }
+""" + "".join(f"""
+    QSlider[alarmLevel="{level}"]::sub-page:horizontal {{ background: {color}; }}
+    QSlider[alarmLevel="{level}"]::handle:horizontal {{ background: {dark_color}; }}
+""" for level, (color, dark_color) in LEVEL_COLORS.items())
+
+# Level labels under the slider; each carries its own 'level' property
+LEVEL_LABEL_STYLE = """
+    ClickableLabel {
+        color: #555555;
+        padding: 0 15px;
+    }
+    ClickableLabel:hover {
+        color: #333333;
+        font-weight: bold;
+    }
+""" + "".join(f"""
+    ClickableLabel[selected="true"][level="{level}"] {{ color: {dark_color}; font-weight: bold; }}
+""" for level, (color, dark_color) in LEVEL_COLORS.items())
+
+
+def battery_state(level):
+    """Name of the battery band used by BATTERY_STYLE"""
+    if level < 20:
+        return "low"
+    if level < 40:
+        return "medium"
+    return "ok"
+
+
+def set_style_state(widget, name, value):
+    """Switch a widget to the stylesheet rules for property name == value"""
+    if widget.property(name) == value:
+        return
+    widget.setProperty(name, value)
+    style = widget.style()
+    style.unpolish(widget)
+    style.polish(widget)